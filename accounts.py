@@ -0,0 +1,215 @@
+"""
+Rebalancing of many accounts in parallel.
+
+An account manifest lists accounts with their credentials and jobs. Every
+account runs in a worker process of a pool, so its credentials, signers and
+rate limiters never mix with those of accounts running at the same time, and
+a failing account does not stop the others. A run takes about as long as the
+slowest account when there are enough workers.
+
+Every job must have the credentials of its exchange in the manifest.
+Adapters fall back to credentials in environment variables such as
+GMO_API_KEY, which belong to no account, so jobs without credentials are
+rejected rather than run with them.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import time
+
+
+logger = logging.getLogger()
+
+# adapter keyword arguments every job must set
+CREDENTIAL_KEYS = ('api_key', 'api_secret')
+
+# exchanges without credentials
+NO_CREDENTIALS = {'simulated'}
+
+# exchanges whose client reads credentials only from the environment, so accounts cannot use them
+ENVIRONMENT_CREDENTIALS = {'liquid'}
+
+
+@dataclass
+class Account:
+    name: str
+    jobs: list[dict[str, str]]
+    credentials: dict[str, dict[str, str]] = field(default_factory=dict)  # adapter keyword arguments by exchange
+
+
+@dataclass
+class AccountResult:
+    '''Outcome of the jobs of an account.
+    '''
+    account: str
+    results: list = field(default_factory=list)  # CycleResult of each job
+    error: Exception = None  # failure of the whole account, such as a missing credential
+    elapsed: float = 0.0
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None or any(r.error for r in self.results)
+
+
+def load_accounts(path: str) -> list[Account]:
+    '''Load accounts from a manifest file.
+
+    The file is JSON such as
+    {"accounts": [{"name": "sub1",
+                   "credentials": {"gmo": {"api_key": "$SUB1_GMO_API_KEY", "api_secret": "$SUB1_GMO_API_SECRET"}},
+                   "jobs": [{"exchange": "gmo", "symbol": "BTC/JPY"}]}]}.
+    Credential values starting with $ are read from the environment variable
+    of that name by the worker, so secrets need not be written in the file.
+    A job whose exchange has no api_key and api_secret in credentials is rejected,
+    and so is a job on liquid, whose client takes no credentials.
+    '''
+    with open(path) as f:
+        manifest = json.load(f)
+    accounts = []
+    for a in manifest['accounts']:
+        if 'name' not in a or not a.get('jobs'):
+            raise ValueError(f"Account must have name and jobs. [{a.get('name')}]")
+        credentials = {k.lower(): v for k, v in a.get('credentials', {}).items()}
+        for j in a['jobs']:
+            if 'exchange' not in j or 'symbol' not in j:
+                raise ValueError(f"Job must have exchange and symbol. [account: {a['name']}, job: {j}]")
+            exchange = j['exchange'].lower()
+            if exchange in ENVIRONMENT_CREDENTIALS:
+                raise ValueError(f"Exchange reads credentials only from the environment and cannot be used by accounts. "
+                                 f"[account: {a['name']}, exchange: {exchange}]")
+            if exchange not in NO_CREDENTIALS and not all(credentials.get(exchange, {}).get(k) for k in CREDENTIAL_KEYS):
+                raise ValueError(f"Job must have credentials of its exchange. [account: {a['name']}, exchange: {exchange}]")
+        accounts.append(Account(a['name'], a['jobs'], credentials))
+    names = [a.name for a in accounts]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Account names must be unique. [{', '.join(names)}]")
+    return accounts
+
+
+def resolve_credentials(credentials: dict[str, dict[str, str]]) -> dict[str, dict[str, str]]:
+    '''Replace values starting with $ by the environment variables they name.
+    '''
+    resolved = {}
+    for exchange, kwargs in credentials.items():
+        resolved[exchange] = {}
+        for k, v in kwargs.items():
+            if isinstance(v, str) and v.startswith('$'):
+                value = os.getenv(v[1:])
+                if not value:
+                    raise ValueError(f"Credential is not set. [exchange: {exchange}, variable: {v[1:]}]")
+                v = value
+            resolved[exchange][k] = v
+    return resolved
+
+
+def init_worker(workers: int) -> None:
+    '''Set up a worker process of a pool of workers.
+    '''
+    from exchanges.ratelimit import set_rate_share
+
+    set_rate_share('public', 1 / workers)
+
+
+def rebalance_account(account: Account, budget: float = None, use_async: bool = False) -> AccountResult:
+    '''Rebalance the jobs of an account. This runs in a worker process.
+
+    A worker runs accounts one after another, so signers and private rate
+    limiters left by the previous account are cleared first. Public limiters
+    are kept, since public endpoints are limited by address, not by account.
+    '''
+    import rebalance
+    from exchanges.ratelimit import clear_rate_limiters
+    from exchanges.signing import clear_signers
+    from transport import get_transport
+
+    clear_signers()
+    clear_rate_limiters('private')
+    start = time.perf_counter()
+    result = AccountResult(account.name)
+    try:
+        credentials = resolve_credentials(account.credentials)
+        if use_async:
+            from exchanges.aio import get_event_loop_thread
+            from transport import get_async_transport
+
+            loop_thread = get_event_loop_thread()
+            try:
+                result.results = loop_thread.run(rebalance.run_portfolio_async(account.jobs, budget,
+                                                                               credentials=credentials))
+            finally:
+                loop_thread.run(get_async_transport().close())
+        else:
+            result.results = rebalance.run_portfolio(account.jobs, budget, credentials=credentials)
+    except Exception as e:
+        logger.exception(f"Failed to rebalance account. [account: {account.name}]")
+        result.error = _portable(e)
+        result.results = [rebalance.CycleResult(exchange=j['exchange'].lower(), symbol=j['symbol'], error=result.error)
+                          for j in account.jobs]
+    finally:
+        get_transport().close()
+
+    for r in result.results:
+        r.account = account.name
+        if r.error is not None:
+            r.error = _portable(r.error)
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def run_accounts(accounts: list[Account], budget: float = None, workers: int = None,
+                 use_async: bool = False) -> list[AccountResult]:
+    '''Rebalance accounts in parallel on a process pool and return their results in the order of accounts.
+
+    Workers are spawned rather than forked, so they inherit no threads,
+    connections or credentials of this process. Each worker takes an equal
+    share of the public rate limits, which all workers spend from the same
+    address. Default number of workers is the number of accounts.
+    '''
+    workers = max(min(workers or len(accounts), len(accounts)), 1)
+    logger.info(f"Start rebalancing accounts. [accounts: {len(accounts)}, workers: {workers}]")
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=init_worker, initargs=(workers, )) as executor:
+        futures = [executor.submit(rebalance_account, a, budget, use_async) for a in accounts]
+        for a, f in zip(accounts, futures):
+            try:
+                results.append(f.result())
+            except Exception as e:
+                # the worker process died, e.g. killed by the OOM killer
+                from rebalance import CycleResult
+
+                logger.error(f"Worker of account failed. [account: {a.name}, error: {e}]")
+                results.append(AccountResult(a.name, error=e, results=[
+                        CycleResult(exchange=j['exchange'].lower(), symbol=j['symbol'], error=e, account=a.name)
+                        for j in a.jobs]))
+    return results
+
+
+def summarize(results: list[AccountResult], elapsed: float) -> str:
+    '''Return one summary of the results of all accounts.
+    '''
+    failed = [r for r in results if r.failed]
+    slowest = max([r.elapsed for r in results], default=0.0)
+    lines = [f"Rebalanced {len(results)} account(s) in {elapsed:.2f}s, {len(failed)} failed. [slowest: {slowest:.2f}s]"]
+    for r in results:
+        if r.error is not None:
+            lines.append(f"  {r.account}: error: {r.error}, {r.elapsed:.2f}s")
+            continue
+        ordered = sum([c.ordered for c in r.results])
+        errors = sum([c.error is not None for c in r.results])
+        lines.append(f"  {r.account}: jobs={len(r.results)}, orders={ordered}, failed={errors}, {r.elapsed:.2f}s")
+    return '\n'.join(lines)
+
+
+def _portable(e: Exception) -> Exception:
+    '''Return the exception if it can be sent to the parent process, otherwise a SystemError of its message.
+    '''
+    try:
+        pickle.loads(pickle.dumps(e))
+        return e
+    except Exception:
+        return SystemError(f"{type(e).__name__}: {e}")
@@ -0,0 +1,200 @@
+#! /usr/bin/env python
+"""
+Backtest of the rebalancing rule on historical prices.
+
+Prices are replayed through the same rule as rebalance.estimate_order: an
+order is placed when the asset rate difference reaches the threshold, and it
+brings the base coin back to the target rate. Between two orders the balance
+does not change, so instead of looping over every row the engine searches
+the next row that triggers an order with NumPy over blocks of rows, and
+builds the value curve of the whole period at once.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import itertools
+import logging
+import time
+
+import numpy as np
+
+from rebalance import REBALANCE_THRESHOLD, TARGET_RATE
+
+
+logger = logging.getLogger()
+
+# column names searched in CSV headers and NPZ archives, in this order
+PRICE_COLUMNS = ('close', 'price', 'last')
+
+
+@dataclass
+class BacktestResult:
+    threshold: float
+    rate: float
+    fee: float
+    trades: int
+    fees: float  # paid in base coin, negative for maker rebates
+    turnover: float  # traded amount in base coin
+    final_value: float
+    hold_value: float  # value when the initial balance is held without trading
+    max_drawdown: float
+
+
+def load_prices(path: str) -> np.ndarray:
+    '''Load prices from a CSV file with a header or from a NPZ archive.
+
+    The column or array named close, price or last is used, so both OHLC bars
+    and ticks can be replayed.
+    '''
+    if path.endswith('.npz'):
+        with np.load(path) as data:
+            for name in PRICE_COLUMNS:
+                if name in data:
+                    return np.ascontiguousarray(data[name], dtype=np.float64)
+        raise ValueError(f"Archive has no price array. [{path}, expected one of {PRICE_COLUMNS}]")
+
+    with open(path) as f:
+        header = [h.strip().lower() for h in f.readline().split(',')]
+    for name in PRICE_COLUMNS:
+        if name in header:
+            return np.loadtxt(path, delimiter=',', skiprows=1, usecols=header.index(name), dtype=np.float64, ndmin=1)
+    raise ValueError(f"CSV has no price column. [{path}, expected one of {PRICE_COLUMNS}]")
+
+
+def find_next_order(prices: np.ndarray, start: int, coin: float, base: float, threshold: float,
+                    rate: float, min_size: float, block: int) -> int:
+    '''Return the index of the first row from start where an order is placed, or -1.
+
+    Rows are evaluated in blocks whose size doubles until a match is found, so
+    the cost is proportional to the distance to the match.
+    '''
+    n = len(prices)
+    while start < n:
+        p = prices[start:start + block]
+        total = coin * p + base
+        diff = total * rate - base
+        hit = (np.abs(base / total - rate) * 2 >= threshold) & (np.abs(diff) / p >= min_size)
+        i = int(hit.argmax())
+        if hit[i]:
+            return start + i
+        start += len(p)
+        block *= 2
+    return -1
+
+
+def run_backtest(prices: np.ndarray, coin: float, base: float, threshold: float = REBALANCE_THRESHOLD,
+                 rate: float = TARGET_RATE, fee: float = 0.0, min_size: float = 0.0) -> BacktestResult:
+    '''Replay prices with one set of parameters.
+
+    Orders are filled at the price of the row that triggers them. The fee is
+    a rate of the traded amount charged in base coin.
+    '''
+    n = len(prices)
+    index = [0]
+    coins = [coin]
+    bases = [base]
+    fees = turnover = 0.0
+
+    i, block = 0, 1024
+    while True:
+        j = find_next_order(prices, i, coin, base, threshold, rate, min_size, block)
+        if j < 0:
+            break
+
+        # the next search starts with a block twice as long as the last gap
+        block = min(max((j - i) * 2, 16), 1 << 16)
+
+        p = float(prices[j])
+        diff = (coin * p + base) * rate - base
+        qty = round(abs(diff) / p, 8)
+        amount = qty * p
+        cost = amount * fee
+        if diff > 0:
+            coin, base = coin - qty, base + amount - cost
+        else:
+            coin, base = coin + qty, base - amount - cost
+        fees += cost
+        turnover += amount
+
+        index.append(j)
+        coins.append(coin)
+        bases.append(base)
+        i = j + 1
+
+    # value curve: each balance applies from its order row up to the next order
+    lengths = np.diff(np.append(index, n))
+    value = np.repeat(coins, lengths) * prices + np.repeat(bases, lengths)
+    peak = np.maximum.accumulate(value)
+    max_drawdown = float(np.max(1.0 - value / peak)) if n else 0.0
+
+    return BacktestResult(
+            threshold=threshold,
+            rate=rate,
+            fee=fee,
+            trades=len(index) - 1,
+            fees=fees,
+            turnover=turnover,
+            final_value=float(value[-1]) if n else base,
+            hold_value=float(coins[0] * prices[-1] + bases[0]) if n else base,
+            max_drawdown=max_drawdown)
+
+
+_prices = None
+
+
+def _init_worker(prices: np.ndarray) -> None:
+    global _prices
+    _prices = prices
+
+
+def _run_params(params: tuple) -> BacktestResult:
+    coin, base, threshold, rate, fee, min_size = params
+    return run_backtest(_prices, coin, base, threshold, rate, fee, min_size)
+
+
+def sweep(prices: np.ndarray, coin: float, base: float, thresholds: list[float], rates: list[float],
+          fees: list[float], min_size: float = 0.0, workers: int = 1) -> list[BacktestResult]:
+    '''Run the backtest for every combination of thresholds, rates and fees.
+    '''
+    params = [(coin, base, t, r, f, min_size) for t, r, f in itertools.product(thresholds, rates, fees)]
+    if workers <= 1:
+        _init_worker(prices)
+        return [_run_params(p) for p in params]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(prices,)) as executor:
+        return list(executor.map(_run_params, params, chunksize=max(len(params) // (workers * 4), 1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest the rebalancing rule on historical prices.')
+    parser.add_argument('data', help="CSV file with a header, or NPZ archive, containing a close, price or last column.")
+    parser.add_argument('--coin', type=float, default=0.0, help="Initial balance of cryptocurrency. Default is 0.")
+    parser.add_argument('--base', type=float, default=1_000_000, help="Initial balance of base coin. Default is 1,000,000.")
+    parser.add_argument('--threshold', type=float, nargs='+', default=[REBALANCE_THRESHOLD],
+            help=f"Asset rate differences below which no order is created. Default is {REBALANCE_THRESHOLD}.")
+    parser.add_argument('--rate', type=float, nargs='+', default=[TARGET_RATE],
+            help=f"Target rates of base coin. Default is {TARGET_RATE}.")
+    parser.add_argument('--fee', type=float, nargs='+', default=[0.0],
+            help="Fee rates of traded amount, negative for rebates. Default is 0.")
+    parser.add_argument('--min-size', type=float, default=0.0, dest='min_size',
+            help="Minimum order size. Smaller orders are not placed. Default is 0.")
+    parser.add_argument('--workers', type=int, default=1, help="Number of processes. Default is 1.")
+    parser.add_argument('--top', type=int, default=20, help="Number of results shown, best final value first. Default is 20.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    prices = load_prices(args.data)
+    logger.info(f'Loaded {len(prices):,} prices in {time.perf_counter() - start:.2f}s.')
+
+    start = time.perf_counter()
+    results = sweep(prices, args.coin, args.base, args.threshold, args.rate, args.fee, args.min_size, args.workers)
+    logger.info(f'Ran {len(results):,} backtests in {time.perf_counter() - start:.2f}s.')
+
+    results.sort(key=lambda r: r.final_value, reverse=True)
+    print(f"{'threshold':>10} {'rate':>6} {'fee':>8} {'trades':>8} {'fees':>14} {'turnover':>16} {'final':>16} {'hold':>16} {'max_dd':>7}")
+    for r in results[:args.top]:
+        print(f"{r.threshold:>10.4f} {r.rate:>6.3f} {r.fee:>8.5f} {r.trades:>8,} {r.fees:>14,.2f} "
+              f"{r.turnover:>16,.0f} {r.final_value:>16,.0f} {r.hold_value:>16,.0f} {r.max_drawdown:>7.2%}")
+
+
+if __name__ == '__main__':
+    main()
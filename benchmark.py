@@ -0,0 +1,124 @@
+#! /usr/bin/env python
+"""
+End-to-end latency benchmark of rebalance cycles against the mock exchange.
+
+Cycles run through the real adapters and transport, with the transport
+pointed to a local MockExchange. The report gives p50/p99 cycle latency,
+HTTP requests per cycle and memory allocated per cycle, so that changes can
+be compared without touching real exchanges.
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from exchanges.ratelimit import AdaptiveRateLimiter, set_rate_limiter
+from mock_exchange import MockExchange
+import rebalance
+from transport import AsyncHttpTransport, HttpTransport, set_async_transport, set_transport
+
+
+logger = logging.getLogger()
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+def run_cycles(exchange: str, symbol: str, cycles: int, cold: bool, use_async: bool = False) -> list[float]:
+    '''Run cycles and return the latency of each one in seconds.
+    '''
+    rebalancer = rebalance.create_rebalancer(exchange, symbol, use_async)
+    latencies = []
+    for _ in range(cycles):
+        start = time.perf_counter()
+        if cold:
+            rebalancer = rebalance.create_rebalancer(exchange, symbol, use_async)
+        else:
+            rebalancer.invalidate_market_snapshot()
+        rebalance.rebalance(rebalancer, exchange, symbol)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def measure_allocations(exchange: str, symbol: str, cycles: int, cold: bool,
+                        use_async: bool = False) -> tuple[float, float]:
+    '''Return the mean of allocated and peak bytes per cycle, traced by tracemalloc.
+
+    This runs separately from the latency measurement because tracing slows
+    every allocation down.
+    '''
+    rebalancer = rebalance.create_rebalancer(exchange, symbol, use_async)
+    allocated, peaks = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(cycles):
+            if cold:
+                rebalancer = rebalance.create_rebalancer(exchange, symbol, use_async)
+            else:
+                rebalancer.invalidate_market_snapshot()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            rebalance.rebalance(rebalancer, exchange, symbol)
+            current, peak = tracemalloc.get_traced_memory()
+            allocated.append(current - before)
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+    return statistics.mean(allocated), statistics.mean(peaks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark rebalance cycles against the mock exchange.')
+    parser.add_argument('-e', '--exchange', default='gmo', help="Exchange name, gmo or bitbank. Default is gmo.")
+    parser.add_argument('-s', '--symbol', default='BTC/JPY', help="Symbol name. Default is BTC/JPY.")
+    parser.add_argument('-n', '--cycles', type=int, default=100, help="Number of measured cycles. Default is 100.")
+    parser.add_argument('--warmup', type=int, default=5, help="Number of cycles run before measuring. Default is 5.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds injected into each response. Default is 0.")
+    parser.add_argument('--cold', action='store_true', help="Create a new rebalancer every cycle.")
+    parser.add_argument('--async', action='store_true', dest='use_async',
+                        help="Run the async adapter through SyncRebalancer.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    for k in ('GMO_API_KEY', 'GMO_API_SECRET', 'BITBANK_API_KEY', 'BITBANK_API_SECRET'):
+        os.environ.setdefault(k, 'benchmark')
+    os.environ['YAJIROBE_CACHE_DIR'] = tempfile.mkdtemp(prefix='yajirobe-benchmark-')
+
+    # the coin is about 33% of total balance so that every cycle wants an order
+    exchange = MockExchange(price=5_000_000, balances={'JPY': 1_000_000, 'BTC': 0.1, 'ETH': 1.0, 'XRP': 10_000},
+                            latency=args.latency).start()
+    set_transport(HttpTransport(base_urls=exchange.base_urls()))
+    set_async_transport(AsyncHttpTransport(base_urls=exchange.base_urls()))
+
+    # the mock exchange does not limit requests, so neither do the adapters
+    for kind in ('public', 'private'):
+        set_rate_limiter(args.exchange.lower(), kind, AdaptiveRateLimiter(float('inf')))
+    try:
+        run_cycles(args.exchange, args.symbol, args.warmup, args.cold, args.use_async)
+        exchange.reset_counts()
+
+        latencies = run_cycles(args.exchange, args.symbol, args.cycles, args.cold, args.use_async)
+        requests = dict(exchange.requests)
+        allocated, peak = measure_allocations(args.exchange, args.symbol, min(args.cycles, 20), args.cold,
+                                              args.use_async)
+    finally:
+        exchange.stop()
+
+    print(f"exchange={args.exchange} symbol={args.symbol} cycles={args.cycles} "
+          f"latency={args.latency * 1000:.1f}ms {'cold' if args.cold else 'warm'}{' async' if args.use_async else ''}")
+    print(f"cycle latency  p50={percentile(latencies, 50) * 1000:.2f}ms "
+          f"p99={percentile(latencies, 99) * 1000:.2f}ms "
+          f"mean={statistics.mean(latencies) * 1000:.2f}ms max={max(latencies) * 1000:.2f}ms")
+    print(f"requests/cycle {sum(requests.values()) / args.cycles:.2f}")
+    for (ex, method, path), count in sorted(requests.items()):
+        print(f"  {method:<5}{ex}{path:<40} {count / args.cycles:.2f}")
+    print(f"allocations/cycle net={allocated / 1024:.1f}KiB peak={peak / 1024:.1f}KiB")
+
+
+if __name__ == '__main__':
+    main()
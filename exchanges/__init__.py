@@ -0,0 +1,41 @@
+"""
+Exchange adapters implementing Rebalancer.
+
+Adapter modules are imported lazily through the registry. Accessing an
+adapter class such as exchanges.GmoRebalancer imports only its module.
+"""
+from exchanges.aio import AsyncRebalancer, SyncRebalancer
+from exchanges.base import SYMBOL_SEPARATOR, Execution, MarketSnapshot, Order, Rebalancer
+from exchanges.ratelimit import RateLimitError
+from exchanges.registry import available_exchanges, get_async_rebalancer_class, get_rebalancer_class, register
+
+
+_LAZY_CLASSES = {
+    'BitbankRebalancer': 'bitbank',
+    'GmoRebalancer': 'gmo',
+    'LiquidRebalancer': 'liquid',
+    'SimulatedRebalancer': 'simulated',
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_CLASSES:
+        return get_rebalancer_class(_LAZY_CLASSES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = [
+    'SYMBOL_SEPARATOR',
+    'AsyncRebalancer',
+    'Execution',
+    'MarketSnapshot',
+    'Order',
+    'RateLimitError',
+    'Rebalancer',
+    'SyncRebalancer',
+    'available_exchanges',
+    'get_async_rebalancer_class',
+    'get_rebalancer_class',
+    'register',
+    *_LAZY_CLASSES,
+]
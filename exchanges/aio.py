@@ -0,0 +1,254 @@
+"""
+Native asyncio counterpart of Rebalancer.
+
+AsyncRebalancer adapters send requests through an AsyncHttpTransport, so
+every pair of a process shares one event loop and one connection pool
+instead of a thread per in-flight call. SyncRebalancer wraps an async
+adapter as a Rebalancer, running its calls on a process wide event loop
+thread, so code written for Rebalancer keeps working.
+"""
+from abc import ABCMeta, abstractmethod
+import asyncio
+from concurrent.futures import Future
+import functools
+import json
+import logging
+import threading
+import time
+from typing import Awaitable, Callable
+from urllib.parse import urlsplit
+
+from exchanges.base import (INSTRUMENTED_METHODS, SYMBOL_SEPARATOR, Execution, InstrumentMixin, MarketSnapshot, Order,
+                            Rebalancer, _retry_after)
+from exchanges.instruments import Instrument
+from exchanges.ratelimit import RateLimitError, get_rate_limiter
+from metrics import get_registry
+from transport import AsyncHttpTransport, get_async_transport
+
+
+logger = logging.getLogger()
+
+
+class EventLoopThread:
+    '''Event loop running forever on a daemon thread.
+    '''
+
+    def __init__(self, name: str = 'event-loop'):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, coro: Awaitable) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable):
+        '''Run a coroutine on the loop and wait for its result. Must not be called on the loop thread.
+        '''
+        if threading.current_thread() is self._thread:
+            raise SystemError('Cannot wait for the event loop on its own thread.')
+        return self.submit(coro).result()
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop_thread() -> EventLoopThread:
+    '''Return the process wide event loop thread, starting it at first use.
+    '''
+    global _loop_thread
+    with _loop_lock:
+        if _loop_thread is None:
+            _loop_thread = EventLoopThread()
+        return _loop_thread
+
+
+class AsyncRebalancer(InstrumentMixin, metaclass=ABCMeta):
+    '''Rebalancer whose exchange calls are coroutines.
+
+    Class attributes have the same meaning as Rebalancer's, and adapters of
+    the same exchange share rate limiters with the blocking ones. open must
+    be awaited once before trading, to load the instrument of the symbol.
+    '''
+
+    snapshot_ttl: float = 5.0
+
+    can_amend_order: bool = False
+
+    exchange: str = None
+
+    rate_limits: dict[str, float] = {'public': 10.0, 'private': 5.0}
+
+    max_throttle_retries: int = 3
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in INSTRUMENTED_METHODS:
+            if name in cls.__dict__:
+                setattr(cls, name, _timed_async(name, cls.__dict__[name]))
+
+    def __init__(self, symbol: str, snapshot_ttl: float = None, transport: AsyncHttpTransport = None):
+        if SYMBOL_SEPARATOR not in symbol:
+            raise ValueError('')
+        self.asset1, self.asset2 = symbol.split(SYMBOL_SEPARATOR)
+        self.transport = transport or get_async_transport()
+        if snapshot_ttl is not None:
+            self.snapshot_ttl = snapshot_ttl
+        self._snapshot = None
+        self._snapshot_expires_at = 0.0
+        self._loop = None
+
+    async def open(self) -> None:
+        '''Load the instrument of the symbol without blocking the event loop.
+
+        Instrument caches are shared with the blocking adapters and fetch on
+        a worker thread, which runs fetch_instruments on this loop.
+        '''
+        self._loop = asyncio.get_running_loop()
+        await asyncio.to_thread(self.get_instrument)
+
+    def _fetch_blocking(self, fetch: Callable[[], Awaitable]):
+        '''Run a coroutine function on the loop of open from another thread, for instrument caches.
+        '''
+        if self._loop is None:
+            raise SystemError(f"{type(self).__name__} is not opened.")
+        return asyncio.run_coroutine_threadsafe(fetch(), self._loop).result()
+
+    def is_throttled(self, res, body) -> bool:
+        return res.status_code == 429
+
+    async def _request(self, kind: str, method: str, url: str, sign: Callable[[], dict] = None, **kwargs) -> dict:
+        '''Send a request through the rate limiter of the endpoint class and return the JSON body.
+
+        Throttling is handled in the same way as Rebalancer._request.
+        '''
+        exchange = self.exchange or type(self).__name__
+        limiter = get_rate_limiter(exchange, kind, self.rate_limits[kind])
+        path = urlsplit(url).path
+        for _ in range(self.max_throttle_retries + 1):
+            await limiter.acquire_async()
+            with get_registry().span('yajirobe_request_seconds', exchange=exchange, method=method, path=path):
+                res = await self.transport.request(method, url, headers=sign() if sign else None, **kwargs)
+            try:
+                body = json.loads(res.text)
+            except ValueError:
+                body = None
+            if not self.is_throttled(res, body):
+                limiter.on_success()
+                if body is None:
+                    raise SystemError(f"Unexpected response. [status: {res.status_code}, url: {url}]")
+                return body
+            pause = limiter.on_throttled(_retry_after(res))
+            logger.warning(f"Request throttled. [exchange: {exchange}, kind: {kind}, retry after: {pause:.2f}s]")
+        raise RateLimitError(f"Request throttled too many times. [exchange: {exchange}, url: {url}]")
+
+    @abstractmethod
+    async def get_balance(self) -> dict[str, float]:
+        pass
+
+    @abstractmethod
+    async def cancel_all_orders(self):
+        pass
+
+    @abstractmethod
+    async def get_open_orders(self) -> list[Order]:
+        pass
+
+    @abstractmethod
+    async def cancel_orders(self, order_ids: list[str]) -> None:
+        pass
+
+    async def amend_order(self, order_id: str, price: float) -> None:
+        raise NotImplementedError
+
+    async def get_executions(self, since: float, count: int = 1000) -> list[Execution]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def fetch_market_snapshot(self) -> MarketSnapshot:
+        pass
+
+    async def get_market_snapshot(self) -> MarketSnapshot:
+        '''Return the cached market snapshot, fetching a new one if it has expired.
+        '''
+        now = time.monotonic()
+        if self._snapshot is None or now >= self._snapshot_expires_at:
+            self._snapshot = await self.fetch_market_snapshot()
+            self._snapshot_expires_at = now + self.snapshot_ttl
+        return self._snapshot
+
+    def invalidate_market_snapshot(self) -> None:
+        self._snapshot = None
+
+    def update_market_snapshot(self, snapshot: MarketSnapshot) -> None:
+        self._snapshot = snapshot
+        self._snapshot_expires_at = time.monotonic() + self.snapshot_ttl
+
+    async def get_ltp(self) -> float:
+        return (await self.get_market_snapshot()).last
+
+    @abstractmethod
+    async def create_order(self, side: str, quantity: float, price: float) -> str:
+        pass
+
+
+class SyncRebalancer(Rebalancer, timed=False):
+    '''Blocking Rebalancer running the calls of an AsyncRebalancer on the process wide event loop thread.
+
+    Parameters
+    ----------
+    adapter: AsyncRebalancer
+        Adapter whose calls are run. It is opened on the loop thread.
+    loop_thread: EventLoopThread
+        Thread of the event loop the calls run on. Default is the process wide one.
+    '''
+
+    def __init__(self, adapter: AsyncRebalancer, loop_thread: EventLoopThread = None):
+        self.adapter = adapter
+        self.loop_thread = loop_thread or get_event_loop_thread()
+        super().__init__(f'{adapter.asset1}{SYMBOL_SEPARATOR}{adapter.asset2}', adapter.snapshot_ttl)
+        self.asset1 = adapter.asset1
+        self.asset2 = adapter.asset2
+        self.exchange = adapter.exchange
+        self.can_amend_order = adapter.can_amend_order
+        self.loop_thread.run(adapter.open())
+
+    def get_balance(self) -> dict[str, float]:
+        return self.loop_thread.run(self.adapter.get_balance())
+
+    def cancel_all_orders(self):
+        return self.loop_thread.run(self.adapter.cancel_all_orders())
+
+    def get_open_orders(self) -> list[Order]:
+        return self.loop_thread.run(self.adapter.get_open_orders())
+
+    def cancel_orders(self, order_ids: list[str]) -> None:
+        self.loop_thread.run(self.adapter.cancel_orders(order_ids))
+
+    def amend_order(self, order_id: str, price: float) -> None:
+        self.loop_thread.run(self.adapter.amend_order(order_id, price))
+
+    def get_executions(self, since: float, count: int = 1000) -> list[Execution]:
+        return self.loop_thread.run(self.adapter.get_executions(since, count))
+
+    def fetch_market_snapshot(self) -> MarketSnapshot:
+        return self.loop_thread.run(self.adapter.fetch_market_snapshot())
+
+    def get_instrument(self) -> Instrument:
+        return self.adapter.get_instrument()
+
+    def create_order(self, side: str, quantity: float, price: float) -> str:
+        return self.loop_thread.run(self.adapter.create_order(side, quantity, price))
+
+
+def _timed_async(name: str, fn):
+    @functools.wraps(fn)
+    async def timed(self, *args, **kwargs):
+        with get_registry().span('yajirobe_call_seconds', exchange=self.exchange or type(self).__name__, call=name):
+            return await fn(self, *args, **kwargs)
+    return timed
@@ -0,0 +1,250 @@
+from abc import ABCMeta, abstractmethod
+from dataclasses import dataclass
+import functools
+import json
+import logging
+import threading
+import time
+from typing import Callable
+from urllib.parse import urlsplit
+
+from exchanges.instruments import Instrument
+from exchanges.ratelimit import RateLimitError, get_rate_limiter
+from exchanges.ticks import TickGrid
+from metrics import get_registry
+from transport import HttpTransport, get_transport
+
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s %(asctime)s %(message)s')
+logger = logging.getLogger()
+SYMBOL_SEPARATOR = '/'
+
+# methods of adapters timed as yajirobe_call_seconds
+INSTRUMENTED_METHODS = ('get_balance', 'cancel_all_orders', 'get_open_orders', 'cancel_orders', 'amend_order',
+                        'fetch_market_snapshot', 'create_order', 'get_executions')
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    '''Prices of a symbol taken from a single ticker response.
+    '''
+    last: float
+    bid: float
+    ask: float
+    timestamp: float  # unix time in seconds reported by the exchange
+
+
+@dataclass(frozen=True)
+class Order:
+    '''Active limit order of the symbol.
+    '''
+    order_id: str
+    side: str  # 'buy' or 'sell'
+    price: float
+    quantity: float  # remaining quantity
+
+
+@dataclass(frozen=True)
+class Execution:
+    '''Own trade of the symbol.
+    '''
+    execution_id: str
+    side: str  # 'buy' or 'sell'
+    price: float
+    quantity: float
+    timestamp: float  # unix time in seconds
+
+
+class InstrumentMixin:
+    '''Coins and price and size rounding of the symbol, shared by Rebalancer and AsyncRebalancer.
+    '''
+
+    asset1: str
+    asset2: str
+    _tick_grid: TickGrid = None
+
+    @abstractmethod
+    def get_instrument(self) -> Instrument:
+        '''Return tick size, lot size and minimum order of the symbol.
+        '''
+        pass
+
+    @property
+    def trade_coin(self) -> str:
+        return self.asset1
+
+    @property
+    def base_coin(self) -> str:
+        return self.asset2
+
+    def get_min_order_size(self) -> float:
+        return self.get_instrument().min_size
+
+    def get_min_order_unit(self) -> float:
+        return self.get_instrument().lot_size
+
+    def get_price_prec(self) -> int:
+        return self.get_instrument().price_prec
+
+    def get_tick_grid(self) -> TickGrid:
+        instrument = self.get_instrument()
+        if self._tick_grid is None or self._tick_grid.instrument is not instrument:
+            self._tick_grid = TickGrid(instrument)
+        return self._tick_grid
+
+    def format_price(self, price: float) -> str:
+        return self.get_tick_grid().format_price(price)
+
+    def format_size(self, quantity: float) -> str:
+        return self.get_tick_grid().format_size(quantity)
+
+
+class Rebalancer(InstrumentMixin, metaclass=ABCMeta):
+
+    # seconds for which a fetched market snapshot is reused
+    snapshot_ttl: float = 5.0
+
+    # whether amend_order is supported by the exchange
+    can_amend_order: bool = False
+
+    # exchange name, rebalancers of the same exchange share rate limiters
+    exchange: str = None
+
+    # requests per second allowed by the exchange for each endpoint class
+    rate_limits: dict[str, float] = {'public': 10.0, 'private': 5.0}
+
+    # times a throttled request is sent again before RateLimitError is raised
+    max_throttle_retries: int = 3
+
+    def __init_subclass__(cls, timed: bool = True, **kwargs):
+        # timed=False leaves calls untimed, for wrappers of adapters timed themselves
+        super().__init_subclass__(**kwargs)
+        for name in INSTRUMENTED_METHODS:
+            if timed and name in cls.__dict__:
+                setattr(cls, name, _timed(name, cls.__dict__[name]))
+
+    def __init__(self, symbol: str, snapshot_ttl: float = None, transport: HttpTransport = None):
+        if SYMBOL_SEPARATOR not in symbol:
+            raise ValueError('')
+        self.asset1, self.asset2 = symbol.split(SYMBOL_SEPARATOR)
+        self.transport = transport or get_transport()
+        if snapshot_ttl is not None:
+            self.snapshot_ttl = snapshot_ttl
+        self._snapshot = None
+        self._snapshot_expires_at = 0.0
+        self._snapshot_lock = threading.Lock()
+
+    def is_throttled(self, res, body) -> bool:
+        '''Return True if the response says requests are too many. body is None if it is not JSON.
+        '''
+        return res.status_code == 429
+
+    def _request(self, kind: str, method: str, url: str, sign: Callable[[], dict] = None, **kwargs) -> dict:
+        '''Send a request through the rate limiter of the endpoint class and return the JSON body.
+
+        Throttled requests are sent again after the limiter has backed off.
+        sign returns the auth headers and is called for every attempt, so a
+        retried request is signed with a fresh nonce.
+        '''
+        exchange = self.exchange or type(self).__name__
+        limiter = get_rate_limiter(exchange, kind, self.rate_limits[kind])
+        path = urlsplit(url).path
+        for _ in range(self.max_throttle_retries + 1):
+            limiter.acquire()
+            with get_registry().span('yajirobe_request_seconds', exchange=exchange, method=method, path=path):
+                res = self.transport.request(method, url, headers=sign() if sign else None, **kwargs)
+            try:
+                body = json.loads(res.text)
+            except ValueError:
+                body = None
+            if not self.is_throttled(res, body):
+                limiter.on_success()
+                if body is None:
+                    raise SystemError(f"Unexpected response. [status: {res.status_code}, url: {url}]")
+                return body
+            pause = limiter.on_throttled(_retry_after(res))
+            logger.warning(f"Request throttled. [exchange: {exchange}, kind: {kind}, retry after: {pause:.2f}s]")
+        raise RateLimitError(f"Request throttled too many times. [exchange: {exchange}, url: {url}]")
+
+    @abstractmethod
+    def get_balance(self) -> dict[str, float]:
+        pass
+
+    @abstractmethod
+    def cancel_all_orders(self):
+        pass
+
+    @abstractmethod
+    def get_open_orders(self) -> list[Order]:
+        pass
+
+    @abstractmethod
+    def cancel_orders(self, order_ids: list[str]) -> None:
+        '''Cancel orders with as few requests as the exchange allows.
+        '''
+        pass
+
+    def amend_order(self, order_id: str, price: float) -> None:
+        '''Change the price of an active order. Available if can_amend_order is True.
+        '''
+        raise NotImplementedError
+
+    def get_executions(self, since: float, count: int = 1000) -> list[Execution]:
+        '''Return own executions at or after since (unix time in seconds), oldest first.
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    def fetch_market_snapshot(self) -> MarketSnapshot:
+        '''Fetch last, bid and ask prices with one request to the exchange.
+        '''
+        pass
+
+    def get_market_snapshot(self) -> MarketSnapshot:
+        '''Return the cached market snapshot, fetching a new one if it has expired.
+        '''
+        with self._snapshot_lock:
+            now = time.monotonic()
+            if self._snapshot is None or now >= self._snapshot_expires_at:
+                self._snapshot = self.fetch_market_snapshot()
+                self._snapshot_expires_at = now + self.snapshot_ttl
+            return self._snapshot
+
+    def invalidate_market_snapshot(self) -> None:
+        with self._snapshot_lock:
+            self._snapshot = None
+
+    def update_market_snapshot(self, snapshot: MarketSnapshot) -> None:
+        '''Cache a snapshot received from elsewhere, such as a streaming ticker feed.
+        '''
+        with self._snapshot_lock:
+            self._snapshot = snapshot
+            self._snapshot_expires_at = time.monotonic() + self.snapshot_ttl
+
+    def get_ltp(self) -> float:
+        return self.get_market_snapshot().last
+
+    @abstractmethod
+    def create_order(self, side: str, quantity: float, price: float) -> str:
+        pass
+
+    def get_best_ask_price(self) -> float:
+        return self.get_market_snapshot().ask
+
+    def get_best_bid_price(self) -> float:
+        return self.get_market_snapshot().bid
+
+
+def _retry_after(res) -> float:
+    try:
+        return float(res.headers['Retry-After'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _timed(name: str, fn):
+    @functools.wraps(fn)
+    def timed(self, *args, **kwargs):
+        with get_registry().span('yajirobe_call_seconds', exchange=self.exchange or type(self).__name__, call=name):
+            return fn(self, *args, **kwargs)
+    return timed
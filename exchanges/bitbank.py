@@ -0,0 +1,273 @@
+import json
+import logging
+import os
+from urllib.parse import urlencode
+
+from exchanges.aio import AsyncRebalancer
+from exchanges.base import SYMBOL_SEPARATOR, Execution, MarketSnapshot, Order, Rebalancer
+from exchanges.instruments import Instrument, get_instrument_cache
+from exchanges.signing import HmacSigner, get_signer
+from transport import AsyncHttpTransport, HttpTransport
+
+
+logger = logging.getLogger()
+
+
+class BitbankRebalancer(Rebalancer):
+
+    pub_url: str = 'https://public.bitbank.cc'
+
+    prv_url: str = 'https://api.bitbank.cc'
+
+    # number of orders cancel_orders endpoint accepts at once
+    max_cancel_orders: int = 30
+
+    # milliseconds a signed request stays valid
+    time_window: int = 5000
+
+    exchange: str = 'bitbank'
+
+    # limits of query (GET) and update (POST) requests of private API are 10 and 6 per second
+    rate_limits: dict[str, float] = {'public': 10.0, 'private': 6.0}
+
+    # error code of too many requests
+    throttled_codes: tuple[int] = (10009,)
+
+    # used until instruments are fetched from the exchange
+    default_instruments = {
+            'btc_jpy': Instrument('btc_jpy', tick_size=1, lot_size=0.0001, min_size=0.0001),
+            'eth_jpy': Instrument('eth_jpy', tick_size=1, lot_size=0.0001, min_size=0.0001),
+            'xrp_jpy': Instrument('xrp_jpy', tick_size=0.001, lot_size=0.0001, min_size=0.0001),
+            }
+
+    def __init__(self, symbol: str, snapshot_ttl: float = None, transport: HttpTransport = None,
+                 api_key: str = None, api_secret: str = None):
+        super().__init__(symbol, snapshot_ttl, transport)
+        coins = symbol.split(SYMBOL_SEPARATOR)
+        self.asset1 = coins[0].lower()
+        self.asset2 = coins[1].lower()
+        self.pair = f'{self.asset1}_{self.asset2}'
+        # credentials of the environment are used unless those of another account are given
+        self.api_key = api_key or os.getenv('BITBANK_API_KEY')
+        self.api_secret = api_secret or os.getenv('BITBANK_API_SECRET')
+        self.instruments = get_instrument_cache('bitbank', self.__fetch_instruments, __class__.default_instruments)
+        self.get_instrument()
+
+    @property
+    def signer(self) -> HmacSigner:
+        return get_signer('bitbank', self.api_key, self.api_secret)
+
+    def __public_get(self, path: str):
+        return _get_data(self._request('public', 'GET', f"{__class__.pub_url}{path}"))
+
+    def __private_get(self, path: str, params: dict = None):
+        path = f'/v1{path}' + (f'?{urlencode(params)}' if params else '')
+        body = self._request('private', 'GET', f"{__class__.prv_url}{path}",
+                             sign=lambda: _create_auth_header(self.signer, path))
+        return _get_data(body)
+
+    def __private_post(self, path: str, params: dict):
+        data = json.dumps(params)
+        body = self._request('private', 'POST', f"{__class__.prv_url}/v1{path}",
+                             sign=lambda: _create_auth_header(self.signer, data), data=data)
+        return _get_data(body)
+
+    def is_throttled(self, res, body) -> bool:
+        return _is_throttled(res, body)
+
+    def get_balance(self) -> dict[str, float]:
+        return _parse_balance(self.__private_get('/user/assets'), self.asset1, self.asset2)
+
+    def cancel_all_orders(self):
+        self.cancel_orders([o.order_id for o in self.get_open_orders()])
+
+    def get_open_orders(self) -> list[Order]:
+        return _parse_orders(self.__private_get('/user/spot/active_orders', {'pair': self.pair}))
+
+    def cancel_orders(self, order_ids: list[str]) -> None:
+        for i in range(0, len(order_ids), __class__.max_cancel_orders):
+            ids = order_ids[i:i + __class__.max_cancel_orders]
+            logger.info(f"Cancel orders. [order_ids: {', '.join(ids)}]")
+            self.__private_post('/user/spot/cancel_orders', {'pair': self.pair, 'order_ids': [int(o) for o in ids]})
+
+    def get_executions(self, since: float, count: int = 1000) -> list[Execution]:
+        return _parse_executions(self.__private_get('/user/spot/trade_history', _executions_params(self, since, count)))
+
+    def fetch_market_snapshot(self) -> MarketSnapshot:
+        return _parse_ticker(self.__public_get(f'/{self.pair}/ticker'))
+
+    def create_order(self, side: str, quantity: float, price: float) -> str:
+        return self.__private_post('/user/spot/order', _order_params(self, side, quantity, price))['order_id']
+
+    def get_instrument(self) -> Instrument:
+        return self.instruments.get(self.pair)
+
+    def __fetch_instruments(self) -> dict[str, Instrument]:
+        return _parse_instruments(_get_data(self._request('public', 'GET', f"{__class__.prv_url}/v1/spot/pairs")))
+
+
+class AsyncBitbankRebalancer(AsyncRebalancer):
+    '''BitbankRebalancer on asyncio. Endpoints, limits and instruments are shared with BitbankRebalancer.
+    '''
+
+    pub_url: str = BitbankRebalancer.pub_url
+
+    prv_url: str = BitbankRebalancer.prv_url
+
+    max_cancel_orders: int = BitbankRebalancer.max_cancel_orders
+
+    exchange: str = 'bitbank'
+
+    rate_limits: dict[str, float] = BitbankRebalancer.rate_limits
+
+    def __init__(self, symbol: str, snapshot_ttl: float = None, transport: AsyncHttpTransport = None,
+                 api_key: str = None, api_secret: str = None):
+        super().__init__(symbol, snapshot_ttl, transport)
+        self.asset1 = self.asset1.lower()
+        self.asset2 = self.asset2.lower()
+        self.pair = f'{self.asset1}_{self.asset2}'
+        # credentials of the environment are used unless those of another account are given
+        self.api_key = api_key or os.getenv('BITBANK_API_KEY')
+        self.api_secret = api_secret or os.getenv('BITBANK_API_SECRET')
+        self.instruments = get_instrument_cache('bitbank', lambda: self._fetch_blocking(self.__fetch_instruments),
+                                                BitbankRebalancer.default_instruments)
+
+    @property
+    def signer(self) -> HmacSigner:
+        return get_signer('bitbank', self.api_key, self.api_secret)
+
+    async def __public_get(self, path: str):
+        return _get_data(await self._request('public', 'GET', f"{__class__.pub_url}{path}"))
+
+    async def __private_get(self, path: str, params: dict = None):
+        path = f'/v1{path}' + (f'?{urlencode(params)}' if params else '')
+        body = await self._request('private', 'GET', f"{__class__.prv_url}{path}",
+                                   sign=lambda: _create_auth_header(self.signer, path))
+        return _get_data(body)
+
+    async def __private_post(self, path: str, params: dict):
+        data = json.dumps(params)
+        body = await self._request('private', 'POST', f"{__class__.prv_url}/v1{path}",
+                                   sign=lambda: _create_auth_header(self.signer, data), data=data)
+        return _get_data(body)
+
+    def is_throttled(self, res, body) -> bool:
+        return _is_throttled(res, body)
+
+    async def get_balance(self) -> dict[str, float]:
+        return _parse_balance(await self.__private_get('/user/assets'), self.asset1, self.asset2)
+
+    async def cancel_all_orders(self):
+        await self.cancel_orders([o.order_id for o in await self.get_open_orders()])
+
+    async def get_open_orders(self) -> list[Order]:
+        return _parse_orders(await self.__private_get('/user/spot/active_orders', {'pair': self.pair}))
+
+    async def cancel_orders(self, order_ids: list[str]) -> None:
+        for i in range(0, len(order_ids), __class__.max_cancel_orders):
+            ids = order_ids[i:i + __class__.max_cancel_orders]
+            logger.info(f"Cancel orders. [order_ids: {', '.join(ids)}]")
+            await self.__private_post('/user/spot/cancel_orders', {'pair': self.pair, 'order_ids': [int(o) for o in ids]})
+
+    async def get_executions(self, since: float, count: int = 1000) -> list[Execution]:
+        return _parse_executions(await self.__private_get('/user/spot/trade_history',
+                                                          _executions_params(self, since, count)))
+
+    async def fetch_market_snapshot(self) -> MarketSnapshot:
+        return _parse_ticker(await self.__public_get(f'/{self.pair}/ticker'))
+
+    async def create_order(self, side: str, quantity: float, price: float) -> str:
+        return (await self.__private_post('/user/spot/order', _order_params(self, side, quantity, price)))['order_id']
+
+    def get_instrument(self) -> Instrument:
+        return self.instruments.get(self.pair)
+
+    async def __fetch_instruments(self) -> dict[str, Instrument]:
+        return _parse_instruments(_get_data(await self._request('public', 'GET', f"{__class__.prv_url}/v1/spot/pairs")))
+
+
+def _create_auth_header(signer: HmacSigner, text: str) -> dict:
+    # request time and time window authentication accepts concurrent requests
+    # arriving out of order, unlike the nonce one
+    request_time = signer.nonce()
+    time_window = str(BitbankRebalancer.time_window)
+    return {
+        'Content-Type': 'application/json',
+        'ACCESS-KEY': signer.api_key,
+        'ACCESS-REQUEST-TIME': request_time,
+        'ACCESS-TIME-WINDOW': time_window,
+        'ACCESS-SIGNATURE': signer.sign(request_time + time_window + text),
+    }
+
+
+def _is_throttled(res, body) -> bool:
+    if res.status_code == 429:
+        return True
+    return bool(body) and body.get('success') != 1 and \
+        (body.get('data') or {}).get('code') in BitbankRebalancer.throttled_codes
+
+
+def _executions_params(rebalancer, since: float, count: int) -> dict:
+    return {'pair': rebalancer.pair, 'count': count, 'since': int(since * 1000), 'order': 'asc'}
+
+
+def _order_params(rebalancer, side: str, quantity: float, price: float) -> dict:
+    return {
+            'pair': rebalancer.pair,
+            'amount': rebalancer.format_size(quantity),
+            'price': rebalancer.format_price(price),
+            'side': side,
+            'type': 'limit',
+            'post_only': True,
+            }
+
+
+def _parse_balance(data: dict, asset1: str, asset2: str) -> dict[str, float]:
+    assets = data['assets']
+    balance1 = float([a for a in assets if a['asset'] == asset1][0]['onhand_amount'])
+    balance2 = float([a for a in assets if a['asset'] == asset2][0]['onhand_amount'])
+    if not balance1 and not balance2:
+        raise SystemError(f"Neither coin has a balance. [{asset1}, {asset2}]")
+    return {asset1: balance1, asset2: balance2}
+
+
+def _parse_orders(data: dict) -> list[Order]:
+    return [Order(
+                order_id=str(o['order_id']),
+                side=o['side'],
+                price=float(o['price']),
+                quantity=float(o['remaining_amount']))
+            for o in data['orders'] if o['type'] == 'limit']
+
+
+def _parse_executions(data: dict) -> list[Execution]:
+    return [Execution(
+                execution_id=str(t['trade_id']),
+                side=t['side'],
+                price=float(t['price']),
+                quantity=float(t['amount']),
+                timestamp=int(t['executed_at']) / 1000)
+            for t in data['trades']]
+
+
+def _parse_ticker(ticker: dict) -> MarketSnapshot:
+    return MarketSnapshot(
+            last=float(ticker['last']),
+            bid=float(ticker['buy']),
+            ask=float(ticker['sell']),
+            timestamp=int(ticker['timestamp']) / 1000)
+
+
+def _parse_instruments(data: dict) -> dict[str, Instrument]:
+    return {p['name']: Instrument(
+                symbol=p['name'],
+                tick_size=10 ** -int(p['price_digits']),
+                lot_size=10 ** -int(p['amount_digits']),
+                min_size=float(p['unit_amount']))
+            for p in data['pairs']}
+
+
+def _get_data(body):
+    if body['success'] != 1:
+        raise SystemError(f"Failed to request bitbank API. [code: {body['data']['code']}]")
+    return body['data']
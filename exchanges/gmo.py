@@ -0,0 +1,353 @@
+from datetime import datetime
+import json
+import logging
+import os
+
+from exchanges.aio import AsyncRebalancer
+from exchanges.base import SYMBOL_SEPARATOR, Execution, MarketSnapshot, Order, Rebalancer
+from exchanges.instruments import Instrument, get_instrument_cache
+from exchanges.signing import HmacSigner, get_signer
+from transport import AsyncHttpTransport, HttpTransport
+
+
+logger = logging.getLogger()
+
+
+class GmoRebalancer(Rebalancer):
+
+    pub_url: str = 'https://api.coin.z.com/public'
+
+    prv_url: str = 'https://api.coin.z.com/private'
+
+    # number of orders cancelOrders endpoint accepts at once
+    max_cancel_orders: int = 10
+
+    # number of executions latestExecutions endpoint returns at once
+    max_executions: int = 100
+
+    can_amend_order: bool = True
+
+    exchange: str = 'gmo'
+
+    # private API limit of tier 1 accounts
+    rate_limits: dict[str, float] = {'public': 10.0, 'private': 6.0}
+
+    # error code of too many requests
+    throttled_codes: tuple[str] = ('ERR-5003',)
+
+    # used until instruments are fetched from the exchange
+    default_instruments = {
+            'BTC': Instrument('BTC', tick_size=1, lot_size=0.0001, min_size=0.0001),
+            'ETH': Instrument('ETH', tick_size=1, lot_size=0.0001, min_size=0.01),
+            'XRP': Instrument('XRP', tick_size=0.001, lot_size=1, min_size=1),
+            }
+
+    def __init__(self, symbol: str, snapshot_ttl: float = None, transport: HttpTransport = None,
+                 api_key: str = None, api_secret: str = None):
+        super().__init__(symbol, snapshot_ttl, transport)
+        # credentials of the environment are used unless those of another account are given
+        self.api_key = api_key or os.getenv('GMO_API_KEY')
+        self.api_secret = api_secret or os.getenv('GMO_API_SECRET')
+        coins = symbol.split(SYMBOL_SEPARATOR)
+        self.asset1 = coins[0].upper()
+        self.asset2 = coins[1].upper()
+        self.instruments = get_instrument_cache('gmo', self.__fetch_instruments, __class__.default_instruments)
+        self.get_instrument()
+
+    @property
+    def signer(self) -> HmacSigner:
+        return get_signer('gmo', self.api_key, self.api_secret)
+
+    def __create_auth_header(self, method: str, path: str, data: str = '') -> dict:
+        return _create_auth_header(self.signer, method, path, data)
+
+    def __private_post(self, path: str, params: dict) -> dict:
+        data = json.dumps(params)
+        return self._request('private', 'POST', f"{__class__.prv_url}{path}",
+                             sign=lambda: self.__create_auth_header('POST', path, data), data=data)
+
+    def is_throttled(self, res, body) -> bool:
+        return _is_throttled(res, body)
+
+    def get_balance(self) -> dict[str, float]:
+        path = '/v1/account/assets'
+        balance = self._request('private', 'GET', f"{__class__.prv_url}{path}",
+                                sign=lambda: self.__create_auth_header('GET', path))
+        return _parse_balance(balance, self.asset1, self.asset2)
+
+    def cancel_all_orders(self):
+        logger.info("Cancel all orders.")
+        path = '/v1/cancelBulkOrder'
+        params = {'symbols': [self.asset1]}
+        body = self.__private_post(path, params)
+
+        # check if error occurred
+        _raise_err_if_fail(body)
+
+    def get_open_orders(self) -> list[Order]:
+        path = '/v1/activeOrders'
+        body = self._request('private', 'GET', f"{__class__.prv_url}{path}",
+                             sign=lambda: self.__create_auth_header('GET', path),
+                             params={'symbol': self.asset1, 'page': 1, 'count': 100})
+        return _parse_orders(body)
+
+    def cancel_orders(self, order_ids: list[str]) -> None:
+        path = '/v1/cancelOrders'
+        for i in range(0, len(order_ids), __class__.max_cancel_orders):
+            ids = order_ids[i:i + __class__.max_cancel_orders]
+            logger.info(f"Cancel orders. [order_ids: {', '.join(ids)}]")
+            params = {'orderIds': [int(o) for o in ids]}
+            body = self.__private_post(path, params)
+
+            # check if error occurred
+            _raise_err_if_fail(body)
+
+    def amend_order(self, order_id: str, price: float) -> None:
+        path = '/v1/changeOrder'
+        params = {'orderId': int(order_id), 'price': self.format_price(price)}
+        body = self.__private_post(path, params)
+
+        # check if error occurred
+        _raise_err_if_fail(body)
+
+    def get_executions(self, since: float, count: int = 1000) -> list[Execution]:
+        # latestExecutions returns executions of the last day, newest first
+        path = '/v1/latestExecutions'
+        executions = []
+        page = 1
+        while True:
+            body = self._request('private', 'GET', f"{__class__.prv_url}{path}",
+                                 sign=lambda: self.__create_auth_header('GET', path),
+                                 params={'symbol': self.asset1, 'page': page, 'count': __class__.max_executions})
+            rows = _parse_executions(body)
+            executions.extend(rows)
+            if _is_last_page(rows, since):
+                break
+            page += 1
+        return _oldest_executions(executions, since, count)
+
+    def fetch_market_snapshot(self) -> MarketSnapshot:
+        return _parse_ticker(self._request('public', 'GET', f"{__class__.pub_url}/v1/ticker?symbol={self.asset1}"))
+
+    def create_order(self, side: str, quantity: float, price: float) -> str:
+        body = self.__private_post('/v1/order', _order_params(self, side, quantity, price))
+
+        # check if error occurred
+        _raise_err_if_fail(body)
+
+        return str(body['data'])
+
+    def get_instrument(self) -> Instrument:
+        return self.instruments.get(self.asset1)
+
+    def __fetch_instruments(self) -> dict[str, Instrument]:
+        return _parse_instruments(self._request('public', 'GET', f"{__class__.pub_url}/v1/symbols"))
+
+
+class AsyncGmoRebalancer(AsyncRebalancer):
+    '''GmoRebalancer on asyncio. Endpoints, limits and instruments are shared with GmoRebalancer.
+    '''
+
+    pub_url: str = GmoRebalancer.pub_url
+
+    prv_url: str = GmoRebalancer.prv_url
+
+    max_cancel_orders: int = GmoRebalancer.max_cancel_orders
+
+    max_executions: int = GmoRebalancer.max_executions
+
+    can_amend_order: bool = True
+
+    exchange: str = 'gmo'
+
+    rate_limits: dict[str, float] = GmoRebalancer.rate_limits
+
+    def __init__(self, symbol: str, snapshot_ttl: float = None, transport: AsyncHttpTransport = None,
+                 api_key: str = None, api_secret: str = None):
+        super().__init__(symbol, snapshot_ttl, transport)
+        # credentials of the environment are used unless those of another account are given
+        self.api_key = api_key or os.getenv('GMO_API_KEY')
+        self.api_secret = api_secret or os.getenv('GMO_API_SECRET')
+        self.asset1 = self.asset1.upper()
+        self.asset2 = self.asset2.upper()
+        self.instruments = get_instrument_cache('gmo', lambda: self._fetch_blocking(self.__fetch_instruments),
+                                                GmoRebalancer.default_instruments)
+
+    @property
+    def signer(self) -> HmacSigner:
+        return get_signer('gmo', self.api_key, self.api_secret)
+
+    async def __private_get(self, path: str, params: dict = None) -> dict:
+        return await self._request('private', 'GET', f"{__class__.prv_url}{path}",
+                                   sign=lambda: _create_auth_header(self.signer, 'GET', path), params=params)
+
+    async def __private_post(self, path: str, params: dict) -> dict:
+        data = json.dumps(params)
+        body = await self._request('private', 'POST', f"{__class__.prv_url}{path}",
+                                   sign=lambda: _create_auth_header(self.signer, 'POST', path, data), data=data)
+
+        # check if error occurred
+        _raise_err_if_fail(body)
+        return body
+
+    def is_throttled(self, res, body) -> bool:
+        return _is_throttled(res, body)
+
+    async def get_balance(self) -> dict[str, float]:
+        return _parse_balance(await self.__private_get('/v1/account/assets'), self.asset1, self.asset2)
+
+    async def cancel_all_orders(self):
+        logger.info("Cancel all orders.")
+        await self.__private_post('/v1/cancelBulkOrder', {'symbols': [self.asset1]})
+
+    async def get_open_orders(self) -> list[Order]:
+        return _parse_orders(await self.__private_get('/v1/activeOrders',
+                                                      {'symbol': self.asset1, 'page': 1, 'count': 100}))
+
+    async def cancel_orders(self, order_ids: list[str]) -> None:
+        for i in range(0, len(order_ids), __class__.max_cancel_orders):
+            ids = order_ids[i:i + __class__.max_cancel_orders]
+            logger.info(f"Cancel orders. [order_ids: {', '.join(ids)}]")
+            await self.__private_post('/v1/cancelOrders', {'orderIds': [int(o) for o in ids]})
+
+    async def amend_order(self, order_id: str, price: float) -> None:
+        await self.__private_post('/v1/changeOrder', {'orderId': int(order_id), 'price': self.format_price(price)})
+
+    async def get_executions(self, since: float, count: int = 1000) -> list[Execution]:
+        executions = []
+        page = 1
+        while True:
+            rows = _parse_executions(await self.__private_get(
+                    '/v1/latestExecutions', {'symbol': self.asset1, 'page': page, 'count': __class__.max_executions}))
+            executions.extend(rows)
+            if _is_last_page(rows, since):
+                break
+            page += 1
+        return _oldest_executions(executions, since, count)
+
+    async def fetch_market_snapshot(self) -> MarketSnapshot:
+        return _parse_ticker(await self._request('public', 'GET', f"{__class__.pub_url}/v1/ticker",
+                                                 params={'symbol': self.asset1}))
+
+    async def create_order(self, side: str, quantity: float, price: float) -> str:
+        body = await self.__private_post('/v1/order', _order_params(self, side, quantity, price))
+        return str(body['data'])
+
+    def get_instrument(self) -> Instrument:
+        return self.instruments.get(self.asset1)
+
+    async def __fetch_instruments(self) -> dict[str, Instrument]:
+        return _parse_instruments(await self._request('public', 'GET', f"{__class__.pub_url}/v1/symbols"))
+
+
+def _create_auth_header(signer: HmacSigner, method: str, path: str, data: str = '') -> dict:
+    timestamp = signer.nonce()
+    return {
+        'API-KEY': signer.api_key,
+        'API-TIMESTAMP': timestamp,
+        'API-SIGN': signer.sign(timestamp + method + path + data),
+    }
+
+
+def _is_throttled(res, body) -> bool:
+    if res.status_code == 429:
+        return True
+    return bool(body) and body.get('status') != 0 and any(
+            m.get('message_code') in GmoRebalancer.throttled_codes for m in body.get('messages', []))
+
+
+def _order_params(rebalancer, side: str, quantity: float, price: float) -> dict:
+    # adjust price and size to the instrument's grid
+    return {
+            'symbol': f'{rebalancer.asset1}',
+            'side': side.upper(),
+            'executionType': 'LIMIT',
+            'price': rebalancer.format_price(price),
+            'size': rebalancer.format_size(quantity),
+            'timeInForce': 'SOK',
+            }
+
+
+def _is_last_page(rows: list[Execution], since: float) -> bool:
+    # pages are newest first, so older pages have nothing at or after since
+    return len(rows) < GmoRebalancer.max_executions or rows[-1].timestamp < since
+
+
+def _oldest_executions(executions: list[Execution], since: float, count: int) -> list[Execution]:
+    # the oldest ones are returned, so executions after them are fetched by the next call from the last one
+    return sorted([e for e in executions if e.timestamp >= since], key=lambda e: e.timestamp)[:count]
+
+
+def _parse_timestamp(s: str) -> float:
+    return datetime.strptime(s, '%Y-%m-%dT%H:%M:%S.%f%z').timestamp()
+
+
+def _parse_balance(body: dict, asset1: str, asset2: str) -> dict[str, float]:
+
+    # check if error occurred
+    _raise_err_if_fail(body)
+
+    amounts = {b['symbol']: float(b['amount']) for b in body['data']}
+    balance = {asset1: amounts.get(asset1, 0.0), asset2: amounts.get(asset2, 0.0)}
+    if not balance[asset1] and not balance[asset2]:
+        raise SystemError(f"Neither coin has a balance. [{asset1}, {asset2}]")
+    return balance
+
+
+def _parse_orders(body: dict) -> list[Order]:
+
+    # check if error occurred
+    _raise_err_if_fail(body)
+
+    return [Order(
+                order_id=str(o['orderId']),
+                side=o['side'].lower(),
+                price=float(o['price']),
+                quantity=float(o['size']) - float(o['executedSize']))
+            for o in body['data'].get('list', []) if o['executionType'] == 'LIMIT']
+
+
+def _parse_executions(body: dict) -> list[Execution]:
+
+    # check if error occurred
+    _raise_err_if_fail(body)
+
+    return [Execution(
+                execution_id=str(e['executionId']),
+                side=e['side'].lower(),
+                price=float(e['price']),
+                quantity=float(e['size']),
+                timestamp=_parse_timestamp(e['timestamp']))
+            for e in body['data'].get('list', [])]
+
+
+def _parse_ticker(body: dict) -> MarketSnapshot:
+
+    # check if error occurred
+    _raise_err_if_fail(body)
+
+    ticker = body['data'][0]
+    return MarketSnapshot(
+            last=float(ticker['last']),
+            bid=float(ticker['bid']),
+            ask=float(ticker['ask']),
+            timestamp=_parse_timestamp(ticker['timestamp']))
+
+
+def _parse_instruments(body: dict) -> dict[str, Instrument]:
+
+    # check if error occurred
+    _raise_err_if_fail(body)
+
+    return {s['symbol']: Instrument(
+                symbol=s['symbol'],
+                tick_size=float(s['tickSize']),
+                lot_size=float(s['sizeStep']),
+                min_size=float(s['minOrderSize']))
+            for s in body['data']}
+
+
+def _raise_err_if_fail(body) -> None:
+    if body['status'] != 0:
+        err_msg = ', '.join([m['message_code'] + ':' + m['message_string'] for m in body['messages']])
+        raise SystemError(f"Failed to create order: {err_msg}")
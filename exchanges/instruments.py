@@ -0,0 +1,153 @@
+"""
+Instrument metadata (tick size, lot size and minimum order) of exchanges.
+
+Metadata is loaded from each exchange's symbols endpoint and kept in an
+on-disk cache shared by all rebalancers of the exchange. Stale entries are
+refreshed on a background thread, so looking up an instrument does not wait
+for the exchange unless the symbol has never been seen.
+"""
+from dataclasses import asdict, dataclass
+from decimal import Decimal
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable
+
+
+logger = logging.getLogger()
+
+# seconds after which cached metadata is refreshed
+DEFAULT_TTL = 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class Instrument:
+    symbol: str  # symbol name used by the exchange, such as 'BTC' or 'btc_jpy'
+    tick_size: float  # price step
+    lot_size: float  # quantity step
+    min_size: float  # minimum order quantity
+
+    @property
+    def price_prec(self) -> int:
+        '''Number of decimal places of prices.
+        '''
+        return max(-Decimal(repr(self.tick_size)).normalize().as_tuple().exponent, 0)
+
+
+def get_cache_dir() -> str:
+    return os.getenv('YAJIROBE_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'yajirobe')
+
+
+class InstrumentCache:
+    '''Instruments of one exchange cached in memory and on disk.
+
+    Parameters
+    ----------
+    exchange: str
+        Exchange name, used as the cache file name.
+    fetch: Callable[[], dict[str, Instrument]]
+        Loads all instruments from the exchange, keyed by symbol name.
+    defaults: dict[str, Instrument]
+        Instruments used until the first fetch has completed.
+    ttl: float
+        Seconds after which the instruments are fetched again.
+    '''
+
+    def __init__(self, exchange: str, fetch: Callable[[], dict[str, Instrument]],
+                 defaults: dict[str, Instrument] = None, ttl: float = DEFAULT_TTL, path: str = None):
+        self.exchange = exchange
+        self.fetch = fetch
+        self.ttl = ttl
+        self.path = path or os.path.join(get_cache_dir(), f'instruments-{exchange}.json')
+        self._instruments = dict(defaults or {})
+        self._fetched_at = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._refreshing = None
+
+    def _load(self) -> None:
+        try:
+            with open(self.path) as f:
+                cache = json.load(f)
+            self._instruments.update({k: Instrument(**v) for k, v in cache['instruments'].items()})
+            self._fetched_at = cache['fetched_at']
+            logger.debug(f"Loaded instruments from cache. [{self.path}]")
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignored broken instrument cache. [{self.path}, {e}]")
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        cache = {'fetched_at': self._fetched_at, 'instruments': {k: asdict(v) for k, v in self._instruments.items()}}
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix='.instruments-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp, self.path)
+
+    def refresh(self) -> None:
+        '''Fetch instruments from the exchange and write them to the cache file.
+        '''
+        instruments = self.fetch()
+        with self._lock:
+            self._instruments.update(instruments)
+            self._fetched_at = time.time()
+            try:
+                self._save()
+            except OSError as e:
+                logger.warning(f"Failed to write instrument cache. [{self.path}, {e}]")
+        logger.info(f"Refreshed instruments. [exchange: {self.exchange}, instruments: {len(instruments)}]")
+
+    def _refresh_in_background(self) -> None:
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Failed to refresh instruments. [exchange: {self.exchange}, error: {e}]")
+
+        if self._refreshing is None or not self._refreshing.is_alive():
+            self._refreshing = threading.Thread(target=run, name=f'instruments-{self.exchange}', daemon=True)
+            self._refreshing.start()
+
+    def get(self, symbol: str) -> Instrument:
+        '''Return the instrument of symbol.
+
+        Cached or default metadata is returned immediately, refreshing it in
+        the background when stale. Only a symbol unknown to both is fetched in
+        the calling thread.
+        '''
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+            instrument = self._instruments.get(symbol)
+            if instrument and time.time() - self._fetched_at >= self.ttl:
+                self._refresh_in_background()
+        if instrument:
+            return instrument
+
+        logger.info(f"Fetch instruments for unknown symbol. [exchange: {self.exchange}, symbol: {symbol}]")
+        self.refresh()
+        with self._lock:
+            instrument = self._instruments.get(symbol)
+        if not instrument:
+            raise ValueError(f"Symbol is not supported. [exchange: {self.exchange}, symbol: {symbol}]")
+        return instrument
+
+
+_caches: dict[str, InstrumentCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_instrument_cache(exchange: str, fetch: Callable[[], dict[str, Instrument]],
+                         defaults: dict[str, Instrument] = None) -> InstrumentCache:
+    '''Return the process wide cache of an exchange, creating it at first use.
+    '''
+    with _caches_lock:
+        cache = _caches.get(exchange)
+        if cache is None:
+            cache = _caches[exchange] = InstrumentCache(exchange, fetch, defaults)
+        return cache
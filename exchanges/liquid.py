@@ -0,0 +1,88 @@
+import logging
+import time
+
+from liquidpy.api import *
+
+from exchanges.base import MarketSnapshot, Order, Rebalancer
+from exchanges.instruments import Instrument, get_instrument_cache
+from transport import HttpTransport
+
+
+logger = logging.getLogger()
+
+
+class LiquidRebalancer(Rebalancer):
+
+    # quantity step, Liquid accepts quantities to 8 decimal places
+    lot_size: float = 0.00000001
+
+    def __init__(self, symbol: str, snapshot_ttl: float = None, transport: HttpTransport = None):
+        super().__init__(symbol, snapshot_ttl, transport)
+        self.client = Liquid()
+        if symbol == 'BTC/JPY':
+            self.product_id = PRODUCT_ID_BTCJPY
+        elif symbol == 'ETH/JPY':
+            self.product_id = PRODUCT_ID_ETHJPY
+        elif symbol == 'XRP/JPY':
+            self.product_id = PRODUCT_ID_XRPJPY
+        elif symbol == 'BCH/JPY':
+            self.product_id = PRODUCT_ID_BCHJPY
+        elif symbol == 'QASH/JPY':
+            self.product_id = PRODUCT_ID_QASHJPY
+        elif symbol == 'SOL/JPY':
+            self.product_id = PRODUCT_ID_SOLJPY
+        elif symbol == 'FTT/JPY':
+            self.product_id = PRODUCT_ID_FTTJPY
+        self.pair = f'{self.asset1}{self.asset2}'.upper()
+        self.instruments = get_instrument_cache('liquid', self.__fetch_instruments)
+        self.get_instrument()
+
+    def get_balance(self) -> dict[str, float]:
+        balance = self.client.get_accounts_balance()
+        asset1 = sum([float(b['balance']) for b in balance if b['currency'] == self.asset1])
+        asset2 = sum([float(b['balance']) for b in balance if b['currency'] == self.asset2])
+        if not asset1 and not asset2:
+            raise SystemError(f"Neither coin has a balance. [{self.asset1}, {self.asset2}]")
+        return {self.asset1: asset1, self.asset2: asset2}
+
+    def cancel_all_orders(self):
+        logger.info(f"Cancel all orders.")
+        self.client.cancel_all_orders()
+
+    def get_open_orders(self) -> list[Order]:
+        orders = self.client.get_orders(status='live')
+        orders = orders['models'] if 'current_page' in orders else orders
+        return [Order(
+                    order_id=str(o['id']),
+                    side=o['side'],
+                    price=float(o['price']),
+                    quantity=float(o['quantity']) - float(o['filled_quantity']))
+                for o in orders if int(o['product_id']) == self.product_id and o['order_type'] == 'limit']
+
+    def cancel_orders(self, order_ids: list[str]) -> None:
+        # Liquid has no endpoint cancelling orders at once
+        for order_id in order_ids:
+            logger.info(f"Cancel order. [order_id: {order_id}]")
+            self.client.cancel_order(order_id)
+
+    def fetch_market_snapshot(self) -> MarketSnapshot:
+        product = self.client.get_products(product_id=self.product_id)
+        return MarketSnapshot(
+                last=float(product['last_traded_price']),
+                bid=float(product['market_bid']),
+                ask=float(product['market_ask']),
+                timestamp=float(product.get('last_event_timestamp') or time.time()))
+
+    def create_order(self, side: str, quantity: float, price: float) -> str:
+        return self.client.create_order(self.product_id, side, quantity, price)['id']
+
+    def get_instrument(self) -> Instrument:
+        return self.instruments.get(self.pair)
+
+    def __fetch_instruments(self) -> dict[str, Instrument]:
+        return {p['currency_pair_code']: Instrument(
+                    symbol=p['currency_pair_code'],
+                    tick_size=float(p['tick_size']),
+                    lot_size=__class__.lot_size,
+                    min_size=MIN_ORDER_QUANTITY.get(int(p['id']), __class__.lot_size))
+                for p in self.client.get_products()}
@@ -0,0 +1,143 @@
+"""
+Rate limiting of exchange API calls.
+
+Every request of an adapter takes a token from the bucket of its exchange
+and endpoint class (public or private). When the exchange answers that
+requests are too many, the bucket rate is halved and requests pause for a
+while; it then recovers step by step on successful requests.
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+
+
+logger = logging.getLogger()
+
+
+class RateLimitError(SystemError):
+    '''Raised when an exchange keeps throttling a request after retries.
+    '''
+    pass
+
+
+class AdaptiveRateLimiter:
+    '''Token bucket whose rate adapts to throttling responses.
+
+    Parameters
+    ----------
+    rate: float
+        Maximum number of requests per second. float('inf') does not limit requests.
+    burst: float
+        Bucket size, the number of requests that can be sent at once.
+    min_rate: float
+        Rate is never lowered below this. Default is an eighth of rate.
+    recovery: float
+        Fraction of the maximum rate added back after each successful request.
+    '''
+
+    def __init__(self, rate: float, burst: float = None, min_rate: float = None, recovery: float = 0.05):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst or max(rate, 1.0)
+        self.min_rate = min_rate or rate / 8
+        self.recovery = recovery
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self._tokens + (now - self._updated) * self.rate, self.burst)
+        self._updated = now
+
+    def _take(self) -> float:
+        '''Take a token and return None, or return the seconds to wait before trying again.
+        '''
+        with self._lock:
+            now = time.monotonic()
+            if math.isinf(self.rate):
+                # unlimited, only a pause after throttling makes requests wait.
+                # refilling would multiply an elapsed time of 0 by inf
+                return None if now >= self._paused_until else self._paused_until - now
+            self._refill(now)
+            if now >= self._paused_until and self._tokens >= 1:
+                self._tokens -= 1
+                return None
+            return max(self._paused_until - now, (1 - self._tokens) / self.rate)
+
+    def acquire(self) -> float:
+        '''Wait for a token and return the seconds waited.
+        '''
+        waited = 0.0
+        while (wait := self._take()) is not None:
+            time.sleep(wait)
+            waited += wait
+        return waited
+
+    async def acquire_async(self) -> float:
+        '''Wait for a token without blocking the event loop and return the seconds waited.
+        '''
+        waited = 0.0
+        while (wait := self._take()) is not None:
+            await asyncio.sleep(wait)
+            waited += wait
+        return waited
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.rate + self.max_rate * self.recovery, self.max_rate)
+
+    def on_throttled(self, retry_after: float = None) -> float:
+        '''Halve the rate and pause requests. Return the seconds of the pause.
+        '''
+        with self._lock:
+            self.rate = max(self.rate / 2, self.min_rate)
+            self._tokens = 0
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            return pause
+
+
+_limiters: dict[tuple[str, str], AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+# part of the rate of each endpoint class this process may use
+_shares: dict[str, float] = {}
+
+
+def get_rate_limiter(exchange: str, kind: str, rate: float) -> AdaptiveRateLimiter:
+    '''Return the process wide limiter of an exchange's endpoint class, creating it at first use.
+    '''
+    with _limiters_lock:
+        limiter = _limiters.get((exchange, kind))
+        if limiter is None:
+            limiter = _limiters[(exchange, kind)] = AdaptiveRateLimiter(rate * _shares.get(kind, 1.0))
+        return limiter
+
+
+def set_rate_share(kind: str, share: float) -> None:
+    '''Scale the rate of limiters of an endpoint class created from now on.
+
+    Processes calling an exchange from the same address split its budget, so
+    each of n processes takes a share of 1 / n.
+    '''
+    with _limiters_lock:
+        _shares[kind] = share
+
+
+def set_rate_limiter(exchange: str, kind: str, limiter: AdaptiveRateLimiter) -> None:
+    '''Replace the process wide limiter of an exchange's endpoint class.
+    '''
+    with _limiters_lock:
+        _limiters[(exchange, kind)] = limiter
+
+
+def clear_rate_limiters(kind: str) -> None:
+    '''Forget the process wide limiters of an endpoint class, so the next account starts from the configured rates.
+    '''
+    with _limiters_lock:
+        for key in [k for k in _limiters if k[1] == kind]:
+            del _limiters[key]
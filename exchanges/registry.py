@@ -0,0 +1,101 @@
+"""
+Registry of exchange adapters keyed by exchange name.
+
+Adapters are registered as 'module:ClassName' strings and the module is
+imported only when the exchange is selected, so a run does not pay for the
+SDKs of the exchanges it does not use. Third-party packages can add
+adapters through the 'yajirobe.exchanges' entry point group. Async adapters
+are registered apart from them and have no entry point group.
+"""
+from importlib import import_module
+from importlib.metadata import entry_points
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger()
+
+ENTRY_POINT_GROUP = 'yajirobe.exchanges'
+
+_adapters: dict[str, str] = {
+    'bitbank': 'exchanges.bitbank:BitbankRebalancer',
+    'gmo': 'exchanges.gmo:GmoRebalancer',
+    'liquid': 'exchanges.liquid:LiquidRebalancer',
+    'simulated': 'exchanges.simulated:SimulatedRebalancer',
+}
+_loaded: dict[str, type] = {}
+_async_adapters: dict[str, str] = {
+    'bitbank': 'exchanges.bitbank:AsyncBitbankRebalancer',
+    'gmo': 'exchanges.gmo:AsyncGmoRebalancer',
+}
+_lock = threading.RLock()
+
+# seconds taken to import each loaded adapter
+timings: dict[str, float] = {}
+
+
+def register(name: str, target) -> None:
+    '''Register an adapter class, or a 'module:ClassName' string imported at first use.
+    '''
+    with _lock:
+        if isinstance(target, str):
+            _adapters[name.lower()] = target
+            _loaded.pop(name.lower(), None)
+        else:
+            _adapters[name.lower()] = f'{target.__module__}:{target.__qualname__}'
+            _loaded[name.lower()] = target
+
+
+def _find_entry_point(name: str):
+    for ep in entry_points(group=ENTRY_POINT_GROUP):
+        if ep.name.lower() == name:
+            return ep
+    return None
+
+
+def get_rebalancer_class(name: str) -> type:
+    '''Return the adapter class of an exchange, importing its module if needed.
+    '''
+    name = name.lower()
+    with _lock:
+        if name in _loaded:
+            return _loaded[name]
+
+        start = time.perf_counter()
+        target = _adapters.get(name)
+        if target:
+            module, _, attr = target.partition(':')
+            cls = getattr(import_module(module), attr)
+        else:
+            ep = _find_entry_point(name)
+            if ep is None:
+                raise ValueError(f"exchange is not supported. [{name}]")
+            cls = ep.load()
+        timings[name] = time.perf_counter() - start
+        logger.debug(f"Loaded exchange adapter. [{name}: {cls.__name__}, {timings[name] * 1000:.1f}ms]")
+
+        _loaded[name] = cls
+        return cls
+
+
+def get_async_rebalancer_class(name: str) -> type:
+    '''Return the AsyncRebalancer adapter class of an exchange, importing its module if needed.
+    '''
+    target = _async_adapters.get(name.lower())
+    if target is None:
+        raise ValueError(f"exchange has no async adapter. [{name.lower()}]")
+    module, _, attr = target.partition(':')
+    return getattr(import_module(module), attr)
+
+
+def available_exchanges(include_entry_points: bool = True) -> list[str]:
+    '''Return names of built-in, registered and entry point adapters without importing them.
+
+    Finding entry points scans the metadata of every installed distribution,
+    so callers on the startup path can leave them out.
+    '''
+    names = set(_adapters)
+    if include_entry_points:
+        names.update(ep.name.lower() for ep in entry_points(group=ENTRY_POINT_GROUP))
+    return sorted(names)
@@ -0,0 +1,78 @@
+"""
+Request signing of private APIs.
+
+Nonces are strictly increasing milliseconds, so private requests made in the
+same millisecond from several threads never share a timestamp. A signer
+keeps the HMAC key state of its secret and only copies it for each request.
+"""
+import hashlib
+import hmac
+import threading
+import time
+
+
+class NonceGenerator:
+    '''Strictly increasing nonces in unix milliseconds, safe to share between threads.
+
+    If more than one nonce is requested within a millisecond, the next ones are
+    taken from the following milliseconds.
+    '''
+
+    def __init__(self):
+        self._last = 0
+        self._lock = threading.Lock()
+
+    def next(self) -> int:
+        with self._lock:
+            self._last = max(time.time_ns() // 1_000_000, self._last + 1)
+            return self._last
+
+
+class HmacSigner:
+    '''HMAC-SHA256 signer of an API key.
+
+    Parameters
+    ----------
+    api_key: str
+        API key sent along with the signature.
+    api_secret: str
+        Secret used as the HMAC key. It is encoded once when the signer is created.
+    nonces: NonceGenerator
+        Generator of the nonces. Signers of the same API key must share it.
+    '''
+
+    def __init__(self, api_key: str, api_secret: str, nonces: NonceGenerator = None):
+        if not api_key or not api_secret:
+            raise ValueError('API key and secret are required for private API.')
+        self.api_key = api_key
+        self.nonces = nonces or NonceGenerator()
+        self._mac = hmac.new(api_secret.encode('ascii'), digestmod=hashlib.sha256)
+
+    def nonce(self) -> str:
+        return str(self.nonces.next())
+
+    def sign(self, text: str) -> str:
+        mac = self._mac.copy()
+        mac.update(text.encode('ascii'))
+        return mac.hexdigest()
+
+
+_signers: dict[tuple[str, str], HmacSigner] = {}
+_signers_lock = threading.Lock()
+
+
+def get_signer(exchange: str, api_key: str, api_secret: str) -> HmacSigner:
+    '''Return the process wide signer of an API key, so every adapter using the key shares its nonces.
+    '''
+    with _signers_lock:
+        signer = _signers.get((exchange, api_key))
+        if signer is None:
+            signer = _signers[(exchange, api_key)] = HmacSigner(api_key, api_secret)
+        return signer
+
+
+def clear_signers() -> None:
+    '''Forget the process wide signers, such as when the process starts working for another account.
+    '''
+    with _signers_lock:
+        _signers.clear()
@@ -0,0 +1,425 @@
+"""
+Paper-trading exchange running in memory.
+
+SimulatedExchange keeps a limit order book per symbol and the balances of
+any number of accounts, and matches orders against each other and against
+a synthetic market following a price path. SimulatedRebalancer trades on it
+without credentials or network, so the rebalancing logic can be load tested
+with thousands of symbols and accounts in one process.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import ROUND_CEILING, ROUND_FLOOR
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Callable, Iterable, Iterator
+
+from exchanges.base import SYMBOL_SEPARATOR, Execution, MarketSnapshot, Order, Rebalancer
+from exchanges.instruments import Instrument
+from exchanges.ticks import TickGrid
+from transport import HttpTransport
+
+
+# prices the default price path starts from, by coin
+START_PRICES = {'BTC': 5_000_000, 'ETH': 300_000, 'XRP': 100}
+
+DEFAULT_BALANCES = {'JPY': 1_000_000, 'BTC': 0.1, 'ETH': 1.0, 'XRP': 10_000}
+
+
+def random_walk(start: float, volatility: float = 0.001, seed=None) -> Iterator[float]:
+    '''Yield prices of a geometric random walk.
+    '''
+    rand = random.Random(seed)
+    price = start
+    while True:
+        yield price
+        price *= 1 + rand.gauss(0, volatility)
+
+
+def default_price_path(symbol: str) -> Iterator[float]:
+    '''Random walk seeded by the symbol name, so every run sees the same prices.
+    '''
+    return random_walk(START_PRICES.get(symbol.split(SYMBOL_SEPARATOR)[0], 1000), seed=symbol)
+
+
+def default_instrument(symbol: str, price: float) -> Instrument:
+    return Instrument(symbol, tick_size=1 if price >= 10_000 else 0.001, lot_size=0.0001, min_size=0.0001)
+
+
+@dataclass
+class SimulatedOrder:
+    order_id: str
+    account: str
+    symbol: str
+    side: str  # 'buy' or 'sell'
+    price: float
+    quantity: float  # remaining quantity
+    seq: int  # arrival order, for time priority
+    active: bool = True
+
+
+class _Book:
+    '''Orders of a symbol and the synthetic market around its price path.
+    '''
+
+    def __init__(self, symbol: str, prices: Iterator[float], spread: float, instrument: Instrument = None):
+        self.symbol = symbol
+        self.prices = iter(prices)
+        self.spread = spread
+        self.price = next(self.prices)
+        self.instrument = instrument or default_instrument(symbol, self.price)
+        self.grid = TickGrid(self.instrument)
+        self.bids = []  # heap of (-price, seq, order)
+        self.asks = []  # heap of (price, seq, order)
+        self.timestamp = time.time()
+        self.__quote()
+
+    def __quote(self) -> None:
+        half = self.price * self.spread / 2
+        bid_ticks = self.grid.to_ticks(self.price - half, ROUND_FLOOR)
+        ask_ticks = max(self.grid.to_ticks(self.price + half, ROUND_CEILING), bid_ticks + 1)
+        self.bid = float(self.grid.price(bid_ticks))
+        self.ask = float(self.grid.price(ask_ticks))
+
+    def advance(self) -> None:
+        self.price = next(self.prices)
+        self.timestamp = time.time()
+        self.__quote()
+
+    def top(self, side: str) -> SimulatedOrder:
+        '''Return the best active order of a side, dropping canceled ones.
+        '''
+        heap = self.bids if side == 'buy' else self.asks
+        while heap and not heap[0][2].active:
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
+    def rest(self, order: SimulatedOrder) -> None:
+        if order.side == 'buy':
+            heapq.heappush(self.bids, (-order.price, order.seq, order))
+        else:
+            heapq.heappush(self.asks, (order.price, order.seq, order))
+
+    def best_bid(self) -> float:
+        top = self.top('buy')
+        return max(self.bid, top.price) if top else self.bid
+
+    def best_ask(self) -> float:
+        top = self.top('sell')
+        return min(self.ask, top.price) if top else self.ask
+
+
+class SimulatedExchange:
+    '''Matching engine of simulated symbols and accounts.
+
+    Parameters
+    ----------
+    price_path: Callable[[str], Iterable[float]]
+        Returns the prices a symbol goes through. Default is a random walk seeded by the symbol.
+    spread: float
+        Spread of the synthetic market relative to the price.
+    maker_fee: float
+        Fee rate of orders filled while resting. Negative values are rebates.
+    taker_fee: float
+        Fee rate of orders filled on arrival.
+    latency: float
+        Seconds every call of SimulatedRebalancer waits, to emulate the network.
+    balances: dict[str, float]
+        Balances new accounts start with, keyed by upper case asset name.
+    auto_step: bool
+        If True, fetching the market of a symbol advances its price path by one step.
+        Otherwise prices move only on step().
+    instruments: dict[str, Instrument]
+        Instruments of symbols such as 'BTC/JPY'. Others get a default one.
+    '''
+
+    def __init__(self, price_path: Callable[[str], Iterable[float]] = default_price_path, spread: float = 0.0002,
+                 maker_fee: float = 0.0, taker_fee: float = 0.0, latency: float = 0.0,
+                 balances: dict[str, float] = None, auto_step: bool = True, instruments: dict[str, Instrument] = None):
+        self.price_path = price_path
+        self.spread = spread
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.latency = latency
+        self.default_balances = dict(DEFAULT_BALANCES if balances is None else balances)
+        self.auto_step = auto_step
+        self.instruments = instruments or {}
+        self.books: dict[str, _Book] = {}
+        self.orders: dict[str, SimulatedOrder] = {}
+        self.fees = 0.0  # fees collected in quote currencies
+        self._balances: dict[str, dict[str, float]] = {}
+        self._reserved: dict[str, dict[str, float]] = {}
+        self._fills: dict[tuple[str, str], list[Execution]] = defaultdict(list)
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._lock = threading.RLock()
+
+    def delay(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+
+    def book(self, symbol: str) -> _Book:
+        with self._lock:
+            book = self.books.get(symbol)
+            if book is None:
+                book = self.books[symbol] = _Book(symbol, self.price_path(symbol), self.spread,
+                                                  self.instruments.get(symbol))
+            return book
+
+    def __account(self, account: str) -> dict[str, float]:
+        balances = self._balances.get(account)
+        if balances is None:
+            balances = self._balances[account] = defaultdict(float, self.default_balances)
+            self._reserved[account] = defaultdict(float)
+        return balances
+
+    def balances(self, account: str) -> dict[str, float]:
+        with self._lock:
+            return dict(self.__account(account))
+
+    def step(self, symbol: str = None) -> None:
+        '''Advance the price path of a symbol, or of every symbol, and fill the orders the market crosses.
+        '''
+        with self._lock:
+            for book in [self.book(symbol)] if symbol else list(self.books.values()):
+                book.advance()
+                self.__match_market(book)
+
+    def ticker(self, symbol: str) -> MarketSnapshot:
+        with self._lock:
+            book = self.book(symbol)
+            if self.auto_step:
+                book.advance()
+                self.__match_market(book)
+            return MarketSnapshot(last=book.price, bid=book.best_bid(), ask=book.best_ask(), timestamp=book.timestamp)
+
+    def place(self, account: str, symbol: str, side: str, price: float, quantity: float,
+              post_only: bool = True) -> str:
+        '''Place a limit order and return its id.
+
+        A post-only order that would be filled on arrival is rejected. Other
+        orders are filled against resting orders and then the synthetic
+        market as far as their price allows, and the rest of them rests.
+        '''
+        with self._lock:
+            book = self.book(symbol)
+            self.__account(account)
+            if quantity < book.instrument.min_size:
+                raise SystemError(f"Order size is below the minimum. [symbol: {symbol}, size: {quantity}]")
+
+            crosses = price >= book.best_ask() if side == 'buy' else price <= book.best_bid()
+            if crosses and post_only:
+                raise SystemError(f"Post-only order would be filled on arrival. [symbol: {symbol}, side: {side}, price: {price}]")
+
+            # reserve what the order may spend
+            self.__reserve(account, symbol, side, price, quantity)
+
+            order = SimulatedOrder(str(next(self._ids)), account, symbol, side, price, quantity, next(self._seq))
+            self.orders[order.order_id] = order
+            if crosses:
+                self.__match_incoming(book, order)
+            if order.quantity > 0:
+                book.rest(order)
+            else:
+                order.active = False
+            return order.order_id
+
+    def cancel(self, account: str, order_ids: list[str]) -> None:
+        with self._lock:
+            for i in order_ids:
+                order = self.orders.get(i)
+                if order is None or order.account != account or not order.active:
+                    raise SystemError(f"Order is not active. [order_id: {i}]")
+                order.active = False
+                self.__release(order, order.quantity)
+                del self.orders[i]
+
+    def amend(self, account: str, order_id: str, price: float) -> None:
+        '''Change the price of a resting order. It loses its time priority.
+        '''
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None or order.account != account or not order.active:
+                raise SystemError(f"Order is not active. [order_id: {order_id}]")
+            book = self.book(order.symbol)
+            if (price >= book.best_ask()) if order.side == 'buy' else (price <= book.best_bid()):
+                raise SystemError(f"Amended order would be filled on arrival. [order_id: {order_id}, price: {price}]")
+            self.__release(order, order.quantity)
+            try:
+                self.__reserve(account, order.symbol, order.side, price, order.quantity)
+            except SystemError:
+                self.__reserve(account, order.symbol, order.side, order.price, order.quantity)
+                raise
+
+            # the order keeps its id, a new entry of the book replaces the old one
+            order.active = False
+            amended = SimulatedOrder(order_id, account, order.symbol, order.side, price, order.quantity, next(self._seq))
+            self.orders[order_id] = amended
+            book.rest(amended)
+
+    def open_orders(self, account: str, symbol: str) -> list[Order]:
+        with self._lock:
+            return [Order(o.order_id, o.side, o.price, o.quantity)
+                    for o in self.orders.values() if o.account == account and o.symbol == symbol and o.active]
+
+    @property
+    def fill_count(self) -> int:
+        with self._lock:
+            return sum([len(v) for v in self._fills.values()])
+
+    def executions(self, account: str, symbol: str, since: float = 0.0) -> list[Execution]:
+        with self._lock:
+            return [e for e in self._fills[(account, symbol)] if e.timestamp >= since]
+
+    def __reservation(self, symbol: str, side: str, price: float, quantity: float) -> tuple[str, float]:
+        '''Return the asset and amount an order may spend, including the fee.
+        '''
+        base, quote = symbol.split(SYMBOL_SEPARATOR)
+        if side == 'buy':
+            return quote, price * quantity * (1 + max(self.maker_fee, self.taker_fee, 0.0))
+        return base, quantity
+
+    def __reserve(self, account: str, symbol: str, side: str, price: float, quantity: float) -> None:
+        asset, amount = self.__reservation(symbol, side, price, quantity)
+        reserved = self._reserved[account]
+        if self._balances[account][asset] - reserved[asset] < amount - 1e-12:
+            raise SystemError(f"Insufficient balance. [account: {account}, asset: {asset}, required: {amount}]")
+        reserved[asset] += amount
+
+    def __release(self, order: SimulatedOrder, quantity: float) -> None:
+        asset, amount = self.__reservation(order.symbol, order.side, order.price, quantity)
+        reserved = self._reserved[order.account]
+        reserved[asset] = max(reserved[asset] - amount, 0.0)
+
+    def __fill(self, order: SimulatedOrder, price: float, quantity: float, fee_rate: float) -> None:
+        base, quote = order.symbol.split(SYMBOL_SEPARATOR)
+        balances = self._balances[order.account]
+        self.__release(order, quantity)
+        value = price * quantity
+        fee = value * fee_rate
+        if order.side == 'buy':
+            balances[base] += quantity
+            balances[quote] -= value + fee
+        else:
+            balances[base] -= quantity
+            balances[quote] += value - fee
+        self.fees += fee
+        order.quantity -= quantity
+        self._fills[(order.account, order.symbol)].append(Execution(
+                execution_id=str(next(self._ids)), side=order.side, price=price, quantity=quantity,
+                timestamp=time.time()))
+        if order.quantity <= 1e-12:
+            order.quantity = 0.0
+            order.active = False
+            self.orders.pop(order.order_id, None)
+
+    def __match_incoming(self, book: _Book, order: SimulatedOrder) -> None:
+        opposite = 'sell' if order.side == 'buy' else 'buy'
+        while order.quantity > 0:
+            resting = book.top(opposite)
+            if resting and ((resting.price <= order.price) if order.side == 'buy' else (resting.price >= order.price)) \
+                    and ((resting.price <= book.ask) if order.side == 'buy' else (resting.price >= book.bid)):
+                quantity = min(order.quantity, resting.quantity)
+                self.__fill(resting, resting.price, quantity, self.maker_fee)
+                self.__fill(order, resting.price, quantity, self.taker_fee)
+                continue
+
+            # the rest is filled by the synthetic market if the price reaches it
+            market = book.ask if order.side == 'buy' else book.bid
+            if (order.price >= market) if order.side == 'buy' else (order.price <= market):
+                self.__fill(order, market, order.quantity, self.taker_fee)
+            return
+
+    def __match_market(self, book: _Book) -> None:
+        # resting orders crossed by the synthetic market are filled at their own price
+        while (o := book.top('buy')) and o.price >= book.ask:
+            self.__fill(o, o.price, o.quantity, self.maker_fee)
+        while (o := book.top('sell')) and o.price <= book.bid:
+            self.__fill(o, o.price, o.quantity, self.maker_fee)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_simulated_exchange() -> SimulatedExchange:
+    '''Return the process wide simulated exchange, creating it at first use.
+    '''
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = SimulatedExchange()
+        return _engine
+
+
+def set_simulated_exchange(engine: SimulatedExchange) -> None:
+    global _engine
+    with _engine_lock:
+        _engine = engine
+
+
+class SimulatedRebalancer(Rebalancer):
+    '''Rebalancer trading on a SimulatedExchange.
+
+    Parameters
+    ----------
+    account: str
+        Account whose balances and orders are used.
+    engine: SimulatedExchange
+        Exchange to trade on. Default is the process wide one.
+    '''
+
+    exchange: str = 'simulated'
+
+    can_amend_order: bool = True
+
+    # every fetch sees the latest simulated market
+    snapshot_ttl: float = 0.0
+
+    def __init__(self, symbol: str, snapshot_ttl: float = None, transport: HttpTransport = None,
+                 account: str = 'default', engine: SimulatedExchange = None):
+        super().__init__(symbol, snapshot_ttl, transport)
+        self.asset1 = self.asset1.upper()
+        self.asset2 = self.asset2.upper()
+        self.symbol = f'{self.asset1}{SYMBOL_SEPARATOR}{self.asset2}'
+        self.account = account
+        self.engine = engine or get_simulated_exchange()
+
+    def get_balance(self) -> dict[str, float]:
+        self.engine.delay()
+        balances = self.engine.balances(self.account)
+        return {self.asset1: balances.get(self.asset1, 0.0), self.asset2: balances.get(self.asset2, 0.0)}
+
+    def cancel_all_orders(self):
+        self.cancel_orders([o.order_id for o in self.get_open_orders()])
+
+    def get_open_orders(self) -> list[Order]:
+        self.engine.delay()
+        return self.engine.open_orders(self.account, self.symbol)
+
+    def cancel_orders(self, order_ids: list[str]) -> None:
+        self.engine.delay()
+        self.engine.cancel(self.account, order_ids)
+
+    def amend_order(self, order_id: str, price: float) -> None:
+        self.engine.delay()
+        self.engine.amend(self.account, order_id, float(self.format_price(price)))
+
+    def fetch_market_snapshot(self) -> MarketSnapshot:
+        self.engine.delay()
+        return self.engine.ticker(self.symbol)
+
+    def get_instrument(self) -> Instrument:
+        return self.engine.book(self.symbol).instrument
+
+    def create_order(self, side: str, quantity: float, price: float) -> str:
+        self.engine.delay()
+        return self.engine.place(self.account, self.symbol, side,
+                                 float(self.format_price(price)), float(self.format_size(quantity)))
+
+    def get_executions(self, since: float, count: int = 1000) -> list[Execution]:
+        self.engine.delay()
+        return self.engine.executions(self.account, self.symbol, since)[:count]
@@ -0,0 +1,61 @@
+"""
+Integer tick and lot arithmetic of instruments.
+
+Prices and sizes are converted to integer numbers of ticks and lots with
+exact decimal rounding, so the values sent to exchanges are always on the
+instrument's grid and formatted without exponents.
+"""
+from decimal import Decimal, ROUND_FLOOR, ROUND_HALF_EVEN
+
+from exchanges.instruments import Instrument
+
+
+def to_decimal(value) -> Decimal:
+    '''Convert a number to Decimal, using the shortest repr of floats so that 0.1 stays 0.1.
+    '''
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return Decimal(value)
+
+
+class TickGrid:
+    '''Price and size grid of an instrument.
+
+    Parameters
+    ----------
+    instrument: Instrument
+        Instrument whose tick size and lot size define the grid.
+    '''
+
+    def __init__(self, instrument: Instrument):
+        self.instrument = instrument
+        self.tick = to_decimal(instrument.tick_size).normalize()
+        self.lot = to_decimal(instrument.lot_size).normalize()
+
+    @staticmethod
+    def _count(value, step: Decimal, rounding: str) -> int:
+        return int((to_decimal(value) / step).to_integral_value(rounding=rounding))
+
+    def to_ticks(self, price, rounding: str = ROUND_HALF_EVEN) -> int:
+        return self._count(price, self.tick, rounding)
+
+    def to_lots(self, size, rounding: str = ROUND_FLOOR) -> int:
+        return self._count(size, self.lot, rounding)
+
+    def price(self, ticks: int) -> Decimal:
+        return self.tick * ticks
+
+    def size(self, lots: int) -> Decimal:
+        return self.lot * lots
+
+    def format_price(self, price) -> str:
+        '''Round price to the nearest tick and format it in fixed-point notation.
+        '''
+        return format(self.price(self.to_ticks(price)), 'f')
+
+    def format_size(self, size) -> str:
+        '''Round size down to the lot and format it in fixed-point notation.
+        '''
+        return format(self.size(self.to_lots(size)), 'f')
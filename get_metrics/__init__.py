@@ -0,0 +1,7 @@
+"""
+Collection of account metrics into InfluxDB.
+
+Modules import each other relative to this package and use the exchanges
+package of the repository root, so they run from the root as modules, such
+as python -m get_metrics.collect.
+"""
@@ -0,0 +1,36 @@
+"""
+Clients shared by the metric scripts, created at first use.
+"""
+import os
+import threading
+
+
+_lock = threading.Lock()
+_influxdb = None
+_liquid = None
+
+
+def get_influxdb():
+    '''Return the process wide InfluxDB client configured by DB_* environment variables.
+    '''
+    global _influxdb
+    with _lock:
+        if _influxdb is None:
+            from influxdb import InfluxDBClient
+            _influxdb = InfluxDBClient(host=os.environ['DB_HOST'],
+                                       port=os.environ['DB_PORT'],
+                                       username=os.getenv('DB_USER', ''),
+                                       password=os.getenv('DB_PASS', ''),
+                                       database=os.environ['DB_NAME'])
+        return _influxdb
+
+
+def get_liquid():
+    '''Return the process wide Liquid client.
+    '''
+    global _liquid
+    with _lock:
+        if _liquid is None:
+            from liquidpy.api import Liquid
+            _liquid = Liquid()
+        return _liquid
@@ -0,0 +1,137 @@
+"""
+Collector of the metrics of an exchange account.
+
+Collectors of executions, balances and deposits run concurrently, sharing
+one exchange client, one InfluxDB client and one batched writer. Liquid is
+collected with liquidpy, the other exchanges through the adapters of the
+exchanges package. Deposits are collected only from Liquid, since the
+adapters have no deposit history.
+"""
+import argparse
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+import os
+import time
+from typing import Callable
+
+from influxdb import InfluxDBClient
+
+from exchanges import Rebalancer, get_rebalancer_class
+from stages import run_stage
+
+from .clients import get_influxdb
+from .get_execution import ingest_executions
+from .ledger import PositionLedger
+from .valuation import balance_point, value_balances
+from .writer import PointWriter, get_cache_dir
+
+
+@dataclass
+class CollectContext:
+    exchange: str
+    idb: InfluxDBClient
+    writer: PointWriter
+    rebalancer: Rebalancer = None  # adapter of the exchange, None for Liquid
+
+    @property
+    def ledger_path(self) -> str:
+        return os.path.join(get_cache_dir(), f'positions-{self.exchange}.sqlite')
+
+    @property
+    def cursor_path(self) -> str:
+        return os.path.join(get_cache_dir(), f'executions-cursor-{self.exchange}.json')
+
+
+# collectors write points with the shared writer and return the number of them
+COLLECTORS: dict[str, Callable[[CollectContext], int]] = {}
+
+# collectors of liquidpy, which adapters of other exchanges cannot run
+LIQUID_ONLY: set[str] = set()
+
+
+def collector(name: str, liquid_only: bool = False):
+    def register(fn):
+        COLLECTORS[name] = fn
+        if liquid_only:
+            LIQUID_ONLY.add(name)
+        return fn
+    return register
+
+
+def available_collectors(exchange: str) -> list[str]:
+    return [n for n in COLLECTORS if exchange == 'liquid' or n not in LIQUID_ONLY]
+
+
+@collector('executions')
+def collect_executions(ctx: CollectContext) -> int:
+    if ctx.rebalancer is None:
+        return ingest_executions(ctx.idb, writer=ctx.writer)
+
+    def fetch(timestamp: int, limit: int) -> list:
+        return [{'id': e.execution_id, 'timestamp': e.timestamp, 'my_side': e.side,
+                 'quantity': e.quantity, 'price': e.price}
+                for e in ctx.rebalancer.get_executions(timestamp, limit)]
+
+    return ingest_executions(ctx.idb, cursor_path=ctx.cursor_path, ledger_path=ctx.ledger_path, fetch=fetch,
+                             exchange=ctx.exchange, writer=ctx.writer)
+
+
+@collector('balances')
+def collect_balances(ctx: CollectContext) -> int:
+    if ctx.rebalancer is None:
+        from .get_balance import get_balances
+        points = get_balances(ctx.idb)
+    else:
+        r = ctx.rebalancer
+        balance = r.get_balance()
+        valuations = value_balances([(ctx.exchange, c.upper(), a) for c, a in balance.items() if a > 0],
+                                    {ctx.exchange: {r.trade_coin.upper(): r.get_ltp()}})
+        with PositionLedger(ctx.ledger_path) as ledger:
+            last_pos_price = None if ledger.empty else ledger.position.price
+
+        now = datetime.utcfromtimestamp(time.time())
+        points = [balance_point(v, now, None, last_pos_price) for v in valuations]
+        for p in points:
+            p['tags']['exchange'] = ctx.exchange
+            print(f'data -> {p}')
+    ctx.writer.write(points)
+    return len(points)
+
+
+@collector('deposits', liquid_only=True)
+def collect_deposits(ctx: CollectContext) -> int:
+    from .get_deposit import get_deposits
+    points = get_deposits(ctx.idb)
+    ctx.writer.write(points)
+    return len(points)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Collect metrics of an exchange account into InfluxDB.')
+    parser.add_argument('-e', '--exchange', default='liquid', help='exchange name. default is liquid.')
+    parser.add_argument('-s', '--symbol', default='BTC/JPY', help='symbol of the adapter, used except for liquid.')
+    for name in COLLECTORS:
+        only = ' only from liquid' if name in LIQUID_ONLY else ''
+        parser.add_argument(f'--{name}', action='store_true',
+                            help=f'collect {name}{only}. all are collected if none is given.')
+    args = parser.parse_args()
+
+    exchange = args.exchange.lower()
+    available = available_collectors(exchange)
+    names = [n for n in COLLECTORS if getattr(args, n)] or available
+    for n in names:
+        if n not in available:
+            parser.error(f'{n} are collected only from liquid. [exchange: {exchange}]')
+    rebalancer = None if exchange == 'liquid' else get_rebalancer_class(exchange)(args.symbol)
+
+    idb = get_influxdb()
+    with PointWriter(idb) as writer:
+        ctx = CollectContext(exchange, idb, writer, rebalancer)
+        stage = run_stage('collect', {n: partial(COLLECTORS[n], ctx) for n in names})
+    print(stage.summary())
+    print(f"Collected points. [{', '.join([f'{k}: {v}' for k, v in stage.results.items()])}]")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,17 @@
-#! /usr/bin/env python
-import os
 from datetime import datetime
 import time
 
-from liquidpy.api import Liquid, PRODUCT_ID_ETHJPY
-from influxdb import InfluxDBClient
+from .clients import get_influxdb, get_liquid
+from .get_execution import FIRST_RECORD_CREATED_AT, get_last_pos_price
+from .valuation import balance_point, build_price_index, value_balances
+from .writer import PointWriter
 
 
-lqd = Liquid()
-idb = InfluxDBClient(host=os.environ['DB_HOST'],
-                     port=os.environ['DB_PORT'],
-                     username=os.getenv('DB_USER', ''),
-                     password=os.getenv('DB_PASS', ''),
-                     database=os.environ['DB_NAME'])
-
-FIRST_RECORD_CREATED_AT = 1604411435
-MEASUREMENT_MY_EXEC = 'my_executions'
-
-
-def get_last_pos_price():
-    executions = idb.query(f'select last(pos_price) from "{MEASUREMENT_MY_EXEC}"')
-    last_pos_price = max([e[0]['last'] for e in executions])
-    print(f'latest position value: {int(last_pos_price)}')
-    return last_pos_price
-
-
-if __name__ == '__main__':
+def get_balances(idb):
+    from liquidpy.api import PRODUCT_ID_ETHJPY
 
     # get info from liquid
+    lqd = get_liquid()
     balances = lqd.get_accounts_balance()
     products = lqd.get_products()
     ethjpy = lqd.get_executions_me(product_id=PRODUCT_ID_ETHJPY, timestamp=FIRST_RECORD_CREATED_AT, limit=1000)
@@ -39,38 +23,29 @@ if __name__ == '__main__':
     print(f'ignore amount: {ignore_amount} JPY')
 
     # calc capital
-    results = idb.query(f'select sum(amount) from deposits_history where time > \'2020-11-01\'')
+    results = idb.query("select sum(amount) from deposits_history where time > '2020-11-01'")
     deposit_sum = max([r[0]['sum'] for r in results])
     capital = deposit_sum - ignore_amount
     print(f'deposit amount: {deposit_sum} JPY, capital: {capital}')
 
     now = datetime.utcfromtimestamp(time.time())
 
-    points = []
-    for b in balances:
-        value = float(b['balance'])
-        if value > 0 and b['currency'] != 'USD':
+    # index prices once and query the last position once, not for each balance
+    valuations = value_balances([('liquid', b['currency'], float(b['balance'])) for b in balances
+                                 if float(b['balance']) > 0 and b['currency'] != 'USD'],
+                                {'liquid': build_price_index(products)})
+    last_pos_price = get_last_pos_price(idb) if any(v.currency == 'BTC' for v in valuations) else None
 
-            amount_jpy = value
-            for p in products:
-                if p['currency'] == 'JPY' and p['base_currency'] == b['currency']:
-                    amount_jpy = value * float(p['last_traded_price'])
+    points = []
+    for v in valuations:
+        p = balance_point(v, now, capital, last_pos_price)
+        points.append(p)
+        print(f'data -> {p}')
 
-            p = {
-                'measurement': 'balances',
-                'time': now,
-                'tags': {
-                    'currency': b['currency']
-                },
-                'fields': {
-                    'amount': value,
-                    'amount_jpy': amount_jpy,
-                    'unrealized_pnl': amount_jpy - get_last_pos_price() if b['currency'] == 'BTC' else None,
-                    'capital': capital,
-                }
-            }
-            points.append(p)
-            print(f'data -> {p}')
+    return points
 
-    idb.write_points(points)
 
+if __name__ == '__main__':
+    idb = get_influxdb()
+    with PointWriter(idb) as writer:
+        writer.write(get_balances(idb))
@@ -1,35 +1,34 @@
-#! /usr/bin/env python
-import os
 from datetime import datetime
 from pytz import timezone
 import pytz
 
-from liquidpy.api import Liquid
-from influxdb import InfluxDBClient
+from .clients import get_influxdb, get_liquid
+from .writer import PointWriter
 
 
 tz = pytz.timezone('UTC')
-lqd = Liquid()
-idb = InfluxDBClient(host=os.environ['DB_HOST'],
-                     port=os.environ['DB_PORT'],
-                     username=os.getenv('DB_USER', ''),
-                     password=os.getenv('DB_PASS', ''),
-                     database=os.environ['DB_NAME'])
-
-
-def exists(history, data) -> bool:
-    h_time = datetime.fromtimestamp(int(history['created_at']), tz=tz)
-    h_amount = float(history['net_amount'])
-    for d in data:
-        r_time = datetime.strptime(d['time'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=tz)  # create aware date object
-
-        # compare history to record to check if history exists in DB
-        if r_time == h_time and d['amount'] == h_amount:
-            print(f"History already exists in DB. [deposits_history: time={h_time}, amount={h_amount:,.0f}]")
-            return True
-    return False
 
 
+def deposit_key(timestamp: int, amount: float, currency: str) -> tuple:
+    '''Key identifying a deposit by unix time in seconds, amount and currency.
+    '''
+    return int(timestamp), float(amount), currency
+
+
+def load_deposit_index(idb, since: int, until: int) -> set:
+    '''Get the keys of deposits recorded in DB between since and until (unix time in seconds, inclusive).
+    '''
+    results = idb.query(f'select * from deposits_history where time >= {since}s and time <= {until}s', epoch='s')
+    return {deposit_key(r['time'], r['amount'], r['currency']) for r in results.get_points('deposits_history')}
+
+
+def exists(history, index: set) -> bool:
+    key = deposit_key(history['created_at'], history['net_amount'], history['currency'])
+    if key in index:
+        print(f"History already exists in DB. [deposits_history: time={datetime.fromtimestamp(key[0], tz=tz)}, amount={key[1]:,.0f}]")
+        return True
+    return False
+
 
 def deposits_history(h):
     return {
@@ -43,13 +42,25 @@ def deposits_history(h):
             }}
 
 
-def main():
-    history = lqd.get_fiat_deposits_history(currency='JPY')
-    data = list(idb.query('select * from deposits_history').get_points('deposits_history'))
-    his = [h for h in history['models'] if not exists(h, data)]
+def get_deposits(idb):
+    history = get_liquid().get_fiat_deposits_history(currency='JPY')['models']
+    if not history:
+        print('No deposit history.')
+        return []
+
+    # only records in the period of the history can be duplicates
+    times = [int(h['created_at']) for h in history]
+    index = load_deposit_index(idb, min(times), max(times))
+    his = [h for h in history if not exists(h, index)]
     points = [deposits_history(h) for h in his]
     print(f'Write {len(points)} data.\n{points}')
-    idb.write_points(points)
+    return points
+
+
+def main():
+    idb = get_influxdb()
+    with PointWriter(idb) as writer:
+        writer.write(get_deposits(idb))
 
 
 if __name__ == '__main__':
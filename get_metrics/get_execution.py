@@ -1,77 +1,150 @@
 import os
 import json
 import csv
-import time
-from datetime import datetime
+import math
+import tempfile
+from datetime import datetime, timezone
 
-from liquidpy.api import Liquid, PRODUCT_ID_BTCJPY, PRODUCT_ID_ETHJPY
-from influxdb import InfluxDBClient
+from .clients import get_influxdb, get_liquid
+from .ledger import LEDGER_PATH, Position, PositionLedger
+from .writer import PointWriter, get_cache_dir
 
 
-lqd = Liquid()
-idb = InfluxDBClient(host=os.environ['DB_HOST'],
-                     port=os.environ['DB_PORT'],
-                     username=os.getenv('DB_USER', ''),
-                     password=os.getenv('DB_PASS', ''),
-                     database=os.environ['DB_NAME'])
-
 FIRST_RECORD_CREATED_AT = 1604411435
 MEASUREMENT_MY_EXEC = 'my_executions'
+CURSOR_PATH = os.getenv('EXECUTIONS_CURSOR') or os.path.join(get_cache_dir(), 'executions-cursor.json')
+
+
+class ExecutionCursor:
+    '''Position of the last ingested execution, saved to a file so that ingestion resumes from it.
 
+    Executions are ordered by timestamp. Executions sharing the timestamp of
+    the cursor are told apart by their ids.
 
-def select_latest_record(msnt_name: str):
+    Parameters
+    ----------
+    timestamp: float
+        Timestamp of the last ingested execution. Only executions after it are new.
+    ids: set
+        Ids of the ingested executions at timestamp.
+    path: str
+        File the cursor is saved to.
+    '''
+
+    def __init__(self, timestamp: float, ids: set = None, path: str = CURSOR_PATH):
+        self.timestamp = timestamp
+        self.ids = set(ids or ())
+        self.path = path
+
+    @classmethod
+    def load(cls, path: str = CURSOR_PATH):
+        '''Load the saved cursor, or return None if it has never been saved.
+        '''
+        try:
+            with open(path) as f:
+                c = json.load(f)
+            return cls(c['timestamp'], c['ids'], path)
+        except FileNotFoundError:
+            return None
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix='.executions-cursor-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'timestamp': self.timestamp, 'ids': sorted(self.ids)}, f)
+        os.replace(tmp, self.path)
+
+    def is_new(self, e) -> bool:
+        t = float(e['timestamp'])
+        return t > self.timestamp or (t == self.timestamp and e['id'] not in self.ids)
+
+    def advance(self, e):
+        t = float(e['timestamp'])
+        if t > self.timestamp:
+            self.timestamp = t
+            self.ids = set()
+        self.ids.add(e['id'])
+
+
+def exchange_condition(exchange: str) -> str:
+    '''Return the InfluxQL condition selecting records of an exchange.
+
+    Liquid records written before points were tagged with the exchange have
+    no exchange tag, which InfluxQL compares as an empty string.
+    '''
+    if exchange == 'liquid':
+        return "(\"exchange\" = '' or \"exchange\" = 'liquid')"
+    return f"\"exchange\" = '{exchange}'"
+
+
+def select_latest_record(idb, msnt_name: str, exchange: str = 'liquid'):
     '''Get the latest record time of executions.
 
     Parameters
     ----------
+    idb: influxdb.InfluxDBClient
+        Client the record is read with.
     msnt_name: str
         InfluxDB's measurement name.
+    exchange: str
+        Exchange the record must be of.
 
     Returns
     -------
     influxdb.resultset.ResultSet
         Latest record of specified measurement.
     '''
-    return idb.query(f'select * from "{msnt_name}" order by time desc limit 1')
+    return idb.query(f'select * from "{msnt_name}" where {exchange_condition(exchange)} order by time desc limit 1')
 
 
-def get_my_executions(since=FIRST_RECORD_CREATED_AT, limit=1000):
-    ex = lqd.get_executions_me(
-            product_id=PRODUCT_ID_BTCJPY, limit=limit, page=1)
+def fetch_liquid_executions(timestamp: int, limit: int) -> list:
+    from liquidpy.api import PRODUCT_ID_BTCJPY
+    ex = get_liquid().get_executions_me(product_id=PRODUCT_ID_BTCJPY, timestamp=timestamp, limit=limit)
+    return ex['models'] if 'current_page' in ex else ex
 
-    # if there are several pages, get only oldest page.
-    ex = ex['models'] if 'current_page' in ex else ex
-    ex = sorted(ex, key=lambda x: x['timestamp'])
-    return [e for e in ex if int(float(e['timestamp'])) >= FIRST_RECORD_CREATED_AT]
 
+def iter_my_executions(cursor: ExecutionCursor, limit=1000, fetch=fetch_liquid_executions):
+    '''Yield pages of executions after the cursor in timestamp order, advancing the cursor.
 
-def create_executions_point(executions, last_exec):
+    Each page is requested from the timestamp of the cursor, so only
+    executions newer than the cursor are fetched and at most one page is held
+    in memory. The cursor is advanced before a page is yielded; save it once
+    the page has been written.
 
-    pos_size = last_exec['pos_size'] if last_exec else 0
-    pos_price = last_exec['pos_price'] if last_exec else 0
-    avg_buy_price = last_exec['avg_buy_price'] if last_exec else 0
+    fetch takes a unix time in seconds and a limit, and returns executions
+    at or after the time in the format of Liquid's executions API.
+    '''
+    while True:
+        ex = fetch(int(cursor.timestamp), limit)
+        page = sorted([e for e in ex if cursor.is_new(e)], key=lambda x: float(x['timestamp']))
+        for e in page:
+            cursor.advance(e)
+        if page:
+            yield page
+        if len(ex) < limit:
+            return
+        if not page:
+            # a whole page of executions in the same second has already been ingested
+            print(f"Stop ingestion, executions more than limit share a timestamp. [timestamp: {cursor.timestamp}]")
+            return
+
+
+def create_executions_point(executions, ledger: PositionLedger, tags: dict = None):
 
     points = []
 
     for e in executions:
 
-        t = datetime.utcfromtimestamp(int(float(e['timestamp'])))
-        if last_exec:
-            if t <= datetime.strptime(last_exec['time'], '%Y-%m-%dT%H:%M:%SZ'):
-                continue
+        # executions applied to the ledger already have been written
+        profit = ledger.apply(e)
+        if profit is None:
+            continue
 
+        t = datetime.utcfromtimestamp(int(float(e['timestamp'])))
         qty = float(e['quantity'])
         price = float(e['price'])
-
-        if e['my_side'] == 'buy':
-            pos_size += qty
-            pos_price += (qty * price)
-            avg_buy_price = pos_price / pos_size
-            profit = 0.0
-        else:
-            pos_size -= qty
-            pos_price -= avg_buy_price * qty
-            profit = (price - avg_buy_price) * qty
+        pos = ledger.position
+        pos_size, pos_price, avg_buy_price = pos.size, pos.price, pos.avg_buy_price
 
         print(f"{t}, {e['my_side']}, qty={qty:.8f}, price={price:.0f}, pos_size={pos_size:.8f}, pos_price={pos_price:.0f}, avg_buy_price={avg_buy_price}, profit={profit if profit else 0}")
         point = {
@@ -79,6 +152,7 @@ def create_executions_point(executions, last_exec):
                 'time': t,
                 'tags': {
                     'side': e['my_side'],
+                    **(tags or {}),
                     },
                 'fields': {
                     'quantity': qty,
@@ -93,89 +167,91 @@ def create_executions_point(executions, last_exec):
     return points
 
 
-def get_executions():
+def ingest_executions(idb, cursor_path=CURSOR_PATH, ledger_path=LEDGER_PATH, fetch=fetch_liquid_executions,
+                      exchange: str = 'liquid', writer: PointWriter = None):
+    '''Write executions newer than the saved cursor to InfluxDB page by page.
 
-    since = None
-    last_exec = None
+    The position is continued from the local ledger. The latest record of
+    InfluxDB is read only to start a new ledger or to reconcile it.
 
-    # get the latest record time of executions
-    results = select_latest_record(MEASUREMENT_MY_EXEC)
-    if results:
-        last_exec = [r[0] for r in results][0]
-        print(f'Latest record of {MEASUREMENT_MY_EXEC}.\n{json.dumps(last_exec, indent=True)}')
-        since = datetime.strptime(last_exec['time'], '%Y-%m-%dT%H:%M:%SZ').timestamp()
+    Parameters
+    ----------
+    idb: influxdb.InfluxDBClient
+        Client the latest record is read with, and points are written with unless writer is given.
+    fetch: Callable[[int, int], list]
+        Source of executions, see iter_my_executions. Default is Liquid.
+    exchange: str
+        Exchange of the executions. Points are tagged with it, and only its
+        records are read from InfluxDB.
+    writer: PointWriter
+        Writer shared with other collectors. A new one is used if None.
 
-    # get executions by rest api
-    print(f"Get the executions since {since}.")
-    executions = get_my_executions(since=since)
-    print(f"Number of my execution is {len(executions)}.")
+    Returns
+    -------
+    int
+        Number of the written executions.
+    '''
+    with PositionLedger(ledger_path) as ledger:
+        cursor = ExecutionCursor.load(cursor_path)
+        if writer:
+            return _ingest_executions(idb, ledger, cursor, cursor_path, fetch, exchange, writer)
+        with PointWriter(idb) as writer:
+            return _ingest_executions(idb, ledger, cursor, cursor_path, fetch, exchange, writer)
 
-    return create_executions_point(executions, last_exec)
 
+def _ingest_executions(idb, ledger: PositionLedger, cursor: ExecutionCursor, cursor_path: str,
+                       fetch, exchange: str, writer: PointWriter):
+    last_exec = None
+    if ledger.empty or ledger.needs_reconcile() or cursor is None:
+        results = select_latest_record(idb, MEASUREMENT_MY_EXEC, exchange)
+        if results:
+            last_exec = [r[0] for r in results][0]
+            print(f'Latest record of {MEASUREMENT_MY_EXEC}.\n{json.dumps(last_exec, indent=True)}')
+
+    if last_exec and ledger.empty:
+        ledger.seed(Position(last_exec['pos_size'], last_exec['pos_price'], last_exec['avg_buy_price']))
+    elif last_exec and ledger.needs_reconcile():
+        position = ledger.position
+        if not ledger.reconcile(last_exec):
+            print(f'Reset position of ledger to InfluxDB. [ledger: {position}, pos_size: {last_exec["pos_size"]}, pos_price: {last_exec["pos_price"]}]')
+
+    if cursor is None:
+        if last_exec:
+            # the record time is truncated to seconds, so executions in that second were written already
+            since = datetime.strptime(last_exec['time'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc).timestamp() + 1
+        else:
+            since = FIRST_RECORD_CREATED_AT
+        cursor = ExecutionCursor(math.nextafter(since, 0), path=cursor_path)
 
-def get_last_pos_price():
-    executions = idb.query(f'select last(pos_price) from "{MEASUREMENT_MY_EXEC}"')
+    # get executions by rest api
+    print(f"Get the executions since {cursor.timestamp}.")
+    count = 0
+    for executions in iter_my_executions(cursor, fetch=fetch):
+        points = create_executions_point(executions, ledger, {'exchange': exchange})
+        writer.write(points)
+
+        # the ledger and the cursor must not pass points that are neither written nor spilled
+        writer.flush()
+        ledger.commit()
+        cursor.save()
+        count += len(points)
+    print(f"Number of my execution is {count}.")
+    return count
+
+
+def get_last_pos_price(idb, ledger_path=LEDGER_PATH, exchange: str = 'liquid'):
+    with PositionLedger(ledger_path) as ledger:
+        if not ledger.empty:
+            print(f'latest position value: {int(ledger.position.price)}')
+            return ledger.position.price
+    executions = idb.query(f'select last(pos_price) from "{MEASUREMENT_MY_EXEC}" where {exchange_condition(exchange)}')
     last_pos_price = max([e[0]['last'] for e in executions])
     print(f'latest position value: {int(last_pos_price)}')
     return last_pos_price
 
 
-def get_balances():
-
-    # get info from liquid
-    balances = lqd.get_accounts_balance()
-    products = lqd.get_products()
-    ethjpy = lqd.get_executions_me(
-            product_id=PRODUCT_ID_ETHJPY, timestamp=FIRST_RECORD_CREATED_AT, limit=1000)
-
-    # calc ignore amount
-    eth_buy_amount = sum([float(r['quantity']) * float(r['price']) for r in ethjpy if r['my_side'] == 'buy'])
-    eth_sell_amount = sum([float(r['quantity']) * float(r['price']) for r in ethjpy if r['my_side'] == 'sell'])
-    ignore_amount = eth_buy_amount - eth_sell_amount
-    print(f'ignore amount: {ignore_amount} JPY')
-
-    # calc capital
-    results = idb.query(f'select sum(amount) from deposits_history where time > \'2020-11-01\'')
-    deposit_sum = max([r[0]['sum'] for r in results])
-    capital = deposit_sum - ignore_amount
-    print(f'deposit amount: {deposit_sum} JPY, capital: {capital}')
-
-    now = datetime.utcfromtimestamp(time.time())
-
-    points = []
-    for b in balances:
-        value = float(b['balance'])
-        if value > 0 and b['currency'] != 'USD':
-
-            amount_jpy = value
-            for p in products:
-                if p['currency'] == 'JPY' and p['base_currency'] == b['currency']:
-                    amount_jpy = value * float(p['last_traded_price'])
-
-            p = {
-                'measurement': 'balances',
-                'time': now,
-                'tags': {
-                    'currency': b['currency']
-                },
-                'fields': {
-                    'amount': value,
-                    'amount_jpy': amount_jpy,
-                    'unrealized_pnl': amount_jpy - get_last_pos_price() if b['currency'] == 'BTC' else None,
-                    'capital': capital,
-                }
-            }
-            points.append(p)
-            print(f'data -> {p}')
-
-    return points
-
-
 def main():
-    points = []
-    points.extend(get_executions())
-    #points.extend(get_balances())
-    idb.write_points(points)
+    ingest_executions(get_influxdb())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,170 @@
+"""
+Position accounting of executions kept in a local SQLite database.
+
+The ledger stores every applied execution and the current position, so
+the position is updated in constant time per execution without reading it
+back from InfluxDB, and replaying the stored executions always gives the
+same position.
+"""
+from dataclasses import astuple, dataclass
+import os
+import sqlite3
+import time
+
+from .writer import get_cache_dir
+
+
+LEDGER_PATH = os.getenv('POSITION_LEDGER') or os.path.join(get_cache_dir(), 'positions.sqlite')
+
+# seconds between reconciliations with InfluxDB
+RECONCILE_INTERVAL = 24 * 60 * 60
+
+SCHEMA = '''
+create table if not exists executions (
+    id primary key,
+    timestamp real not null,
+    side text not null,
+    quantity real not null,
+    price real not null
+);
+create table if not exists positions (
+    name text primary key,
+    size real not null,
+    price real not null,
+    avg_buy_price real not null,
+    time real not null
+);
+create table if not exists meta (
+    key text primary key,
+    value
+);
+'''
+
+
+@dataclass
+class Position:
+    size: float = 0.0
+    price: float = 0.0  # acquisition cost of the position
+    avg_buy_price: float = 0.0
+    time: float = 0.0  # timestamp of the last execution
+
+    def apply(self, side: str, qty: float, price: float) -> float:
+        '''Update the position with an execution and return its realized profit.
+        '''
+        if side == 'buy':
+            self.size += qty
+            self.price += (qty * price)
+            self.avg_buy_price = self.price / self.size
+            return 0.0
+        self.size -= qty
+        self.price -= self.avg_buy_price * qty
+        return (price - self.avg_buy_price) * qty
+
+
+class PositionLedger:
+    '''Ledger of executions and the position made from them.
+
+    Parameters
+    ----------
+    path: str
+        SQLite database file.
+    '''
+
+    def __init__(self, path: str = LEDGER_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        row = self.db.execute("select size, price, avg_buy_price, time from positions where name = 'current'").fetchone()
+        self.position = Position(*row) if row else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def empty(self) -> bool:
+        return self.position is None
+
+    def seed(self, position: Position) -> None:
+        '''Start the ledger from a position, such as the latest record of InfluxDB.
+        '''
+        self.db.execute("insert or replace into positions values ('base', ?, ?, ?, ?)", astuple(position))
+        self.position = Position(*astuple(position))
+        self.commit()
+
+    def apply(self, e) -> float:
+        '''Apply an execution of Liquid's executions API and return its realized profit.
+
+        Returns None if the execution has been applied already.
+        '''
+        if self.position is None:
+            self.seed(Position())
+        t = float(e['timestamp'])
+        cur = self.db.execute('insert or ignore into executions values (?, ?, ?, ?, ?)',
+                              (e['id'], t, e['my_side'], float(e['quantity']), float(e['price'])))
+        if cur.rowcount == 0:
+            return None
+        profit = self.position.apply(e['my_side'], float(e['quantity']), float(e['price']))
+        self.position.time = t
+        return profit
+
+    def commit(self) -> None:
+        '''Save the current position with the executions applied since the last commit.
+        '''
+        if self.position is not None:
+            self.db.execute("insert or replace into positions values ('current', ?, ?, ?, ?)", astuple(self.position))
+        self.db.commit()
+
+    def replay(self) -> Position:
+        '''Recompute the position from the base position and every execution stored after it.
+        '''
+        row = self.db.execute("select size, price, avg_buy_price, time from positions where name = 'base'").fetchone()
+        position = Position(*row) if row else Position()
+        for t, side, qty, price in self.db.execute(
+                'select timestamp, side, quantity, price from executions where rowid > ? order by timestamp, id',
+                (self.__base_rowid(), )):
+            position.apply(side, qty, price)
+            position.time = t
+        return position
+
+    def needs_reconcile(self) -> bool:
+        row = self.db.execute("select value from meta where key = 'reconciled_at'").fetchone()
+        return row is None or time.time() - row[0] >= RECONCILE_INTERVAL
+
+    def reconcile(self, record) -> bool:
+        '''Compare the position with the latest record written to InfluxDB, and correct it if they differ.
+
+        The position is reset to pos_size, pos_price and avg_buy_price of the
+        record, which becomes the base replay starts from, and the time of the
+        correction is kept as corrected_at in meta.
+
+        Returns
+        -------
+        bool
+            True if pos_size and pos_price of the record match the position.
+        '''
+        now = time.time()
+        matched = abs(record['pos_size'] - self.position.size) < 1e-8 \
+            and abs(record['pos_price'] - self.position.price) < 1e-6 * max(abs(self.position.price), 1)
+        if not matched:
+            position = Position(record['pos_size'], record['pos_price'], record['avg_buy_price'], self.position.time)
+            self.db.execute("insert or replace into positions values ('base', ?, ?, ?, ?)", astuple(position))
+            self.db.execute("insert or replace into meta "
+                            "values ('base_rowid', (select ifnull(max(rowid), 0) from executions))")
+            self.db.execute("insert or replace into meta values ('corrected_at', ?)", (now, ))
+            self.position = position
+            self.commit()
+        self.db.execute("insert or replace into meta values ('reconciled_at', ?)", (now, ))
+        self.db.commit()
+        return matched
+
+    def __base_rowid(self) -> int:
+        # executions stored up to this row are included in the base position
+        row = self.db.execute("select value from meta where key = 'base_rowid'").fetchone()
+        return row[0] if row else 0
+
+    def close(self) -> None:
+        self.db.close()
@@ -0,0 +1,72 @@
+"""
+Valuation of balances in the quote currency.
+
+Prices are indexed by currency once per run, so balances of any number of
+currencies and exchanges are valued in a single pass of dict lookups.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass(frozen=True)
+class Valuation:
+    exchange: str
+    currency: str
+    amount: float
+    amount_quote: float  # amount valued in the quote currency
+
+
+def build_price_index(products, quote='JPY') -> dict[str, float]:
+    '''Map base currencies to the last traded price of their product quoted in quote.
+
+    Parameters
+    ----------
+    products: list
+        Products of Liquid's get_products.
+    quote: str
+        Currency prices are quoted in.
+
+    Returns
+    -------
+    dict[str, float]
+        Last traded price of each currency.
+    '''
+    return {p['base_currency']: float(p['last_traded_price']) for p in products if p['currency'] == quote}
+
+
+def value_balances(balances, prices: dict[str, dict[str, float]]) -> list[Valuation]:
+    '''Value balances of several exchanges at once.
+
+    Parameters
+    ----------
+    balances: Iterable[tuple[str, str, float]]
+        Exchange, currency and amount of each balance.
+    prices: dict[str, dict[str, float]]
+        Price index of each exchange made by build_price_index.
+        A currency without price, such as the quote currency, is valued as is.
+
+    Returns
+    -------
+    list[Valuation]
+        Valuation of each balance in the given order.
+    '''
+    return [Valuation(exchange, currency, amount, amount * prices.get(exchange, {}).get(currency, 1.0))
+            for exchange, currency, amount in balances]
+
+
+def balance_point(v: Valuation, time: datetime, capital: float, last_pos_price: float = None) -> dict:
+    '''Create a point of balances measurement. unrealized_pnl is set only for BTC with a known position.
+    '''
+    return {
+        'measurement': 'balances',
+        'time': time,
+        'tags': {
+            'currency': v.currency
+        },
+        'fields': {
+            'amount': v.amount,
+            'amount_jpy': v.amount_quote,
+            'unrealized_pnl': v.amount_quote - last_pos_price if v.currency == 'BTC' and last_pos_price is not None else None,
+            'capital': capital,
+        }
+    }
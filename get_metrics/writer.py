@@ -0,0 +1,208 @@
+"""
+Batched writing of points to InfluxDB.
+
+Points are queued and written in batches from a background thread. The
+queue is bounded, so producers wait instead of holding a whole backfill in
+memory. Batches that cannot be written are spilled to local files as line
+protocol and written again once InfluxDB is back.
+"""
+import glob
+import os
+import queue
+import tempfile
+import threading
+import time
+
+from influxdb.exceptions import InfluxDBClientError, InfluxDBServerError
+from influxdb.line_protocol import make_lines
+
+
+def get_cache_dir() -> str:
+    return os.getenv('YAJIROBE_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'yajirobe')
+
+
+# server errors and connection errors (requests' errors are OSError)
+_RETRYABLE_ERRORS = (InfluxDBServerError, OSError)
+
+_FLUSH = object()
+_STOP = object()
+
+
+class PointWriter:
+    '''Writer of points running a background thread.
+
+    Parameters
+    ----------
+    client: influxdb.InfluxDBClient
+        Client points are written with.
+    batch_size: int
+        Number of points written in one request.
+    flush_interval: float
+        Seconds after which a partial batch is written.
+    max_queue: int
+        Number of points waiting to be written before write blocks.
+    line_protocol: bool
+        If True, points are encoded to line protocol in the calling thread, so the
+        background thread only sends them.
+    retries: int
+        Times a failed batch is written again before it is spilled.
+    spill_dir: str
+        Directory of the batches which could not be written.
+    '''
+
+    def __init__(self, client, batch_size: int = 5000, flush_interval: float = 1.0, max_queue: int = 50000,
+                 line_protocol: bool = False, retries: int = 3, spill_dir: str = None):
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.line_protocol = line_protocol
+        self.retries = retries
+        self.spill_dir = spill_dir or os.path.join(get_cache_dir(), 'influxdb-spill')
+        self.written = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.error = None  # last error that made points be dropped
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._has_spilled = bool(glob.glob(os.path.join(self.spill_dir, '*.lp')))
+        self._thread = threading.Thread(target=self.__run, name='point-writer', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, points) -> None:
+        '''Queue points, waiting while the queue is full.
+        '''
+        if isinstance(points, dict):
+            points = [points]
+        for p in points:
+            self._queue.put(make_lines({'points': [p]}).rstrip('\n') if self.line_protocol else p)
+
+    def flush(self, timeout: float = None) -> bool:
+        '''Wait until every queued point has been written, spilled or dropped. Return False if timed out.
+        '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            self._queue.put(_FLUSH, timeout=timeout)
+        except queue.Full:
+            return False
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 60.0) -> None:
+        '''Write queued points for up to timeout seconds, then stop the background thread.
+        '''
+        if self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+                self._thread.join(timeout)
+            except queue.Full:
+                pass
+            if self._thread.is_alive():
+                print(f'Point writer did not finish in time. [pending: {self._queue.unfinished_tasks}, timeout: {timeout}s]')
+        print(f'Closed point writer. [written: {self.written}, spilled: {self.spilled}, dropped: {self.dropped}]')
+
+    def __run(self):
+        try:
+            self.__replay_spilled()
+        except Exception as e:
+            print(f'Failed to write spilled points. [error: {e!r}]')
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None  # flush interval has elapsed
+            if item is not None and item is not _FLUSH and item is not _STOP:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size and time.monotonic() < deadline:
+                    continue
+
+            if batch:
+                try:
+                    self.__write_batch(batch)
+                except Exception as e:
+                    # e.g. points that cannot be serialized, or a full disk while spilling.
+                    # the thread keeps running, so flush and close never wait for it forever
+                    self.dropped += len(batch)
+                    self.error = e
+                    print(f'Dropped points that could not be written. [points: {len(batch)}, error: {e!r}]')
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                batch = []
+                deadline = None
+            if item is _FLUSH or item is _STOP:
+                self._queue.task_done()
+            if item is _STOP:
+                return
+
+    def __send(self, batch: list) -> None:
+        if self.line_protocol:
+            self.client.write_points(batch, protocol='line')
+        else:
+            self.client.write_points(batch)
+
+    def __write_batch(self, batch: list) -> None:
+        for attempt in range(self.retries + 1):
+            try:
+                self.__send(batch)
+            except InfluxDBClientError as e:
+                # points rejected by InfluxDB never succeed, so they are not retried
+                print(f'Dropped points rejected by InfluxDB. [points: {len(batch)}, error: {e}]')
+                self.dropped += len(batch)
+                return
+            except _RETRYABLE_ERRORS as e:
+                print(f'Failed to write points. [attempt: {attempt + 1}, error: {e}]')
+                if attempt < self.retries:
+                    time.sleep(min(2 ** attempt, 30))
+                continue
+            self.written += len(batch)
+            try:
+                self.__replay_spilled()
+            except Exception as e:
+                print(f'Failed to write spilled points. [error: {e!r}]')
+            return
+        self.__spill(batch)
+
+    def __spill(self, batch: list) -> None:
+        lines = batch if self.line_protocol else make_lines({'points': batch}).splitlines()
+        os.makedirs(self.spill_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.spill_dir, prefix='.spill-')
+        with os.fdopen(fd, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp, os.path.join(self.spill_dir, f'{time.time_ns()}.lp'))
+        self.spilled += len(batch)
+        self._has_spilled = True
+        print(f'Spilled points to disk. [points: {len(batch)}, dir: {self.spill_dir}]')
+
+    def __replay_spilled(self) -> None:
+        if not self._has_spilled:
+            return
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, '*.lp'))):
+            with open(path) as f:
+                lines = f.read().splitlines()
+            try:
+                self.client.write_points(lines, protocol='line')
+            except InfluxDBClientError as e:
+                os.replace(path, path + '.rejected')
+                print(f'Spilled points were rejected by InfluxDB. [file: {path}.rejected, error: {e}]')
+                continue
+            except _RETRYABLE_ERRORS:
+                return
+            os.remove(path)
+            self.written += len(lines)
+            print(f'Wrote spilled points. [points: {len(lines)}, file: {path}]')
+        self._has_spilled = False
@@ -0,0 +1,189 @@
+"""
+Latency metrics of rebalance cycles.
+
+Spans time exchange requests, Rebalancer calls and whole cycles. They are
+aggregated into histograms per metric and labels, which are exported as a
+Prometheus text file or as InfluxDB points.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import logging
+import os
+import tempfile
+import threading
+import time
+
+
+logger = logging.getLogger()
+
+# upper bounds in seconds of histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# metric names and their help texts
+METRICS = {
+    'yajirobe_request_seconds': 'Seconds taken by requests to exchange APIs.',
+    'yajirobe_call_seconds': 'Seconds taken by calls of Rebalancer methods.',
+    'yajirobe_cycle_seconds': 'Seconds taken by rebalance cycles.',
+}
+
+
+class Histogram:
+    '''Counts of observed seconds in BUCKETS.
+    '''
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # the last one counts values above every bucket
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        '''Estimate a quantile by linear interpolation within its bucket.
+        '''
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / c, self.max)
+            seen += c
+        return self.max
+
+
+class MetricsRegistry:
+    '''Histograms keyed by metric name and labels, safe to share between threads.
+    '''
+
+    def __init__(self):
+        self._histograms: dict[tuple[str, tuple], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = Histogram()
+            h.observe(seconds)
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        '''Time the block, whether it succeeds or fails.
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def to_prometheus(self) -> str:
+        '''Format histograms in the Prometheus text exposition format.
+        '''
+        with self._lock:
+            items = sorted(self._histograms.items())
+        lines = []
+        for name in sorted({n for (n, _), _ in items}):
+            lines.append(f'# HELP {name} {METRICS.get(name, name)}')
+            lines.append(f'# TYPE {name} histogram')
+            for (n, labels), h in items:
+                if n != name:
+                    continue
+                label_s = ','.join([f'{k}="{v}"' for k, v in labels])
+                cumulative = 0
+                for bound, c in zip(BUCKETS + ('+Inf', ), h.counts):
+                    cumulative += c
+                    lines.append(f'{name}_bucket{{{label_s}{"," if label_s else ""}le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label_s}}} {h.sum}')
+                lines.append(f'{name}_count{{{label_s}}} {h.count}')
+        return '\n'.join(lines) + '\n'
+
+    def to_points(self, measurement: str = 'rebalance_latency') -> list[dict]:
+        '''Create InfluxDB points with count, sum and estimated quantiles of each histogram.
+        '''
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            return [{
+                'measurement': measurement,
+                'time': now,
+                'tags': {'metric': name, **dict(labels)},
+                'fields': {
+                    'count': h.count,
+                    'sum': h.sum,
+                    'p50': h.quantile(0.5),
+                    'p90': h.quantile(0.9),
+                    'p99': h.quantile(0.99),
+                    'max': h.max,
+                }
+            } for (name, labels), h in self._histograms.items()]
+
+    def slowest(self, name: str, n: int = 5) -> list[tuple[dict, Histogram]]:
+        '''Return labels and histograms of a metric with the largest total seconds.
+        '''
+        with self._lock:
+            items = [(dict(labels), h) for (m, labels), h in self._histograms.items() if m == name]
+        return sorted(items, key=lambda i: i[1].sum, reverse=True)[:n]
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    return _registry
+
+
+class MetricsExporter:
+    '''Exporter of the process wide histograms.
+
+    Parameters
+    ----------
+    path: str
+        Prometheus text file, e.g. in the directory of node_exporter's textfile collector.
+    influxdb: bool
+        If True, points are written to InfluxDB configured by DB_* environment variables.
+    '''
+
+    def __init__(self, path: str = None, influxdb: bool = False):
+        self.path = path
+        self.influxdb = influxdb
+        self._client = None
+
+    def export(self) -> None:
+        registry = get_registry()
+        if self.path:
+            self.__write_file(registry.to_prometheus())
+        if self.influxdb:
+            try:
+                self.__influxdb().write_points(registry.to_points())
+            except Exception as e:
+                logger.warning(f"Failed to write metrics to InfluxDB. [error: {e}]")
+        for labels, h in registry.slowest('yajirobe_request_seconds', 3):
+            logger.info(f"Latency: {labels.get('exchange')} {labels.get('method')} {labels.get('path')} "
+                        f"[count: {h.count}, p50: {h.quantile(0.5) * 1000:.0f}ms, p99: {h.quantile(0.99) * 1000:.0f}ms]")
+
+    def __write_file(self, text: str) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, self.path)
+
+    def __influxdb(self):
+        if self._client is None:
+            from influxdb import InfluxDBClient
+            self._client = InfluxDBClient(host=os.environ['DB_HOST'],
+                                          port=os.environ['DB_PORT'],
+                                          username=os.getenv('DB_USER', ''),
+                                          password=os.getenv('DB_PASS', ''),
+                                          database=os.environ['DB_NAME'])
+        return self._client
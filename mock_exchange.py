@@ -0,0 +1,280 @@
+#! /usr/bin/env python
+"""
+Local stand-in server of the exchange APIs used by the adapters.
+
+One HTTP server answers the GMO Coin and bitbank endpoints under the
+prefixes below. MockExchange.base_urls() gives the rewrites for
+transport.HttpTransport so unmodified adapters talk to it.
+
+    /gmo/public, /gmo/private          https://api.coin.z.com/public, /private
+    /bitbank/public                    https://public.bitbank.cc
+    /bitbank/private                   https://api.bitbank.cc
+"""
+import argparse
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlsplit, parse_qs
+
+
+logger = logging.getLogger()
+
+
+class MockExchange:
+    '''In-memory account and ticker served over HTTP.
+
+    Parameters
+    ----------
+    price: float
+        Last traded price of every symbol. Bid and ask are spread apart from it.
+    balances: dict[str, float]
+        Balance of each asset, keyed by upper case asset name.
+    latency: float
+        Seconds each response is delayed, to emulate the network.
+    '''
+
+    def __init__(self, price: float = 5_000_000, spread: float = 1000, balances: dict[str, float] = None,
+                 latency: float = 0.0, host: str = '127.0.0.1', port: int = 0):
+        self.price = price
+        self.spread = spread
+        self.balances = balances or {'JPY': 1_000_000, 'BTC': 0.1, 'ETH': 1.0, 'XRP': 10_000}
+        self.latency = latency
+        self.orders: dict[str, dict] = {}
+        self.executions: list[dict] = []
+        self.requests = Counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def base_urls(self) -> dict[str, str]:
+        return {
+            'https://api.coin.z.com': f'{self.url}/gmo',
+            'https://public.bitbank.cc': f'{self.url}/bitbank/public',
+            'https://api.bitbank.cc': f'{self.url}/bitbank/private',
+        }
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def start(self) -> 'MockExchange':
+        '''Serve on a background thread.
+        '''
+        self._thread = threading.Thread(target=self.serve_forever, name='mock-exchange', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.requests.clear()
+
+    def new_order_id(self) -> str:
+        return str(next(self._ids))
+
+    def fill_orders(self) -> None:
+        '''Execute every active order at its price.
+        '''
+        with self._lock:
+            now = time.time()
+            for i, o in self.orders.items():
+                self.executions.append({'id': self.new_order_id(), 'order_id': i, 'symbol': o.get('symbol'),
+                                        'pair': o.get('pair'), 'side': o['side'], 'price': o['price'],
+                                        'size': o.get('size') or o.get('amount'), 'timestamp': now})
+            self.orders.clear()
+
+    # --- GMO Coin
+
+    def _gmo_ok(self, data) -> dict:
+        return {'status': 0, 'data': data, 'responsetime': datetime.now(timezone.utc).isoformat()}
+
+    def gmo(self, method: str, path: str, query: dict, body: dict) -> dict:
+        if method == 'GET' and path == '/public/v1/ticker':
+            symbols = query.get('symbol') or ['BTC']
+            timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+            return self._gmo_ok([{
+                'symbol': s,
+                'last': str(self.price),
+                'bid': str(self.price - self.spread / 2),
+                'ask': str(self.price + self.spread / 2),
+                'high': str(self.price), 'low': str(self.price), 'volume': '0',
+                'timestamp': timestamp,
+            } for s in symbols])
+        if method == 'GET' and path == '/public/v1/symbols':
+            return self._gmo_ok([
+                {'symbol': 'BTC', 'minOrderSize': '0.0001', 'maxOrderSize': '5', 'sizeStep': '0.0001', 'tickSize': '1'},
+                {'symbol': 'ETH', 'minOrderSize': '0.01', 'maxOrderSize': '50', 'sizeStep': '0.0001', 'tickSize': '1'},
+                {'symbol': 'XRP', 'minOrderSize': '1', 'maxOrderSize': '100000', 'sizeStep': '1', 'tickSize': '0.001'},
+            ])
+        if method == 'GET' and path == '/private/v1/account/assets':
+            return self._gmo_ok([{'symbol': k, 'amount': str(v), 'available': str(v), 'conversionRate': '1'}
+                                 for k, v in self.balances.items()])
+        if method == 'POST' and path == '/private/v1/order':
+            order_id = self.new_order_id()
+            self.orders[order_id] = {'symbol': body['symbol'], 'side': body['side'].lower(),
+                                     'price': body['price'], 'size': body['size']}
+            return self._gmo_ok(order_id)
+        if method == 'GET' and path == '/private/v1/activeOrders':
+            symbol = (query.get('symbol') or [None])[0]
+            orders = [{'orderId': int(i), 'symbol': o['symbol'], 'side': o['side'].upper(), 'executionType': 'LIMIT',
+                       'price': o['price'], 'size': o['size'], 'executedSize': '0', 'status': 'ORDERED'}
+                      for i, o in self.orders.items() if o.get('symbol') == symbol]
+            return self._gmo_ok({'pagination': {'currentPage': 1, 'count': len(orders)}, 'list': orders})
+        if method == 'GET' and path == '/private/v1/latestExecutions':
+            symbol = (query.get('symbol') or [None])[0]
+            page, count = int(query['page'][0]), int(query['count'][0])
+            executions = [{'executionId': int(e['id']), 'orderId': int(e['order_id']), 'symbol': e['symbol'],
+                           'side': e['side'].upper(), 'settleType': 'OPEN', 'size': e['size'], 'price': e['price'],
+                           'lossGain': '0', 'fee': '0',
+                           'timestamp': datetime.fromtimestamp(e['timestamp'], timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'}
+                          for e in reversed(self.executions) if e['symbol'] == symbol]
+            return self._gmo_ok({'pagination': {'currentPage': page, 'count': count},
+                                 'list': executions[(page - 1) * count:page * count]})
+        if method == 'POST' and path == '/private/v1/cancelOrders':
+            canceled = [str(i) for i in body['orderIds'] if str(i) in self.orders]
+            for i in canceled:
+                del self.orders[i]
+            return self._gmo_ok({'success': [int(i) for i in canceled], 'failed': []})
+        if method == 'POST' and path == '/private/v1/changeOrder':
+            self.orders[str(body['orderId'])]['price'] = body['price']
+            return self._gmo_ok(None)
+        if method == 'POST' and path == '/private/v1/cancelBulkOrder':
+            canceled = [i for i, o in self.orders.items() if o.get('symbol') in body.get('symbols', [])]
+            for i in canceled:
+                del self.orders[i]
+            return self._gmo_ok([int(i) for i in canceled])
+        return None
+
+    # --- bitbank
+
+    def _bitbank_order(self, order_id: str, o: dict) -> dict:
+        return {'order_id': int(order_id), 'pair': o['pair'], 'side': o['side'], 'type': 'limit',
+                'start_amount': o['amount'], 'remaining_amount': o['amount'], 'executed_amount': '0',
+                'price': o['price'], 'status': 'UNFILLED', 'ordered_at': int(time.time() * 1000)}
+
+    def bitbank(self, method: str, path: str, query: dict, body: dict) -> dict:
+        parts = path.strip('/').split('/')
+        if method == 'GET' and parts[0] == 'public' and len(parts) == 3 and parts[2] == 'ticker':
+            data = {'sell': str(self.price + self.spread / 2), 'buy': str(self.price - self.spread / 2),
+                    'last': str(self.price), 'open': str(self.price), 'high': str(self.price),
+                    'low': str(self.price), 'vol': '0', 'timestamp': int(time.time() * 1000)}
+        elif method == 'GET' and path == '/private/v1/spot/pairs':
+            data = {'pairs': [
+                {'name': 'btc_jpy', 'base_asset': 'btc', 'quote_asset': 'jpy', 'unit_amount': '0.0001',
+                 'price_digits': 0, 'amount_digits': 4, 'is_enabled': True},
+                {'name': 'eth_jpy', 'base_asset': 'eth', 'quote_asset': 'jpy', 'unit_amount': '0.0001',
+                 'price_digits': 0, 'amount_digits': 4, 'is_enabled': True},
+                {'name': 'xrp_jpy', 'base_asset': 'xrp', 'quote_asset': 'jpy', 'unit_amount': '0.0001',
+                 'price_digits': 3, 'amount_digits': 4, 'is_enabled': True},
+            ]}
+        elif method == 'GET' and path == '/private/v1/user/assets':
+            data = {'assets': [{'asset': k.lower(), 'onhand_amount': str(v), 'free_amount': str(v),
+                                'locked_amount': '0'} for k, v in self.balances.items()]}
+        elif method == 'GET' and path == '/private/v1/user/spot/active_orders':
+            pair = (query.get('pair') or [None])[0]
+            data = {'orders': [self._bitbank_order(i, o) for i, o in self.orders.items() if o.get('pair') == pair]}
+        elif method == 'GET' and path == '/private/v1/user/spot/trade_history':
+            pair = (query.get('pair') or [None])[0]
+            since = int((query.get('since') or [0])[0]) / 1000
+            count = int((query.get('count') or [1000])[0])
+            data = {'trades': [{'trade_id': int(e['id']), 'order_id': int(e['order_id']), 'pair': e['pair'],
+                                'side': e['side'], 'type': 'limit', 'amount': e['size'], 'price': e['price'],
+                                'maker_taker': 'maker', 'executed_at': int(e['timestamp'] * 1000)}
+                               for e in self.executions if e['pair'] == pair and e['timestamp'] >= since][:count]}
+        elif method == 'POST' and path == '/private/v1/user/spot/cancel_order':
+            o = self.orders.pop(str(body['order_id']))
+            data = self._bitbank_order(str(body['order_id']), o)
+        elif method == 'POST' and path == '/private/v1/user/spot/cancel_orders':
+            orders = [(str(i), self.orders.pop(str(i))) for i in body['order_ids'] if str(i) in self.orders]
+            data = {'orders': [self._bitbank_order(i, o) for i, o in orders]}
+        elif method == 'POST' and path == '/private/v1/user/spot/order':
+            order_id = self.new_order_id()
+            self.orders[order_id] = {'pair': body['pair'], 'side': body['side'],
+                                     'price': body['price'], 'amount': body['amount']}
+            data = self._bitbank_order(order_id, self.orders[order_id])
+        else:
+            return None
+        return {'success': 1, 'data': data}
+
+    def handle(self, method: str, url: str, body: dict) -> dict:
+        '''Return the response body of a request, or None if the endpoint is unknown.
+        '''
+        parts = urlsplit(url)
+        exchange, _, path = parts.path.lstrip('/').partition('/')
+        query = parse_qs(parts.query)
+        with self._lock:
+            self.requests[(exchange, method, '/' + path)] += 1
+            if exchange == 'gmo':
+                return self.gmo(method, '/' + path, query, body)
+            if exchange == 'bitbank':
+                return self.bitbank(method, '/' + path, query, body)
+        return None
+
+    def _handler(self):
+        exchange = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def _respond(self, method: str):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                body = json.loads(raw) if raw else {}
+                if exchange.latency:
+                    time.sleep(exchange.latency)
+                res = exchange.handle(method, self.path, body)
+                payload = json.dumps(res if res is not None else {'error': 'not found'}).encode()
+                self.send_response(200 if res is not None else 404)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._respond('GET')
+
+            def do_POST(self):
+                self._respond('POST')
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the stand-in exchange server.')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--price', type=float, default=5_000_000)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds each response is delayed.")
+    args = parser.parse_args()
+
+    exchange = MockExchange(price=args.price, latency=args.latency, port=args.port)
+    logger.info(f'Mock exchange listening on {exchange.url}')
+    for prefix, url in exchange.base_urls().items():
+        logger.info(f'  {prefix} -> {url}')
+    try:
+        exchange.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(asctime)s %(message)s')
+    main()
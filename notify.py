@@ -0,0 +1,265 @@
+"""
+Notification of rebalance results.
+
+Notifications are queued and sent by a background thread, so a slow webhook
+never delays a cycle. Notifications queued within the coalescing window are
+merged into one message, and every sink (Slack, a file, stdout) receives it
+concurrently with a timeout. At exit, pending notifications get a bounded
+time to be sent.
+"""
+import atexit
+from concurrent.futures import Future, wait
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from transport import get_transport
+
+
+logger = logging.getLogger()
+
+# colors of notifications, from the least severe
+COLORS = ('good', 'warning', 'danger')
+
+
+@dataclass(frozen=True)
+class Notification:
+    title: str
+    text: str
+    color: str  # one of COLORS
+
+
+def merge(notifications: list[Notification]) -> Notification:
+    '''Merge notifications into one with the most severe color.
+    '''
+    if len(notifications) == 1:
+        return notifications[0]
+    color = max([n.color for n in notifications], key=lambda c: COLORS.index(c) if c in COLORS else 0)
+    text = '\n'.join([f'*{n.title}*\n{n.text}' for n in notifications])
+    return Notification(f'{len(notifications)} notifications', text, color)
+
+
+class SlackSink:
+    '''Sink posting to a Slack incoming webhook.
+    '''
+
+    name = 'slack'
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, n: Notification) -> None:
+        res = get_transport().post(self.url, data=json.dumps({
+            "attachments": [
+                {
+                    "title": n.title,
+                    "text": n.text,
+                    "color": n.color,
+                }
+            ]
+        }), timeout=self.timeout)
+        if res.status_code >= 400:
+            raise SystemError(f"Slack webhook failed. [status: {res.status_code}, body: {res.text[:200]}]")
+
+
+class FileSink:
+    '''Sink appending notifications to a file as JSON lines.
+    '''
+
+    name = 'file'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, n: Notification) -> None:
+        line = json.dumps({'time': datetime.now(timezone.utc).isoformat(), **asdict(n)}, ensure_ascii=False)
+        with self._lock, open(self.path, 'a') as f:
+            f.write(line + '\n')
+
+
+class StdoutSink:
+    '''Sink printing notifications.
+    '''
+
+    name = 'stdout'
+
+    def send(self, n: Notification) -> None:
+        print(f'[{n.color}] {n.title}\n{n.text}', flush=True)
+
+
+def create_sinks(spec: str = None) -> list:
+    '''Create sinks from a comma separated spec such as 'slack,stdout,file:notifications.jsonl'.
+
+    Default is Slack if SLACK_WEBHOOK_URL is set, otherwise no sink.
+    '''
+    url = os.getenv('SLACK_WEBHOOK_URL')
+    if spec is None:
+        return [SlackSink(url)] if url else []
+    sinks = []
+    for s in filter(None, [s.strip() for s in spec.split(',')]):
+        name, _, arg = s.partition(':')
+        if name == 'slack':
+            if not (arg or url):
+                raise ValueError('Slack sink needs SLACK_WEBHOOK_URL.')
+            sinks.append(SlackSink(arg or url))
+        elif name == 'file':
+            sinks.append(FileSink(arg or 'notifications.jsonl'))
+        elif name == 'stdout':
+            sinks.append(StdoutSink())
+        else:
+            raise ValueError(f"Notification sink is not supported. [{name}]")
+    return sinks
+
+
+class _SinkThread:
+    '''Thread sending notifications to one sink.
+
+    Threads are started with the dispatcher, not at exit, when executors of
+    concurrent.futures no longer accept work.
+    '''
+
+    def __init__(self, sink):
+        self.sink = sink
+        self._jobs = queue.Queue()
+        threading.Thread(target=self.__run, name=f'notify-{sink.name}', daemon=True).start()
+
+    def submit(self, n: Notification) -> Future:
+        future = Future()
+        self._jobs.put((n, future))
+        return future
+
+    def __run(self) -> None:
+        while True:
+            n, future = self._jobs.get()
+            try:
+                future.set_result(self.sink.send(n))
+            except Exception as e:
+                future.set_exception(e)
+
+
+class NotificationDispatcher:
+    '''Background sender of notifications.
+
+    Parameters
+    ----------
+    sinks: list
+        Objects with a name and a send(Notification) method. Each one is called on its own thread.
+    max_queue: int
+        Notifications waiting to be sent. When full, the oldest one is dropped.
+    timeout: float
+        Seconds a sink may take to send one notification before it is given up.
+    coalesce: float
+        Seconds to wait for more notifications after the first one, to merge them into one message.
+    '''
+
+    def __init__(self, sinks: list, max_queue: int = 100, timeout: float = 5.0, coalesce: float = 0.5):
+        self.sinks = list(sinks)
+        self.timeout = timeout
+        self.coalesce = coalesce
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._sink_threads = [_SinkThread(s) for s in self.sinks]
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self.__run, name='notify', daemon=True)
+        self._thread.start()
+
+    def notify(self, title: str, text: str, color: str) -> None:
+        '''Queue a notification without blocking.
+        '''
+        if not self.sinks:
+            return
+        n = Notification(title, text, color)
+        while True:
+            try:
+                self._queue.put_nowait(n)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self._queue.task_done()
+                    self.dropped += 1
+                    logger.warning(f"Dropped oldest notification, queue is full. [dropped: {self.dropped}]")
+                except queue.Empty:
+                    pass
+
+    def flush(self, timeout: float = None) -> bool:
+        '''Wait until queued notifications have been sent. Return False if timed out.
+        '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: float = None) -> None:
+        '''Send pending notifications for up to timeout seconds, then stop.
+        '''
+        timeout = self.timeout + self.coalesce if timeout is None else timeout
+        if not self.flush(timeout):
+            logger.warning(f"Notifications were not sent before exit. [pending: {self._queue.unfinished_tasks}]")
+        self._stopped.set()
+
+    def __run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+
+            # merge what arrives within the coalescing window
+            deadline = time.monotonic() + self.coalesce
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.__send(merge(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def __send(self, n: Notification) -> None:
+        futures = {t.submit(n): t.sink for t in self._sink_threads}
+        done, not_done = wait(futures, timeout=self.timeout)
+        for f in not_done:
+            logger.warning(f"Notification sink timed out. [sink: {futures[f].name}, timeout: {self.timeout}s]")
+        for f in done:
+            if f.exception() is not None:
+                logger.warning(f"Notification sink failed. [sink: {futures[f].name}, error: {f.exception()}]")
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> NotificationDispatcher:
+    '''Return the process wide dispatcher, creating it with the default sinks at first use.
+    '''
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher(create_sinks())
+            atexit.register(_dispatcher.close)
+        return _dispatcher
+
+
+def set_dispatcher(dispatcher: NotificationDispatcher) -> None:
+    '''Replace the process wide dispatcher. It is closed at exit.
+    '''
+    global _dispatcher
+    with _dispatcher_lock:
+        old, _dispatcher = _dispatcher, dispatcher
+    if old is not None and old is not dispatcher:
+        old.close()
+    atexit.register(dispatcher.close)
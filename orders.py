@@ -0,0 +1,104 @@
+"""
+Reconciliation of active orders with the order a cycle wants to have.
+"""
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_EVEN
+import logging
+
+from exchanges import AsyncRebalancer, MarketSnapshot, Order, Rebalancer
+
+
+logger = logging.getLogger()
+
+
+@dataclass
+class Reconciliation:
+    '''Changes made to the active orders by reconcile_orders.
+    '''
+    kept: Order = None
+    amended: Order = None  # order as it was before the price change
+    created: str = None  # id of the new order
+    canceled: list[str] = field(default_factory=list)
+
+    @property
+    def order_id(self) -> str:
+        if self.created:
+            return self.created
+        return (self.amended or self.kept).order_id if (self.amended or self.kept) else None
+
+
+def is_best_price(order: Order, market: MarketSnapshot) -> bool:
+    '''Return True if the order is at the top of its side of the book without crossing.
+    '''
+    if order.side == 'buy':
+        return market.bid <= order.price < market.ask
+    return market.bid < order.price <= market.ask
+
+
+def plan_reconciliation(rebalancer, open_orders: list[Order], market: MarketSnapshot,
+                        side: str = None, quantity: float = None, price: float = None) -> Reconciliation:
+    '''Decide which order to keep or amend and which ones to cancel, without calling the exchange.
+
+    An open order of the same side and quantity is kept when it is at the
+    desired price or already the best price of its side, so it keeps its
+    queue position. Otherwise such an order has its price amended if the
+    exchange supports it. Every other order is canceled. If side is None,
+    all orders are canceled.
+    '''
+    result = Reconciliation()
+    grid = rebalancer.get_tick_grid()
+
+    candidates = []
+    if side:
+        lots = grid.to_lots(quantity, ROUND_HALF_EVEN)
+        candidates = [o for o in open_orders if o.side == side and grid.to_lots(o.quantity, ROUND_HALF_EVEN) == lots]
+
+    for o in candidates:
+        if grid.to_ticks(o.price) == grid.to_ticks(price) or is_best_price(o, market):
+            result.kept = o
+            break
+    if not result.kept and candidates and rebalancer.can_amend_order:
+        result.amended = candidates[0]
+
+    keep = result.kept or result.amended
+    result.canceled = [o.order_id for o in open_orders if o is not keep]
+    return result
+
+
+def reconcile_orders(rebalancer: Rebalancer, open_orders: list[Order], market: MarketSnapshot,
+                     side: str = None, quantity: float = None, price: float = None) -> Reconciliation:
+    '''Make active orders match the desired order with the fewest requests.
+
+    Orders are canceled in bulk as planned by plan_reconciliation, and a new
+    order is created only if none could be kept or amended.
+    '''
+    result = plan_reconciliation(rebalancer, open_orders, market, side, quantity, price)
+    if result.canceled:
+        rebalancer.cancel_orders(result.canceled)
+
+    if result.kept:
+        logger.info(f"Keep order. [order_id: {result.kept.order_id}, side: {side}, price: {result.kept.price}]")
+    elif result.amended:
+        logger.info(f"Amend order. [order_id: {result.amended.order_id}, price: {result.amended.price} -> {price}]")
+        rebalancer.amend_order(result.amended.order_id, price)
+    elif side:
+        result.created = rebalancer.create_order(side=side, quantity=quantity, price=price)
+    return result
+
+
+async def reconcile_orders_async(rebalancer: AsyncRebalancer, open_orders: list[Order], market: MarketSnapshot,
+                                 side: str = None, quantity: float = None, price: float = None) -> Reconciliation:
+    '''reconcile_orders of an AsyncRebalancer.
+    '''
+    result = plan_reconciliation(rebalancer, open_orders, market, side, quantity, price)
+    if result.canceled:
+        await rebalancer.cancel_orders(result.canceled)
+
+    if result.kept:
+        logger.info(f"Keep order. [order_id: {result.kept.order_id}, side: {side}, price: {result.kept.price}]")
+    elif result.amended:
+        logger.info(f"Amend order. [order_id: {result.amended.order_id}, price: {result.amended.price} -> {price}]")
+        await rebalancer.amend_order(result.amended.order_id, price)
+    elif side:
+        result.created = await rebalancer.create_order(side=side, quantity=quantity, price=price)
+    return result
@@ -4,20 +4,59 @@ yajirobe
 
 yajirobe is a bot rebalancing assets.
 """
+import time
+_IMPORT_STARTED_AT = time.perf_counter()  # taken before other imports for --timings
+
 import os
+import signal
+import sys
 import json
 import logging
 import argparse
-import requests
+import asyncio
+import atexit
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from decimal import ROUND_CEILING, ROUND_FLOOR
 
-from exchanges import Rebalancer, LiquidRebalancer, BitbankRebalancer, GmoRebalancer
+from exchanges import (AsyncRebalancer, Rebalancer, SyncRebalancer, available_exchanges, get_async_rebalancer_class,
+                       get_rebalancer_class, registry)
+from exchanges.aio import get_event_loop_thread
+from metrics import MetricsExporter, get_registry
+from notify import NotificationDispatcher, create_sinks, get_dispatcher, set_dispatcher
+from orders import Reconciliation, reconcile_orders, reconcile_orders_async
+from scheduler import Scheduler, install_signal_handlers
+from stages import run_stage, run_stage_async
+from transport import get_async_transport, get_transport
 
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s %(asctime)s %(message)s')
 logger = logging.getLogger()
 
+# seconds taken by startup steps, reported by --timings
+startup_timings: dict[str, float] = {'imports': time.perf_counter() - _IMPORT_STARTED_AT}
+
+
+# difference of asset rates below which no order is created
+REBALANCE_THRESHOLD = 0.005
+
+# rate of base coin to total balance that orders aim for
+TARGET_RATE = 0.5
+
+
+def get_asset_rate_diff(coin_balance: float, base_balance: float, price: float, rate: float = TARGET_RATE) -> float:
+    '''Return how far the asset rates are from the target.
+
+    The value is measured like the difference between the base and
+    cryptocurrency asset rates, which it equals when the target rate is 0.5.
+    '''
+    base_asset_rate = base_balance / (coin_balance * price + base_balance)
+    return abs(base_asset_rate - rate) * 2
+
 
-def estimate_order(coin_balance: float, base_balance: float, price: float) -> (str, float):
+def estimate_order(coin_balance: float, base_balance: float, price: float,
+                   threshold: float = REBALANCE_THRESHOLD, rate: float = TARGET_RATE) -> (str, float):
     '''Decide the order side and size.
     '''
 
@@ -27,16 +66,15 @@ def estimate_order(coin_balance: float, base_balance: float, price: float) -> (s
     # calculate the current asset rate
     base_asset_rate = base_balance / total
     coin_asset_rate = 1.0 - base_asset_rate
-    asset_rate_diff = abs(base_asset_rate - coin_asset_rate)
+    asset_rate_diff = get_asset_rate_diff(coin_balance, base_balance, price, rate)
     logger.info(f"Asset rate: base={(base_asset_rate):.1%}, cryptocurrency={(coin_asset_rate):.1%}, diff={asset_rate_diff:.1%}")
 
     # if difference is small(<1%), do not order to avoid cost
-    if asset_rate_diff < 0.005:
+    if asset_rate_diff < threshold:
         return (None, None,)
 
-    rate = 0.5
-    half_balance = total * rate
-    diff = half_balance - base_balance
+    target_balance = total * rate
+    diff = target_balance - base_balance
     quantity = round(abs(diff) / price, 8)
 
     # determine order side
@@ -45,101 +83,472 @@ def estimate_order(coin_balance: float, base_balance: float, price: float) -> (s
     return side, quantity
 
 
-def send_notificatoin(title: str, text: str, color: str) -> None:
-    '''Send notification of the order result by Slack.
+def check_budget(start: float, budget: float) -> float:
+    '''Log the wall-clock time of the cycle and warn if it exceeds the budget.
     '''
-    swu = os.getenv('SLACK_WEBHOOK_URL')
-    if swu:
-        requests.post(swu, data=json.dumps({
-            "attachments": [
-                {
-                    "title": title,
-                    "text": text,
-                    "color": color,
-                }
-            ]
-        }))
+    elapsed = time.perf_counter() - start
+    logger.info(f'Cycle took {elapsed * 1000:.0f}ms.')
+    if budget is not None and elapsed > budget:
+        logger.warning(f'Cycle exceeded its budget. [elapsed: {elapsed:.3f}s, budget: {budget:.3f}s]')
+    return elapsed
 
 
-def main():
+@dataclass
+class CycleResult:
+    '''Outcome of one rebalance cycle of a symbol.
+    '''
+    exchange: str
+    symbol: str
+    order_id: str = None
+    text: str = None  # notification text, set when an order has been created
+    error: Exception = None
+    elapsed: float = 0.0
+    account: str = None  # name of the account in multi-account runs
 
-    # parse arguments
-    parser = argparse.ArgumentParser()
-    parser.add_argument('-e', '--exchange', action='store', required=True, dest='exchange',
-            help="Exchange name. You can specify liquid, bitbank, gmo.")
-    parser.add_argument('-s', '--symbol', action='store', required=True, dest='symbol',
-            help="Symbol name you want to rebalance such as 'BTC/JPY'. Specify the coin name with a slash in between. Available symbols depend on exchanges.")
-    args = parser.parse_args()
+    @property
+    def ordered(self) -> bool:
+        return self.order_id is not None
 
-    # create balancer
-    if args.exchange.lower() == 'liquid':
-        rebalancer = LiquidRebalancer(args.symbol)
-    elif args.exchange.lower() == 'bitbank':
-        rebalancer = BitbankRebalancer(args.symbol)
-    elif args.exchange.lower() == 'gmo':
-        rebalancer = GmoRebalancer(args.symbol)
-    else:
-        raise ValueError(f"exchange is not supported. [{args.exchange}]")
 
-    # get balance
-    bal = rebalancer.get_balance()
-    bal_str = ', '.join([f'{v} {k}'for k, v in bal.items()])
-    logger.debug(f"Balance: {bal_str}")
+def create_rebalancer(exchange: str, symbol: str, use_async: bool = False, **kwargs) -> Rebalancer:
+    '''Create the adapter of an exchange. If use_async is True, the async adapter is wrapped by SyncRebalancer.
 
-    # get current coin price
-    ltp = rebalancer.get_ltp()
-    logger.info(f'Latest price of {args.symbol}: {ltp:.2f}')
+    kwargs are given to the adapter, such as api_key and api_secret of an account.
+    '''
+    cls = get_async_rebalancer_class(exchange) if use_async else get_rebalancer_class(exchange)
+    start = time.perf_counter()
+    rebalancer = SyncRebalancer(cls(symbol, **kwargs)) if use_async else cls(symbol, **kwargs)
+    startup_timings[f'setup {exchange.lower()} {symbol}'] = time.perf_counter() - start
+    return rebalancer
+
+
+def rebalance(rebalancer: Rebalancer, exchange: str, symbol: str, budget: float = None) -> CycleResult:
+    '''Run one rebalance cycle of a symbol and return its outcome.
+    '''
+    with get_registry().span('yajirobe_cycle_seconds', exchange=exchange.lower(), symbol=symbol):
+        return _run_cycle(rebalancer, exchange, symbol, budget)
 
-    # cancel orders
-    rebalancer.cancel_all_orders()
-    logger.info(f'Canceled active orders')
+
+def plan_order(rebalancer, symbol: str, bal: dict[str, float], market) -> tuple[str, float, float]:
+    '''Return side, quantity and price of the order balancing the assets, or None if no order is needed.
+
+    rebalancer is a Rebalancer or an AsyncRebalancer; only its instrument is used.
+    '''
+    ltp = market.last
+    logger.info(f'Latest price of {symbol}: {ltp:.2f} (bid={market.bid}, ask={market.ask})')
 
     # estimate order side and quantity
     side, qty = estimate_order(bal[rebalancer.trade_coin], bal[rebalancer.base_coin], ltp)
 
     if (not side or not qty) or (qty < rebalancer.get_min_order_size()):
         logger.info('No need to change balance.')
-        return
+        return None
 
-    # adjust quantity
-    min_unit = rebalancer.get_min_order_unit()
-    start = str(min_unit).find('.') + 1
-    prec = len(str(min_unit)[start:])
-    qty_s = str(qty)
-    qty = float(qty_s[0:qty_s.find('.') + prec + 1])
-
-    # adjust order price
-    order_price = ltp
-    bid_price = rebalancer.get_best_bid_price()
-    ask_price = rebalancer.get_best_ask_price()
-
-    # 1 bps to plus/minus order price
-    a = 1 / (10 ** rebalancer.get_price_prec())
-    if side == 'buy' and order_price > bid_price:
-        order_price = bid_price + a
-    elif side == 'sell' and order_price < ask_price:
-        order_price = ask_price - a
-
-    logger.info(f"Order will be created. [symbol='{args.symbol}', side={side}, price={order_price}, qty={qty:.8f}]")
-    try:
-        order_id = rebalancer.create_order(side=side, quantity=qty, price=order_price)
-        t = f"{side.capitalize()} {qty:.8f} {rebalancer.trade_coin} for {order_price} {rebalancer.base_coin} on {args.exchange.lower()}. [order_id={order_id}]"
-        logger.info(t)
-    except Exception as e:
-        logger.error('Failed to create order.')
-        raise e
+    # adjust quantity down to the lot size
+    grid = rebalancer.get_tick_grid()
+    qty = float(grid.size(grid.to_lots(qty)))
+    if qty < rebalancer.get_min_order_size():
+        logger.info('No need to change balance.')
+        return None
+
+    # adjust order price to 1 tick inside the spread, never crossing it
+    bid_ticks = grid.to_ticks(market.bid, ROUND_FLOOR)
+    ask_ticks = grid.to_ticks(market.ask, ROUND_CEILING)
+    if side == 'buy':
+        price_ticks = grid.to_ticks(ltp, ROUND_FLOOR)
+        if ltp > market.bid:
+            price_ticks = max(min(bid_ticks + 1, ask_ticks - 1), bid_ticks)
+    else:
+        price_ticks = grid.to_ticks(ltp, ROUND_CEILING)
+        if ltp < market.ask:
+            price_ticks = min(max(ask_ticks - 1, bid_ticks + 1), ask_ticks)
+    order_price = float(grid.price(price_ticks))
+
+    logger.info(f"Order will be placed. [symbol='{symbol}', side={side}, price={order_price}, qty={qty:.8f}]")
+    return side, qty, order_price
 
-    # create and send notification
+
+def complete_result(result: CycleResult, rebalancer, orders: Reconciliation, bal: dict[str, float], ltp: float,
+                    side: str, qty: float, order_price: float) -> CycleResult:
+    '''Set the order and the notification text of a cycle that wanted an order.
+    '''
+    if orders.kept:
+        logger.info('Active order already matches the balance.')
+        return result
+
+    order_id = orders.order_id
+    t = f"{side.capitalize()} {qty:.8f} {rebalancer.trade_coin} for {order_price} {rebalancer.base_coin} on {result.exchange}. [order_id={order_id}]"
+    logger.info(t)
+
+    # create notification text
     total = int(bal[rebalancer.trade_coin] * ltp + bal[rebalancer.base_coin])
     base_coin_rate = bal[rebalancer.base_coin] / total
-    text = f'''{t}
+    result.order_id = order_id
+    result.text = f'''{t}
 ```
 Balance {total:,} {rebalancer.asset2.upper()}
 {rebalancer.trade_coin.upper()}: {bal[rebalancer.trade_coin]:,.8f} ({1-base_coin_rate:.1%})
 {rebalancer.base_coin.upper()}: {bal[rebalancer.base_coin]:,.8f} ({base_coin_rate:.1%})
 ```
 '''
-    send_notificatoin('Order has been created', text, "good")
+    return result
+
+
+def _run_cycle(rebalancer: Rebalancer, exchange: str, symbol: str, budget: float = None) -> CycleResult:
+    cycle_start = time.perf_counter()
+    result = CycleResult(exchange=exchange.lower(), symbol=symbol)
+
+    # get balance, current coin prices and active orders at the same time
+    stage = run_stage('prefetch', {
+        'balance': rebalancer.get_balance,
+        'market': rebalancer.get_market_snapshot,
+        'orders': rebalancer.get_open_orders,
+        })
+    logger.info(stage.summary())
+
+    bal, market, open_orders = stage['balance'], stage['market'], stage['orders']
+    logger.debug(f"Balance: {', '.join([f'{v} {k}'for k, v in bal.items()])}")
+    logger.info(f'Active orders: {len(open_orders)}')
+
+    plan = plan_order(rebalancer, symbol, bal, market)
+    if plan is None:
+        reconcile_orders(rebalancer, open_orders, market)
+        result.elapsed = check_budget(cycle_start, budget)
+        return result
+
+    try:
+        orders = reconcile_orders(rebalancer, open_orders, market, *plan)
+    except Exception as e:
+        logger.error('Failed to place order.')
+        raise e
+    result.elapsed = check_budget(cycle_start, budget)
+    return complete_result(result, rebalancer, orders, bal, market.last, *plan)
+
+
+async def rebalance_async(rebalancer: AsyncRebalancer, exchange: str, symbol: str,
+                          budget: float = None) -> CycleResult:
+    '''Run one rebalance cycle of a symbol with an async adapter and return its outcome.
+    '''
+    with get_registry().span('yajirobe_cycle_seconds', exchange=exchange.lower(), symbol=symbol):
+        cycle_start = time.perf_counter()
+        result = CycleResult(exchange=exchange.lower(), symbol=symbol)
+
+        # get balance, current coin prices and active orders at the same time
+        stage = await run_stage_async('prefetch', {
+            'balance': rebalancer.get_balance,
+            'market': rebalancer.get_market_snapshot,
+            'orders': rebalancer.get_open_orders,
+            })
+        logger.info(stage.summary())
+
+        bal, market, open_orders = stage['balance'], stage['market'], stage['orders']
+        logger.info(f'Active orders: {len(open_orders)}')
+
+        plan = plan_order(rebalancer, symbol, bal, market)
+        if plan is None:
+            await reconcile_orders_async(rebalancer, open_orders, market)
+            result.elapsed = check_budget(cycle_start, budget)
+            return result
+
+        try:
+            orders = await reconcile_orders_async(rebalancer, open_orders, market, *plan)
+        except Exception as e:
+            logger.error('Failed to place order.')
+            raise e
+        result.elapsed = check_budget(cycle_start, budget)
+        return complete_result(result, rebalancer, orders, bal, market.last, *plan)
+
+
+def load_portfolio(path: str) -> list[dict[str, str]]:
+    '''Load rebalance jobs from a portfolio config file.
+
+    The file is JSON such as {"jobs": [{"exchange": "gmo", "symbol": "BTC/JPY"}]}.
+    '''
+    with open(path) as f:
+        config = json.load(f)
+    jobs = config['jobs']
+    for j in jobs:
+        if 'exchange' not in j or 'symbol' not in j:
+            raise ValueError(f"Job must have exchange and symbol. [{j}]")
+    return jobs
+
+
+def run_portfolio(jobs: list[dict[str, str]], budget: float = None,
+                  rebalancers: dict[tuple[str, str], Rebalancer] = None,
+                  credentials: dict[str, dict] = None) -> list[CycleResult]:
+    '''Rebalance every job in one process.
+
+    Jobs on the same exchange run one after another, and different exchanges
+    run in parallel. A failed job does not stop the others. If rebalancers is
+    given, created rebalancers are kept in it and reused by later calls.
+    credentials are keyword arguments of the adapters keyed by exchange.
+    '''
+    rebalancers = {} if rebalancers is None else rebalancers
+    credentials = credentials or {}
+    by_exchange = defaultdict(list)
+    for j in jobs:
+        by_exchange[j['exchange'].lower()].append(j['symbol'])
+
+    def run_exchange(exchange: str, symbols: list[str]) -> list[CycleResult]:
+        results = []
+        for symbol in symbols:
+            try:
+                rebalancer = rebalancers.get((exchange, symbol))
+                if rebalancer is None:
+                    rebalancer = rebalancers[(exchange, symbol)] = create_rebalancer(
+                            exchange, symbol, **credentials.get(exchange, {}))
+                results.append(rebalance(rebalancer, exchange, symbol, budget))
+            except Exception as e:
+                logger.exception(f"Failed to rebalance. [exchange: {exchange}, symbol: {symbol}]")
+                results.append(CycleResult(exchange=exchange, symbol=symbol, error=e))
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(len(by_exchange), 1)) as executor:
+        futures = [executor.submit(run_exchange, e, s) for e, s in by_exchange.items()]
+        return [r for f in futures for r in f.result()]
+
+
+async def run_portfolio_async(jobs: list[dict[str, str]], budget: float = None,
+                              rebalancers: dict[tuple[str, str], AsyncRebalancer] = None,
+                              credentials: dict[str, dict] = None) -> list[CycleResult]:
+    '''Rebalance every job concurrently on the running event loop with async adapters.
+
+    All jobs share one connection pool, and the rate limiters of each
+    exchange pace their requests. A failed job does not stop the others.
+    '''
+    rebalancers = {} if rebalancers is None else rebalancers
+    credentials = credentials or {}
+
+    async def run_job(exchange: str, symbol: str) -> CycleResult:
+        try:
+            rebalancer = rebalancers.get((exchange, symbol))
+            if rebalancer is None:
+                rebalancer = get_async_rebalancer_class(exchange)(symbol, **credentials.get(exchange, {}))
+                await rebalancer.open()
+                rebalancers[(exchange, symbol)] = rebalancer
+            return await rebalance_async(rebalancer, exchange, symbol, budget)
+        except Exception as e:
+            logger.exception(f"Failed to rebalance. [exchange: {exchange}, symbol: {symbol}]")
+            return CycleResult(exchange=exchange, symbol=symbol, error=e)
+
+    return list(await asyncio.gather(*[run_job(j['exchange'].lower(), j['symbol']) for j in jobs]))
+
+
+def notify_results(results: list[CycleResult]) -> None:
+    '''Send one notification summarizing the results of all jobs.
+    '''
+    failed = [r for r in results if r.error]
+    ordered = [r for r in results if r.ordered]
+    if not failed and not ordered:
+        return
+
+    # results of multi-account runs are prefixed by their account
+    lines = [f'[{r.account}] {r.text}' if r.account else r.text for r in ordered]
+    lines += [f"{f'[{r.account}] ' if r.account else ''}Failed to rebalance {r.symbol} on {r.exchange}: {r.error}"
+              for r in failed]
+    title = f'{len(ordered)} order(s) have been created, {len(failed)} job(s) failed'
+    get_dispatcher().notify(title, '\n'.join(lines), 'danger' if failed else 'good')
+
+
+def run_daemon(jobs: list[dict[str, str]], interval: float, jitter: float, budget: float = None,
+               exporter: MetricsExporter = None, use_async: bool = False) -> None:
+    '''Rebalance jobs periodically in this process until SIGTERM or SIGINT is received.
+
+    Rebalancers and their HTTP connections are created once and reused by every cycle.
+    Metrics are exported after every cycle if exporter is given. If use_async
+    is True, jobs run concurrently with async adapters on the event loop thread.
+    '''
+    rebalancers = {}
+    scheduler = Scheduler(interval, jitter)
+    install_signal_handlers(scheduler)
+
+    def cycle():
+        if use_async:
+            results = get_event_loop_thread().run(run_portfolio_async(jobs, budget, rebalancers))
+        else:
+            results = run_portfolio(jobs, budget, rebalancers)
+        notify_results(results)
+        if exporter:
+            exporter.export()
+
+    logger.info(f'Start daemon. [jobs: {len(jobs)}, interval: {interval}s, jitter: {jitter}s]')
+    try:
+        scheduler.run(cycle)
+    finally:
+        get_transport().close()
+        if use_async:
+            get_event_loop_thread().run(get_async_transport().close())
+    logger.info('Daemon stopped.')
+
+
+def run_stream(exchange: str, symbol: str, budget: float = None, debounce: float = 5.0, url: str = None,
+               use_async: bool = False) -> None:
+    '''Rebalance whenever the asset rate drifts past the threshold on the streaming ticker.
+    '''
+    from stream import DriftMonitor, create_ticker_stream
+
+    jobs = [{'exchange': exchange, 'symbol': symbol}]
+    rebalancer = create_rebalancer(exchange, symbol, use_async)
+    rebalancers = {(exchange.lower(), symbol): rebalancer}
+
+    def on_drift():
+        notify_results(run_portfolio(jobs, budget, rebalancers))
+
+    monitor = DriftMonitor(rebalancer, get_asset_rate_diff, on_drift, REBALANCE_THRESHOLD, debounce)
+    stream = create_ticker_stream(exchange, rebalancer, monitor.on_ticker, url)
+
+    def stop(signum, frame):
+        logger.info(f'Received {signal.Signals(signum).name}, closing stream.')
+        stream.close()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info(f'Start streaming. [exchange: {exchange}, symbol: {symbol}, url: {stream.url}]')
+    try:
+        stream.run()
+    finally:
+        monitor.close()
+        get_transport().close()
+    logger.info('Stream stopped.')
+
+
+def run_accounts_once(path: str, budget: float = None, workers: int = None, use_async: bool = False) -> None:
+    '''Rebalance every account of a manifest in parallel processes and send one notification.
+    '''
+    from accounts import load_accounts, run_accounts, summarize
+
+    start = time.perf_counter()
+    results = run_accounts(load_accounts(path), budget, workers, use_async)
+    logger.info(summarize(results, time.perf_counter() - start))
+    notify_results([c for r in results for c in r.results])
+    if any(r.failed for r in results):
+        sys.exit(1)
+
+
+def get_process_uptime() -> float:
+    '''Return seconds since the process started, or None where /proc is not available.
+    '''
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def report_timings() -> None:
+    '''Log how long interpreter startup, imports, adapter loading and client setup took.
+    '''
+    uptime = get_process_uptime()
+    if uptime is not None:
+        logger.info(f'Timing: process uptime {uptime * 1000:.0f}ms')
+    logger.info(f"Timing: imports {startup_timings['imports'] * 1000:.1f}ms")
+    for name, t in registry.timings.items():
+        logger.info(f'Timing: import adapter {name} {t * 1000:.1f}ms')
+    for name, t in startup_timings.items():
+        if name != 'imports':
+            logger.info(f'Timing: {name} {t * 1000:.1f}ms')
+
+
+def main():
+
+    # parse arguments. entry point adapters are listed only in the help, since finding them is slow
+    show_help = bool({'-h', '--help'} & set(sys.argv[1:]))
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-e', '--exchange', action='store', dest='exchange',
+            help=f"Exchange name. You can specify {', '.join(available_exchanges(include_entry_points=show_help))}.")
+    parser.add_argument('-s', '--symbol', action='store', dest='symbol',
+            help="Symbol name you want to rebalance such as 'BTC/JPY'. Specify the coin name with a slash in between. Available symbols depend on exchanges.")
+    parser.add_argument('-c', '--config', action='store', dest='config',
+            help="Portfolio config file listing exchange and symbol of each job. Used instead of -e and -s.")
+    parser.add_argument('--accounts', action='store', dest='accounts',
+            help="Account manifest listing credentials and jobs of each account. Accounts are rebalanced in parallel processes.")
+    parser.add_argument('--workers', action='store', type=int, default=None, dest='workers',
+            help="Number of worker processes with --accounts. Default is the number of accounts.")
+    parser.add_argument('--budget', action='store', type=float, default=None, dest='budget',
+            help="Wall-clock budget of one cycle in seconds. A warning is logged when the cycle takes longer.")
+    parser.add_argument('--daemon', action='store_true', dest='daemon',
+            help="Keep running and rebalance every --interval seconds until SIGTERM is received.")
+    parser.add_argument('--interval', action='store', type=float, default=3600, dest='interval',
+            help="Seconds between cycles in daemon mode. Default is 3600.")
+    parser.add_argument('--jitter', action='store', type=float, default=0, dest='jitter',
+            help="Maximum random delay in seconds added to each cycle in daemon mode. Default is 0.")
+    parser.add_argument('--stream', action='store_true', dest='stream',
+            help="Subscribe to the streaming ticker and rebalance as soon as the asset rate drifts past the threshold.")
+    parser.add_argument('--stream-url', action='store', default=None, dest='stream_url',
+            help="WebSocket URL used instead of the exchange's one in streaming mode.")
+    parser.add_argument('--debounce', action='store', type=float, default=5.0, dest='debounce',
+            help="Seconds the drift must persist before a rebalance is triggered in streaming mode. Default is 5.")
+    parser.add_argument('--timings', action='store_true', dest='timings',
+            help="Report time taken by startup, imports, adapter loading and client setup.")
+    parser.add_argument('--metrics-file', action='store', default=None, dest='metrics_file',
+            help="Prometheus text file latency histograms of requests, calls and cycles are written to.")
+    parser.add_argument('--metrics-influxdb', action='store_true', dest='metrics_influxdb',
+            help="Write latency histograms to InfluxDB configured by DB_HOST, DB_PORT, DB_USER, DB_PASS and DB_NAME.")
+    parser.add_argument('--notify', action='store', default=None, dest='notify',
+            help="Comma separated notification sinks: slack, stdout and file[:PATH]. Default is slack if SLACK_WEBHOOK_URL is set.")
+    parser.add_argument('--async', action='store_true', dest='use_async',
+            help="Use the asyncio adapters of gmo and bitbank. Portfolio jobs run concurrently on one event loop.")
+    args = parser.parse_args()
+
+    if args.timings:
+        atexit.register(report_timings)
+
+    if args.notify is not None:
+        set_dispatcher(NotificationDispatcher(create_sinks(args.notify)))
+
+    exporter = None
+    if args.metrics_file or args.metrics_influxdb:
+        exporter = MetricsExporter(args.metrics_file, args.metrics_influxdb)
+        if not args.daemon:
+            atexit.register(exporter.export)
+
+    if args.accounts:
+        if args.config or args.exchange or args.symbol or args.daemon or args.stream:
+            parser.error('--accounts cannot be used with -c, -e, -s, --daemon or --stream.')
+        run_accounts_once(args.accounts, args.budget, args.workers, args.use_async)
+        return
+
+    if args.config:
+        if args.exchange or args.symbol:
+            parser.error('-c cannot be used with -e or -s.')
+        jobs = load_portfolio(args.config)
+    elif not args.exchange or not args.symbol:
+        parser.error('-e and -s are required unless -c is given.')
+    else:
+        jobs = [{'exchange': args.exchange, 'symbol': args.symbol}]
+
+    if args.stream:
+        if args.config or args.daemon:
+            parser.error('--stream cannot be used with -c or --daemon.')
+        run_stream(args.exchange, args.symbol, args.budget, args.debounce, args.stream_url, args.use_async)
+        return
+
+    if args.daemon:
+        run_daemon(jobs, args.interval, args.jitter, args.budget, exporter, args.use_async)
+        return
+
+    if args.config:
+        if args.use_async:
+            results = get_event_loop_thread().run(run_portfolio_async(jobs, args.budget))
+        else:
+            results = run_portfolio(jobs, args.budget)
+        notify_results(results)
+        if any(r.error for r in results):
+            sys.exit(1)
+        return
+
+    # create balancer
+    rebalancer = create_rebalancer(args.exchange, args.symbol, args.use_async)
+    result = rebalance(rebalancer, args.exchange, args.symbol, args.budget)
+    startup_timings['cycle'] = result.elapsed
+
+    # send notification
+    if result.ordered:
+        get_dispatcher().notify('Order has been created', result.text, "good")
 
 
 if __name__ == '__main__':
@@ -147,4 +556,4 @@ if __name__ == '__main__':
         main()
     except Exception as e:
         logger.exception('Failed to rebalance.')
-        send_notificatoin('Failed to rebalance', e.__str__(), 'danger')
+        get_dispatcher().notify('Failed to rebalance', e.__str__(), 'danger')
@@ -0,0 +1,88 @@
+"""
+Internal scheduler running rebalance cycles in a resident process.
+"""
+import logging
+import random
+import signal
+import threading
+import time
+from typing import Callable
+
+
+logger = logging.getLogger()
+
+
+class Scheduler:
+    '''Run a job periodically until stopped.
+
+    Cycles start on a fixed cadence of interval seconds with a random delay of
+    up to jitter seconds added to each one. A cycle never starts before the
+    previous one has finished; slots missed by a long cycle are skipped.
+
+    Parameters
+    ----------
+    interval: float
+        Seconds between the starts of two cycles.
+    jitter: float
+        Upper bound of the random delay in seconds added to each start.
+    run_immediately: bool
+        Start the first cycle right away instead of after one interval.
+    '''
+
+    def __init__(self, interval: float, jitter: float = 0.0, run_immediately: bool = True):
+        if interval <= 0:
+            raise ValueError(f"interval must be positive. [{interval}]")
+        if jitter < 0 or jitter >= interval:
+            raise ValueError(f"jitter must be in [0, interval). [{jitter}]")
+        self.interval = interval
+        self.jitter = jitter
+        self.run_immediately = run_immediately
+        self._stop = threading.Event()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def next_slot(self, slot: float, now: float) -> float:
+        '''Return the first slot after now on the cadence starting at slot.
+        '''
+        slots = max(int((now - slot) // self.interval) + 1, 1)
+        if slots > 1:
+            logger.warning(f"Skipped {slots - 1} cycle(s) because the previous cycle overran.")
+        return slot + slots * self.interval
+
+    def run(self, job: Callable[[], None]) -> None:
+        '''Run job on schedule until stop() is called. Errors of a job are logged and do not stop the loop.
+        '''
+        slot = time.monotonic()
+        if not self.run_immediately:
+            slot += self.interval
+
+        while not self.stopped:
+            start_at = slot + random.uniform(0, self.jitter)
+            if self._stop.wait(max(start_at - time.monotonic(), 0)):
+                break
+
+            try:
+                job()
+            except Exception:
+                logger.exception('Cycle failed.')
+
+            slot = self.next_slot(slot, time.monotonic())
+            logger.info(f'Next cycle in {slot - time.monotonic():.0f}s (+ up to {self.jitter:.0f}s jitter).')
+
+        logger.info('Scheduler stopped.')
+
+
+def install_signal_handlers(scheduler: Scheduler) -> None:
+    '''Stop the scheduler on SIGTERM and SIGINT. A running cycle is completed first.
+    '''
+    def handler(signum, frame):
+        logger.info(f'Received {signal.Signals(signum).name}, stopping after the current cycle.')
+        scheduler.stop()
+
+    signal.signal(signal.SIGTERM, handler)
+    signal.signal(signal.SIGINT, handler)
@@ -0,0 +1,84 @@
+#! /usr/bin/env python
+"""
+Load test of rebalance cycles on the simulated exchange.
+
+Every account rebalances every symbol once per round, then the price path of
+every symbol advances by one step and fills the orders the market crosses.
+Nothing goes to the network, so the report measures the throughput of the
+rebalancing logic itself and checks that no balance went negative.
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from exchanges.simulated import START_PRICES, SimulatedExchange, SimulatedRebalancer, set_simulated_exchange
+import rebalance
+
+
+logger = logging.getLogger()
+
+
+def create_symbols(n: int) -> list[str]:
+    '''Return the symbols of coins with known prices, then synthetic ones.
+    '''
+    symbols = [f'{c}/JPY' for c in START_PRICES][:n]
+    return symbols + [f'SIM{i:04d}/JPY' for i in range(n - len(symbols))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test rebalance cycles on the simulated exchange.')
+    parser.add_argument('--symbols', type=int, default=10, help="Number of symbols. Default is 10.")
+    parser.add_argument('--accounts', type=int, default=10, help="Number of accounts. Default is 10.")
+    parser.add_argument('--rounds', type=int, default=10, help="Number of rounds. Default is 10.")
+    parser.add_argument('--maker-fee', type=float, default=0.0, help="Maker fee rate. Default is 0.")
+    parser.add_argument('--taker-fee', type=float, default=0.0, help="Taker fee rate. Default is 0.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds each exchange call waits. Default is 0.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    os.environ['YAJIROBE_CACHE_DIR'] = tempfile.mkdtemp(prefix='yajirobe-simulate-')
+
+    # accounts hold 1,000,000 JPY and coins worth about half of it, so that cycles want orders
+    symbols = create_symbols(args.symbols)
+    balances = {'JPY': 1_000_000}
+    for s in symbols:
+        coin = s.split('/')[0]
+        balances[coin] = 500_000 / START_PRICES.get(coin, 1000)
+    engine = SimulatedExchange(maker_fee=args.maker_fee, taker_fee=args.taker_fee, latency=args.latency,
+                               balances=balances, auto_step=False)
+    set_simulated_exchange(engine)
+
+    # the rebalancing logic targets a share of the whole balance, so each symbol of an account
+    # trades on a balance of its own
+    rebalancers = [SimulatedRebalancer(s, account=f'account-{a}-{s}', engine=engine)
+                   for a in range(args.accounts) for s in symbols]
+    cycles, orders, errors = 0, 0, 0
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for r in rebalancers:
+            try:
+                result = rebalance.rebalance(r, 'simulated', r.symbol)
+                orders += result.ordered
+            except Exception as e:
+                errors += 1
+                logger.warning(f"Cycle failed. [account: {r.account}, symbol: {r.symbol}, error: {e}]")
+            cycles += 1
+        engine.step()
+    elapsed = time.perf_counter() - start
+
+    negatives = [(r.account, k, v) for r in rebalancers for k, v in engine.balances(r.account).items() if v < -1e-9]
+    print(f"symbols={len(symbols)} accounts={args.accounts} rounds={args.rounds} "
+          f"fees=maker {args.maker_fee}/taker {args.taker_fee} latency={args.latency * 1000:.1f}ms")
+    print(f"cycles={cycles} elapsed={elapsed:.2f}s throughput={cycles / elapsed:.0f} cycles/s")
+    print(f"orders={orders} fills={engine.fill_count} errors={errors} fees={engine.fees:,.2f}")
+    if negatives:
+        for a, k, v in negatives[:10]:
+            print(f"negative balance: {a} {k} {v}")
+        raise SystemExit(1)
+    print('no negative balance')
+
+
+if __name__ == '__main__':
+    main()
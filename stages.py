@@ -0,0 +1,103 @@
+"""
+Concurrent execution of independent exchange calls.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+
+logger = logging.getLogger()
+
+
+@dataclass
+class Stage:
+    '''Results and timings of calls that ran concurrently.
+    '''
+    name: str
+    results: dict[str, Any] = field(default_factory=dict)
+    timings: dict[str, float] = field(default_factory=dict)  # seconds taken by each call
+    elapsed: float = 0.0  # wall-clock seconds of the whole stage
+
+    def __getitem__(self, key: str):
+        return self.results[key]
+
+    def summary(self) -> str:
+        calls = ', '.join([f'{k}={v * 1000:.0f}ms' for k, v in self.timings.items()])
+        return f"Stage '{self.name}' took {self.elapsed * 1000:.0f}ms. [{calls}]"
+
+
+def run_stage(name: str, calls: dict[str, Callable[[], Any]]) -> Stage:
+    '''Run calls concurrently and wait for all of them.
+
+    The stage takes as long as the slowest call. If any call fails, the first
+    failure in the order of calls is raised after all calls have finished.
+
+    Parameters
+    ----------
+    name: str
+        Stage name used in logs.
+    calls: dict[str, Callable]
+        Functions taking no arguments, keyed by the name of their result.
+
+    Returns
+    -------
+    Stage
+        Results and timings keyed by the call names.
+    '''
+    stage = Stage(name)
+
+    def timed(key: str, fn: Callable[[], Any]):
+        start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            stage.timings[key] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(len(calls), 1), thread_name_prefix=name) as executor:
+        futures = {k: executor.submit(timed, k, fn) for k, fn in calls.items()}
+        errors = []
+        for k, f in futures.items():
+            try:
+                stage.results[k] = f.result()
+            except Exception as e:
+                logger.error(f"Call failed in stage '{name}'. [call: {k}, error: {e}]")
+                errors.append(e)
+    stage.elapsed = time.perf_counter() - start
+    stage.timings = {k: stage.timings[k] for k in calls if k in stage.timings}
+
+    if errors:
+        raise errors[0]
+    return stage
+
+
+async def run_stage_async(name: str, calls: dict[str, Callable[[], Awaitable]]) -> Stage:
+    '''run_stage of coroutine functions, awaited concurrently on the running event loop.
+    '''
+    stage = Stage(name)
+
+    async def timed(key: str, fn: Callable[[], Awaitable]):
+        start = time.perf_counter()
+        try:
+            return await fn()
+        finally:
+            stage.timings[key] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[timed(k, fn) for k, fn in calls.items()], return_exceptions=True)
+    stage.elapsed = time.perf_counter() - start
+    stage.timings = {k: stage.timings[k] for k in calls if k in stage.timings}
+
+    errors = []
+    for k, r in zip(calls, results):
+        if isinstance(r, Exception):
+            logger.error(f"Call failed in stage '{name}'. [call: {k}, error: {r}]")
+            errors.append(r)
+        else:
+            stage.results[k] = r
+    if errors:
+        raise errors[0]
+    return stage
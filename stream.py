@@ -0,0 +1,258 @@
+"""
+Streaming ticker feeds and drift monitoring.
+
+Ticker streams subscribe to the public WebSocket API of each exchange and pass
+every tick to a DriftMonitor, which triggers a rebalance as soon as the asset
+rate drifts past the threshold. The websocket-client package is required.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+import logging
+import threading
+import time
+from typing import Callable
+
+from exchanges import MarketSnapshot, Rebalancer
+
+
+logger = logging.getLogger()
+
+GMO_WS_URL = 'wss://api.coin.z.com/ws/public/v1'
+BITBANK_WS_URL = 'wss://stream.bitbank.cc/socket.io/?EIO=4&transport=websocket'
+
+
+class TickerStream:
+    '''WebSocket subscription delivering MarketSnapshot of one symbol.
+
+    The connection is reopened with exponential backoff when it drops, until
+    close() is called.
+
+    Parameters
+    ----------
+    url: str
+        WebSocket endpoint. Point it to a local server to run against a stand-in.
+    on_ticker: Callable[[MarketSnapshot], None]
+        Called on the stream thread for every tick.
+    '''
+
+    # seconds waited before the first reconnection, doubled on each failure up to max_reconnect_delay
+    reconnect_delay: float = 1.0
+
+    max_reconnect_delay: float = 60.0
+
+    def __init__(self, url: str, on_ticker: Callable[[MarketSnapshot], None]):
+        self.url = url
+        self.on_ticker = on_ticker
+        self._ws = None
+        self._closed = threading.Event()
+
+    def open(self, ws) -> None:
+        pass
+
+    def parse(self, ws, message: str) -> MarketSnapshot:
+        raise NotImplementedError
+
+    def _on_message(self, ws, message: str) -> None:
+        try:
+            snapshot = self.parse(ws, message)
+        except Exception:
+            logger.exception(f"Failed to parse message. [{message[:200]}]")
+            return
+        if snapshot:
+            self.on_ticker(snapshot)
+
+    def run(self) -> None:
+        '''Receive ticks until close() is called. Blocks the calling thread.
+        '''
+        try:
+            import websocket
+        except ImportError as e:
+            raise ImportError('websocket-client is required for streaming mode.') from e
+
+        delay = self.reconnect_delay
+        while not self._closed.is_set():
+            opened_at = time.monotonic()
+            self._ws = websocket.WebSocketApp(
+                    self.url,
+                    on_open=self.open,
+                    on_message=self._on_message,
+                    on_error=lambda ws, e: logger.error(f"WebSocket error. [url: {self.url}, error: {e}]"))
+            self._ws.run_forever()
+            if self._closed.is_set():
+                break
+
+            # reset backoff if the connection was healthy for a while
+            if time.monotonic() - opened_at > self.max_reconnect_delay:
+                delay = self.reconnect_delay
+            logger.warning(f"WebSocket disconnected, reconnecting in {delay:.0f}s. [url: {self.url}]")
+            if self._closed.wait(delay):
+                break
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def close(self) -> None:
+        '''Stop receiving. The stream thread finishes the close handshake and returns from run().
+        '''
+        self._closed.set()
+        ws = self._ws
+        if ws is None:
+            return
+        ws.keep_running = False
+        # closing the socket here would leave the stream thread waiting on it until its select times out
+        sock = ws.sock
+        if sock is not None and sock.connected:
+            try:
+                sock.send_close()
+            except Exception as e:
+                logger.debug(f"Failed to send close frame. [url: {self.url}, error: {e}]")
+
+
+class GmoTickerStream(TickerStream):
+
+    def __init__(self, symbol: str, on_ticker: Callable[[MarketSnapshot], None], url: str = GMO_WS_URL):
+        super().__init__(url, on_ticker)
+        self.symbol = symbol
+
+    def open(self, ws) -> None:
+        ws.send(json.dumps({'command': 'subscribe', 'channel': 'ticker', 'symbol': self.symbol}))
+
+    def parse(self, ws, message: str) -> MarketSnapshot:
+        ticker = json.loads(message)
+        if ticker.get('channel') != 'ticker' or ticker.get('symbol') != self.symbol:
+            return None
+        return MarketSnapshot(
+                last=float(ticker['last']),
+                bid=float(ticker['bid']),
+                ask=float(ticker['ask']),
+                timestamp=datetime.strptime(ticker['timestamp'], '%Y-%m-%dT%H:%M:%S.%f%z').timestamp())
+
+
+class BitbankTickerStream(TickerStream):
+    '''bitbank stream speaking the Socket.IO (Engine.IO v4) framing over a plain WebSocket.
+    '''
+
+    def __init__(self, pair: str, on_ticker: Callable[[MarketSnapshot], None], url: str = BITBANK_WS_URL):
+        super().__init__(url, on_ticker)
+        self.room = f'ticker_{pair}'
+
+    def parse(self, ws, message: str) -> MarketSnapshot:
+        if message.startswith('0'):
+            # engine.io handshake, then connect to the default namespace
+            ws.send('40')
+        elif message.startswith('40'):
+            ws.send('42' + json.dumps(['join-room', self.room]))
+        elif message == '2':
+            ws.send('3')
+        elif message.startswith('42'):
+            event, payload = json.loads(message[2:])[:2]
+            if event == 'message' and payload.get('room_name') == self.room:
+                ticker = payload['message']['data']
+                return MarketSnapshot(
+                        last=float(ticker['last']),
+                        bid=float(ticker['buy']),
+                        ask=float(ticker['sell']),
+                        timestamp=int(ticker['timestamp']) / 1000)
+        return None
+
+
+def create_ticker_stream(exchange: str, rebalancer: Rebalancer,
+                         on_ticker: Callable[[MarketSnapshot], None], url: str = None) -> TickerStream:
+    kwargs = {'url': url} if url else {}
+    if exchange.lower() == 'gmo':
+        return GmoTickerStream(rebalancer.trade_coin, on_ticker, **kwargs)
+    elif exchange.lower() == 'bitbank':
+        return BitbankTickerStream(f'{rebalancer.trade_coin}_{rebalancer.base_coin}', on_ticker, **kwargs)
+    raise ValueError(f"Streaming is not supported. [{exchange}]")
+
+
+class DriftMonitor:
+    '''Track the asset rate on every tick and rebalance when it drifts.
+
+    A rebalance is triggered when the drift has stayed at or above threshold
+    for debounce seconds, and not within cooldown seconds of the previous
+    one. Rebalances run one at a time on a worker thread so that ticks are
+    never blocked; ticks arriving meanwhile only update the market snapshot.
+
+    Parameters
+    ----------
+    rebalancer: Rebalancer
+        Rebalancer whose balance is tracked. Every tick is cached in it so a
+        triggered cycle does not fetch the ticker again.
+    drift: Callable[[float, float, float], float]
+        Function of (coin balance, base balance, price) returning the drift.
+    on_drift: Callable[[], None]
+        Runs a rebalance cycle.
+    balance_ttl: float
+        Seconds after which the cached balance is fetched again, to notice fills.
+    '''
+
+    def __init__(self, rebalancer: Rebalancer, drift: Callable[[float, float, float], float],
+                 on_drift: Callable[[], None], threshold: float, debounce: float = 5.0,
+                 cooldown: float = 60.0, balance_ttl: float = 60.0):
+        self.rebalancer = rebalancer
+        self.drift = drift
+        self.on_drift = on_drift
+        self.threshold = threshold
+        self.debounce = debounce
+        self.cooldown = cooldown
+        self.balance_ttl = balance_ttl
+        self._balance = None
+        self._balance_at = 0.0
+        self._drift_since = None
+        self._last_trigger = float('-inf')
+        self._busy = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rebalance')
+
+    def _refresh_balance(self) -> None:
+        self._balance = self.rebalancer.get_balance()
+        self._balance_at = time.monotonic()
+
+    def _run(self, job: Callable[[], None]) -> None:
+        try:
+            job()
+        except Exception:
+            logger.exception('Failed to run drift task.')
+        finally:
+            self._busy.release()
+
+    def _submit(self, job: Callable[[], None]) -> bool:
+        if not self._busy.acquire(blocking=False):
+            return False
+        self._executor.submit(self._run, job)
+        return True
+
+    def _rebalance(self) -> None:
+        try:
+            self.on_drift()
+        finally:
+            self._refresh_balance()
+
+    def on_ticker(self, snapshot: MarketSnapshot) -> None:
+        self.rebalancer.update_market_snapshot(snapshot)
+        now = time.monotonic()
+
+        if self._balance is None or now - self._balance_at >= self.balance_ttl:
+            self._submit(self._refresh_balance)
+            return
+        if self._busy.locked():
+            return
+
+        bal = self._balance
+        drift = self.drift(bal[self.rebalancer.trade_coin], bal[self.rebalancer.base_coin], snapshot.last)
+        if drift < self.threshold:
+            self._drift_since = None
+            return
+
+        if self._drift_since is None:
+            self._drift_since = now
+            logger.info(f'Asset rate drifted. [diff: {drift:.2%}, price: {snapshot.last}]')
+        if now - self._drift_since < self.debounce or now - self._last_trigger < self.cooldown:
+            return
+
+        if self._submit(self._rebalance):
+            logger.info(f'Trigger rebalance. [diff: {drift:.2%}, price: {snapshot.last}]')
+            self._last_trigger = now
+            self._drift_since = None
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from accounts import Account, init_worker, load_accounts, rebalance_account
+from exchanges import ratelimit, signing
+
+
+def write_manifest(tmp_path, accounts: list[dict]) -> str:
+    path = tmp_path / 'accounts.json'
+    path.write_text(json.dumps({'accounts': accounts}))
+    return str(path)
+
+
+def test_jobs_need_credentials_of_their_exchange(tmp_path):
+    path = write_manifest(tmp_path, [{'name': 'sub1', 'credentials': {'gmo': {'api_key': '$K', 'api_secret': '$S'}},
+                                      'jobs': [{'exchange': 'bitbank', 'symbol': 'BTC/JPY'}]}])
+    with pytest.raises(ValueError, match='bitbank'):
+        load_accounts(path)
+
+
+def test_empty_credentials_are_rejected(tmp_path):
+    path = write_manifest(tmp_path, [{'name': 'sub1', 'credentials': {'GMO': {'api_key': '$K', 'api_secret': ''}},
+                                      'jobs': [{'exchange': 'gmo', 'symbol': 'BTC/JPY'}]}])
+    with pytest.raises(ValueError, match='credentials'):
+        load_accounts(path)
+
+
+def test_liquid_is_rejected(tmp_path):
+    path = write_manifest(tmp_path, [{'name': 'sub1',
+                                      'credentials': {'liquid': {'api_key': '$K', 'api_secret': '$S'}},
+                                      'jobs': [{'exchange': 'Liquid', 'symbol': 'BTC/JPY'}]}])
+    with pytest.raises(ValueError, match='liquid'):
+        load_accounts(path)
+
+
+def test_accounts_with_credentials(tmp_path):
+    path = write_manifest(tmp_path, [
+        {'name': 'sub1', 'credentials': {'GMO': {'api_key': '$K', 'api_secret': '$S'}},
+         'jobs': [{'exchange': 'GMO', 'symbol': 'BTC/JPY'}]},
+        {'name': 'paper', 'jobs': [{'exchange': 'simulated', 'symbol': 'BTC/JPY'}]},
+    ])
+    accounts = load_accounts(path)
+    assert [a.name for a in accounts] == ['sub1', 'paper']
+    assert accounts[0].credentials == {'gmo': {'api_key': '$K', 'api_secret': '$S'}}
+    assert accounts[1].credentials == {}
+
+
+def test_registries_are_cleared_between_accounts(monkeypatch):
+    monkeypatch.setattr(signing, '_signers', {})
+    monkeypatch.setattr(ratelimit, '_limiters', {})
+    signer = signing.get_signer('gmo', 'key-of-previous-account', 'secret')
+    private = ratelimit.get_rate_limiter('gmo', 'private', 1.0)
+    public = ratelimit.get_rate_limiter('gmo', 'public', 1.0)
+
+    result = rebalance_account(Account('sub1', [{'exchange': 'gmo', 'symbol': 'BTC/JPY'}],
+                                       {'gmo': {'api_key': '$UNSET_API_KEY', 'api_secret': '$UNSET_API_SECRET'}}))
+    assert isinstance(result.error, ValueError)
+    assert signing.get_signer('gmo', 'key-of-previous-account', 'secret') is not signer
+    assert ratelimit.get_rate_limiter('gmo', 'private', 1.0) is not private
+    # public endpoints are limited by address, so their budget is not reset
+    assert ratelimit.get_rate_limiter('gmo', 'public', 1.0) is public
+
+
+def test_workers_share_the_public_rate(monkeypatch):
+    monkeypatch.setattr(ratelimit, '_limiters', {})
+    monkeypatch.setattr(ratelimit, '_shares', {})
+    init_worker(4)
+    assert ratelimit.get_rate_limiter('gmo', 'public', 10.0).rate == 2.5
+    assert ratelimit.get_rate_limiter('gmo', 'private', 6.0).rate == 6.0
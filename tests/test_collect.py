@@ -0,0 +1,8 @@
+from get_metrics.collect import COLLECTORS, available_collectors
+
+
+def test_deposits_are_offered_only_for_liquid():
+    assert available_collectors('liquid') == list(COLLECTORS)
+    assert 'deposits' in COLLECTORS
+    for exchange in ('gmo', 'bitbank'):
+        assert available_collectors(exchange) == ['executions', 'balances']
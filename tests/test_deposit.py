@@ -0,0 +1,66 @@
+from get_metrics import get_deposit
+from get_metrics.get_deposit import deposit_key, exists
+
+
+class StubResultSet:
+
+    def __init__(self, points: list[dict]):
+        self.points = points
+
+    def get_points(self, measurement: str) -> list[dict]:
+        return self.points
+
+
+class StubInfluxDB:
+
+    def __init__(self, points: list[dict]):
+        self.points = points
+        self.queries = []
+
+    def query(self, q: str, epoch: str = None) -> StubResultSet:
+        self.queries.append(q)
+        return StubResultSet(self.points)
+
+
+class StubLiquid:
+
+    def __init__(self, history: list[dict]):
+        self.history = history
+
+    def get_fiat_deposits_history(self, currency: str) -> dict:
+        return {'models': self.history}
+
+
+def test_key_is_the_same_for_api_and_db_values():
+    assert deposit_key('1604411435', '100000.0', 'JPY') == deposit_key(1604411435, 100000, 'JPY')
+    assert deposit_key(1604411435, 100000, 'JPY') != deposit_key(1604411435, 100000, 'USD')
+
+
+def test_exists_looks_up_the_index():
+    index = {deposit_key(1604411435, 100000.0, 'JPY')}
+    assert exists({'created_at': 1604411435, 'net_amount': '100000.0', 'currency': 'JPY'}, index)
+    assert not exists({'created_at': 1604411436, 'net_amount': '100000.0', 'currency': 'JPY'}, index)
+
+
+def test_only_new_deposits_are_written(monkeypatch):
+    history = [
+        {'created_at': 1604411435, 'net_amount': '100000.0', 'currency': 'JPY'},
+        {'created_at': 1604500000, 'net_amount': '50000.0', 'currency': 'JPY'},
+        {'created_at': 1604600000, 'net_amount': '100000.0', 'currency': 'JPY'},
+    ]
+    idb = StubInfluxDB([{'time': 1604411435, 'amount': 100000.0, 'currency': 'JPY'},
+                        {'time': 1604600000, 'amount': 100000.0, 'currency': 'JPY'}])
+    monkeypatch.setattr(get_deposit, 'get_liquid', lambda: StubLiquid(history))
+
+    points = get_deposit.get_deposits(idb)
+    assert [p['fields']['amount'] for p in points] == [50000.0]
+    # the index is loaded with one query over the period of the history
+    assert len(idb.queries) == 1
+    assert 'time >= 1604411435s and time <= 1604600000s' in idb.queries[0]
+
+
+def test_no_history(monkeypatch):
+    idb = StubInfluxDB([])
+    monkeypatch.setattr(get_deposit, 'get_liquid', lambda: StubLiquid([]))
+    assert get_deposit.get_deposits(idb) == []
+    assert idb.queries == []
@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime, timezone
+import json
+from urllib.parse import urlsplit
+
+import pytest
+
+from exchanges import instruments, ratelimit
+from exchanges.gmo import AsyncGmoRebalancer, GmoRebalancer
+
+
+START = 1700000000
+
+
+class Response:
+
+    def __init__(self, body: dict):
+        self.status_code = 200
+        self.text = json.dumps(body)
+        self.headers = {}
+
+
+def execution(i: int) -> dict:
+    t = datetime.fromtimestamp(START + i, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+    return {'executionId': i, 'side': 'BUY', 'price': '3000000', 'size': '0.0001', 'timestamp': t}
+
+
+class StubGmo:
+    '''Stand-in of GMO's API serving latestExecutions pages newest first.
+    '''
+
+    def __init__(self, executions: list[dict]):
+        self.executions = sorted(executions, key=lambda e: e['executionId'], reverse=True)
+        self.pages = []
+
+    def respond(self, url: str, params: dict = None) -> Response:
+        path = urlsplit(url).path
+        if path.endswith('/v1/symbols'):
+            return Response({'status': 0, 'data': []})
+        assert path.endswith('/v1/latestExecutions')
+        page, count = params['page'], params['count']
+        self.pages.append(page)
+        return Response({'status': 0, 'data': {'list': self.executions[(page - 1) * count:page * count]}})
+
+
+class StubTransport:
+
+    def __init__(self, gmo: StubGmo):
+        self.gmo = gmo
+
+    def request(self, method: str, url: str, headers: dict = None, params: dict = None, **kwargs) -> Response:
+        return self.gmo.respond(url, params)
+
+
+class StubAsyncTransport(StubTransport):
+
+    async def request(self, method: str, url: str, headers: dict = None, params: dict = None, **kwargs) -> Response:
+        return self.gmo.respond(url, params)
+
+
+@pytest.fixture(autouse=True)
+def registries(monkeypatch, tmp_path):
+    monkeypatch.setenv('YAJIROBE_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(instruments, '_caches', {})
+    monkeypatch.setattr(ratelimit, '_limiters', {})
+    monkeypatch.setattr(GmoRebalancer, 'rate_limits', {'public': float('inf'), 'private': float('inf')})
+    monkeypatch.setattr(AsyncGmoRebalancer, 'rate_limits', {'public': float('inf'), 'private': float('inf')})
+
+
+def fetch_all(get_executions, since: float, count: int) -> list[str]:
+    # the cursor of the collector moves to the newest returned execution
+    ids = []
+    while True:
+        executions = get_executions(since, count)
+        ids.extend(e.execution_id for e in executions)
+        if len(executions) < count:
+            return ids
+        since = executions[-1].timestamp + 1
+
+
+def test_oldest_executions_are_returned_first():
+    gmo = StubGmo([execution(i) for i in range(250)])
+    rebalancer = GmoRebalancer('BTC/JPY', transport=StubTransport(gmo), api_key='key', api_secret='secret')
+
+    executions = rebalancer.get_executions(START + 10, count=50)
+    assert [e.execution_id for e in executions] == [str(i) for i in range(10, 60)]
+    # pages are read until one is older than since
+    assert gmo.pages == [1, 2, 3]
+
+
+def test_no_execution_is_skipped_over_calls():
+    gmo = StubGmo([execution(i) for i in range(250)])
+    rebalancer = GmoRebalancer('BTC/JPY', transport=StubTransport(gmo), api_key='key', api_secret='secret')
+    assert fetch_all(rebalancer.get_executions, START, 30) == [str(i) for i in range(250)]
+
+
+def test_short_page_is_the_last():
+    gmo = StubGmo([execution(i) for i in range(20)])
+    rebalancer = GmoRebalancer('BTC/JPY', transport=StubTransport(gmo), api_key='key', api_secret='secret')
+    assert len(rebalancer.get_executions(START, count=1000)) == 20
+    assert gmo.pages == [1]
+
+
+def test_async_oldest_executions_are_returned_first():
+    gmo = StubGmo([execution(i) for i in range(250)])
+    rebalancer = AsyncGmoRebalancer('BTC/JPY', transport=StubAsyncTransport(gmo), api_key='key', api_secret='secret')
+
+    executions = asyncio.run(rebalancer.get_executions(START + 10, count=50))
+    assert [e.execution_id for e in executions] == [str(i) for i in range(10, 60)]
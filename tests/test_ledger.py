@@ -0,0 +1,125 @@
+import pytest
+
+from get_metrics.ledger import Position, PositionLedger
+from rebalance import estimate_order
+
+
+def execution(id: int, side: str, qty: float, price: float, timestamp: float = None) -> dict:
+    return {'id': id, 'timestamp': str(timestamp or 1604411435 + id), 'my_side': side,
+            'quantity': str(qty), 'price': str(price)}
+
+
+EXECUTIONS = [
+    execution(1, 'buy', 0.01, 3000000),
+    execution(2, 'buy', 0.02, 3300000),
+    execution(3, 'sell', 0.015, 3500000),
+    execution(4, 'buy', 0.005, 3100000),
+    execution(5, 'sell', 0.01, 2900000),
+]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'ledger' / 'positions.sqlite')
+
+
+def test_replay_gives_the_incremental_position(path):
+    with PositionLedger(path) as ledger:
+        profits = [ledger.apply(e) for e in EXECUTIONS]
+        ledger.commit()
+        assert ledger.replay() == ledger.position
+
+    assert profits[:2] == [0.0, 0.0]
+    avg = (0.01 * 3000000 + 0.02 * 3300000) / 0.03
+    assert profits[2] == pytest.approx((3500000 - avg) * 0.015)
+    assert ledger.position.size == pytest.approx(0.01)
+    assert ledger.position.time == 1604411440
+
+
+def test_applied_executions_are_ignored(path):
+    with PositionLedger(path) as ledger:
+        for e in EXECUTIONS[:3]:
+            ledger.apply(e)
+        position = Position(ledger.position.size, ledger.position.price, ledger.position.avg_buy_price,
+                            ledger.position.time)
+        assert [ledger.apply(e) for e in EXECUTIONS[:3]] == [None, None, None]
+        assert ledger.position == position
+
+
+def test_only_committed_executions_are_kept(path):
+    with PositionLedger(path) as ledger:
+        assert ledger.empty
+        ledger.apply(EXECUTIONS[0])
+        ledger.commit()
+        ledger.apply(EXECUTIONS[1])
+
+    with PositionLedger(path) as ledger:
+        assert ledger.position.size == pytest.approx(0.01)
+        assert ledger.replay() == ledger.position
+        # the execution which was not committed is applied again
+        assert ledger.apply(EXECUTIONS[1]) == 0.0
+
+
+def test_replay_starts_from_the_seeded_position(path):
+    with PositionLedger(path) as ledger:
+        ledger.seed(Position(0.1, 310000.0, 3100000.0))
+        ledger.apply(execution(6, 'sell', 0.05, 3200000))
+        ledger.commit()
+        assert ledger.replay() == ledger.position
+        assert ledger.position.size == pytest.approx(0.05)
+        assert ledger.position.price == pytest.approx(155000.0)
+
+
+def test_reconcile(path):
+    with PositionLedger(path) as ledger:
+        for e in EXECUTIONS:
+            ledger.apply(e)
+        assert ledger.needs_reconcile()
+        record = {'pos_size': ledger.position.size, 'pos_price': ledger.position.price,
+                  'avg_buy_price': ledger.position.avg_buy_price}
+        assert ledger.reconcile(record)
+        assert not ledger.needs_reconcile()
+        assert not ledger.reconcile({**record, 'pos_size': record['pos_size'] + 0.001})
+
+
+def test_position_off_from_record_is_reset_to_it(path):
+    with PositionLedger(path) as ledger:
+        for e in EXECUTIONS[:3]:
+            ledger.apply(e)
+        ledger.commit()
+        # e.g. an execution that never reached the ledger
+        record = {'pos_size': ledger.position.size + 0.01, 'pos_price': ledger.position.price + 31000.0,
+                  'avg_buy_price': ledger.position.avg_buy_price}
+        assert not ledger.reconcile(record)
+        assert (ledger.position.size, ledger.position.price) == (record['pos_size'], record['pos_price'])
+        assert ledger.replay() == ledger.position
+
+        for e in EXECUTIONS[3:]:
+            ledger.apply(e)
+        ledger.commit()
+        assert ledger.replay() == ledger.position
+        assert ledger.reconcile({'pos_size': ledger.position.size, 'pos_price': ledger.position.price,
+                                 'avg_buy_price': ledger.position.avg_buy_price})
+        corrected = ledger.db.execute("select value from meta where key = 'corrected_at'").fetchone()
+        assert corrected is not None
+
+    with PositionLedger(path) as ledger:
+        assert ledger.replay() == ledger.position
+        # applied executions stay applied after the reset
+        assert ledger.apply(EXECUTIONS[0]) is None
+
+
+@pytest.mark.parametrize('coin, base', [(0.01, 60000.0), (0.03, 30000.0)])
+def test_replayed_order_restores_the_target_rate(path, coin, base):
+    # the order estimated from the balances, once executed, gives the position the rate targets
+    price = 3000000.0
+    side, qty = estimate_order(coin, base, price, threshold=0.01, rate=0.5)
+    with PositionLedger(path) as ledger:
+        ledger.seed(Position(coin, coin * price, price))
+        ledger.apply(execution(1, side, qty, price))
+        ledger.commit()
+        position = ledger.replay()
+
+    total = coin * price + base
+    assert position == ledger.position
+    assert position.size * price == pytest.approx(total * 0.5, abs=price * 1e-8)
@@ -0,0 +1,100 @@
+from exchanges import MarketSnapshot, Order
+from exchanges.instruments import Instrument
+from exchanges.ticks import TickGrid
+from orders import plan_reconciliation, reconcile_orders
+
+
+MARKET = MarketSnapshot(last=100.0, bid=99.0, ask=101.0, timestamp=0.0)
+
+
+class StubRebalancer:
+
+    def __init__(self, can_amend_order: bool = False):
+        self.can_amend_order = can_amend_order
+        self.grid = TickGrid(Instrument('TEST', tick_size=1, lot_size=0.0001, min_size=0.0001))
+        self.canceled = []
+        self.amended = []
+        self.created = []
+
+    def get_tick_grid(self) -> TickGrid:
+        return self.grid
+
+    def cancel_orders(self, order_ids: list[str]) -> None:
+        self.canceled.extend(order_ids)
+
+    def amend_order(self, order_id: str, price: float) -> None:
+        self.amended.append((order_id, price))
+
+    def create_order(self, side: str, quantity: float, price: float) -> str:
+        self.created.append((side, quantity, price))
+        return 'new'
+
+
+def test_keep_order_at_desired_price():
+    orders = [Order('1', 'buy', 98.0, 0.5)]
+    plan = plan_reconciliation(StubRebalancer(), orders, MARKET, 'buy', 0.5, 98.0)
+    assert plan.kept is orders[0]
+    assert plan.amended is None
+    assert plan.canceled == []
+
+
+def test_keep_order_at_best_price():
+    orders = [Order('1', 'buy', 100.0, 0.5)]
+    plan = plan_reconciliation(StubRebalancer(), orders, MARKET, 'buy', 0.5, 98.0)
+    assert plan.kept is orders[0]
+
+
+def test_amend_order_at_other_price():
+    orders = [Order('1', 'buy', 97.0, 0.5)]
+    plan = plan_reconciliation(StubRebalancer(can_amend_order=True), orders, MARKET, 'buy', 0.5, 98.0)
+    assert plan.kept is None
+    assert plan.amended is orders[0]
+    assert plan.canceled == []
+
+
+def test_cancel_order_at_other_price_without_amend():
+    orders = [Order('1', 'buy', 97.0, 0.5)]
+    plan = plan_reconciliation(StubRebalancer(), orders, MARKET, 'buy', 0.5, 98.0)
+    assert plan.kept is None and plan.amended is None
+    assert plan.canceled == ['1']
+
+
+def test_cancel_orders_of_other_side_or_quantity():
+    orders = [Order('1', 'sell', 98.0, 0.5), Order('2', 'buy', 98.0, 0.4), Order('3', 'buy', 98.0, 0.5)]
+    plan = plan_reconciliation(StubRebalancer(), orders, MARKET, 'buy', 0.5, 98.0)
+    assert plan.kept is orders[2]
+    assert plan.canceled == ['1', '2']
+
+
+def test_quantity_compared_in_lots():
+    orders = [Order('1', 'buy', 98.0, 0.1 + 0.2)]
+    plan = plan_reconciliation(StubRebalancer(), orders, MARKET, 'buy', 0.3, 98.0)
+    assert plan.kept is orders[0]
+
+
+def test_cancel_all_orders_without_side():
+    orders = [Order('1', 'buy', 98.0, 0.5), Order('2', 'sell', 102.0, 0.5)]
+    plan = plan_reconciliation(StubRebalancer(), orders, MARKET)
+    assert plan.kept is None and plan.amended is None
+    assert plan.canceled == ['1', '2']
+
+
+def test_reconcile_orders_creates_order_only_when_none_is_kept():
+    rebalancer = StubRebalancer()
+    result = reconcile_orders(rebalancer, [Order('1', 'buy', 97.0, 0.5)], MARKET, 'buy', 0.5, 98.0)
+    assert rebalancer.canceled == ['1']
+    assert rebalancer.created == [('buy', 0.5, 98.0)]
+    assert result.order_id == 'new'
+
+    rebalancer = StubRebalancer()
+    result = reconcile_orders(rebalancer, [Order('1', 'buy', 98.0, 0.5)], MARKET, 'buy', 0.5, 98.0)
+    assert rebalancer.canceled == [] and rebalancer.created == []
+    assert result.order_id == '1'
+
+
+def test_reconcile_orders_amends_in_place():
+    rebalancer = StubRebalancer(can_amend_order=True)
+    result = reconcile_orders(rebalancer, [Order('1', 'buy', 97.0, 0.5)], MARKET, 'buy', 0.5, 98.0)
+    assert rebalancer.amended == [('1', 98.0)]
+    assert rebalancer.canceled == [] and rebalancer.created == []
+    assert result.order_id == '1'
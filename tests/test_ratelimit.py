@@ -0,0 +1,144 @@
+import pytest
+
+from exchanges import ratelimit
+from exchanges.ratelimit import AdaptiveRateLimiter, RateLimitError
+
+
+class Clock:
+    '''Stand-in of the time module of ratelimit, whose sleep advances the clock.
+    '''
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        assert seconds >= 0
+        # like a real clock, time moves on even when a float rounding error is waited for
+        self.now += max(seconds, 1e-9)
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, 'time', clock)
+    return clock
+
+
+def test_burst_then_refill_at_rate(clock):
+    limiter = AdaptiveRateLimiter(rate=5.0)
+    for _ in range(5):
+        assert limiter.acquire() == 0.0
+    assert limiter.acquire() == pytest.approx(0.2)
+    clock.now += 0.1
+    assert limiter.acquire() == pytest.approx(0.1)
+
+
+def test_refill_does_not_exceed_burst(clock):
+    limiter = AdaptiveRateLimiter(rate=2.0, burst=3.0)
+    clock.now += 60
+    for _ in range(3):
+        assert limiter.acquire() == 0.0
+    assert limiter.acquire() == pytest.approx(0.5)
+
+
+def test_throttled_halves_rate_and_pauses(clock):
+    limiter = AdaptiveRateLimiter(rate=8.0)
+    assert limiter.on_throttled() == pytest.approx(0.25)
+    assert limiter.rate == 4.0
+    assert limiter.acquire() == pytest.approx(0.25)
+
+
+def test_rate_is_not_lowered_below_min_rate(clock):
+    limiter = AdaptiveRateLimiter(rate=8.0)
+    for _ in range(10):
+        limiter.on_throttled()
+    assert limiter.rate == 1.0
+
+
+def test_retry_after_sets_the_pause(clock):
+    limiter = AdaptiveRateLimiter(rate=10.0)
+    assert limiter.on_throttled(retry_after=3.0) == 3.0
+    # a shorter Retry-After does not end an earlier pause
+    limiter.on_throttled(retry_after=1.0)
+    assert limiter.acquire() == pytest.approx(3.0)
+
+
+def test_rate_recovers_on_success(clock):
+    limiter = AdaptiveRateLimiter(rate=10.0, recovery=0.1)
+    limiter.on_throttled()
+    assert limiter.rate == 5.0
+    for _ in range(3):
+        limiter.on_success()
+    assert limiter.rate == pytest.approx(8.0)
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.rate == 10.0
+
+
+def test_unlimited_rate_does_not_wait(clock):
+    limiter = AdaptiveRateLimiter(float('inf'))
+    # calls on the same clock tick used to make the tokens NaN
+    for _ in range(100):
+        assert limiter.acquire() == 0.0
+    limiter.on_throttled(retry_after=2.0)
+    assert limiter.acquire() == pytest.approx(2.0)
+    assert limiter.acquire() == 0.0
+
+
+class Response:
+
+    def __init__(self, status_code: int, text: str = '{}', headers: dict = None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+class StubTransport:
+
+    def __init__(self, responses: list[Response]):
+        self.responses = list(responses)
+        self.requests = 0
+
+    def request(self, method: str, url: str, headers: dict = None, **kwargs) -> Response:
+        self.requests += 1
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def rebalancer_class():
+    from exchanges.base import Rebalancer
+
+    class StubRebalancer(Rebalancer, timed=False):
+        exchange = 'test-ratelimit'
+        get_balance = cancel_all_orders = get_open_orders = cancel_orders = None
+        fetch_market_snapshot = create_order = get_instrument = None
+
+    StubRebalancer.__abstractmethods__ = frozenset()
+    return StubRebalancer
+
+
+def test_request_waits_retry_after_and_signs_again(clock, monkeypatch, rebalancer_class):
+    limiter = AdaptiveRateLimiter(rate=10.0)
+    monkeypatch.setattr(ratelimit, '_limiters', {('test-ratelimit', 'private'): limiter})
+    transport = StubTransport([Response(429, headers={'Retry-After': '2'}), Response(200, '{"ok": 1}')])
+    signs = []
+    rebalancer = rebalancer_class('BTC/JPY', transport=transport)
+
+    start = clock.now
+    body = rebalancer._request('private', 'GET', 'https://example.com/v1/x', sign=lambda: signs.append(1) or {})
+    assert body == {'ok': 1}
+    assert clock.now - start == pytest.approx(2.0)
+    assert transport.requests == 2 and len(signs) == 2
+    assert limiter.rate == pytest.approx(5.0 + 10.0 * limiter.recovery)
+
+
+def test_request_raises_after_retries(clock, monkeypatch, rebalancer_class):
+    monkeypatch.setattr(ratelimit, '_limiters', {('test-ratelimit', 'public'): AdaptiveRateLimiter(rate=10.0)})
+    transport = StubTransport([Response(429)] * 4)
+    rebalancer = rebalancer_class('BTC/JPY', transport=transport)
+    with pytest.raises(RateLimitError):
+        rebalancer._request('public', 'GET', 'https://example.com/v1/x')
+    assert transport.requests == rebalancer.max_throttle_retries + 1
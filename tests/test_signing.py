@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import hmac
+import threading
+
+import pytest
+
+from exchanges import signing
+from exchanges.signing import HmacSigner, NonceGenerator, get_signer
+
+
+def test_nonces_are_unique_and_increasing_under_contention():
+    nonces = NonceGenerator()
+    barrier = threading.Barrier(8)
+
+    def take(_) -> list[int]:
+        barrier.wait()
+        return [nonces.next() for _ in range(2000)]
+
+    with ThreadPoolExecutor(8) as executor:
+        taken = list(executor.map(take, range(8)))
+
+    for values in taken:
+        assert all(a < b for a, b in zip(values, values[1:]))
+    values = [v for vs in taken for v in vs]
+    assert len(set(values)) == len(values)
+
+
+def test_nonces_do_not_go_back_with_the_clock(monkeypatch):
+    nonces = NonceGenerator()
+    monkeypatch.setattr(signing.time, 'time_ns', lambda: 2_000_000_000)
+    first = nonces.next()
+    monkeypatch.setattr(signing.time, 'time_ns', lambda: 1_000_000_000)
+    assert nonces.next() == first + 1
+
+
+def test_signature_is_hmac_sha256_of_secret():
+    signer = HmacSigner('key', 'secret')
+    expected = hmac.new(b'secret', b'1700000000000GET/v1/account/assets', hashlib.sha256).hexdigest()
+    assert signer.sign('1700000000000GET/v1/account/assets') == expected
+    # the key state is copied, so signing again gives the same signature
+    assert signer.sign('1700000000000GET/v1/account/assets') == expected
+
+
+def test_signer_needs_credentials():
+    with pytest.raises(ValueError):
+        HmacSigner('key', None)
+
+
+def test_signers_of_a_key_share_nonces():
+    a = get_signer('test', 'shared-key', 'secret')
+    assert get_signer('test', 'shared-key', 'secret') is a
+    assert get_signer('test', 'other-key', 'secret').nonces is not a.nonces
@@ -0,0 +1,295 @@
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+import stream
+from exchanges import MarketSnapshot
+from rebalance import get_asset_rate_diff
+from stream import BitbankTickerStream, DriftMonitor, GmoTickerStream
+
+
+GMO_TICKER = {'channel': 'ticker', 'symbol': 'BTC', 'last': '3000000', 'bid': '2999000', 'ask': '3001000',
+              'timestamp': '2021-01-01T00:00:00.000Z'}
+
+
+def bitbank_ticker(room: str = 'ticker_btc_jpy', last: str = '3000000') -> str:
+    data = {'last': last, 'buy': '2999000', 'sell': '3001000', 'timestamp': 1609459200000}
+    return '42' + json.dumps(['message', {'room_name': room, 'message': {'data': data}}])
+
+
+class LocalWebSocketServer:
+    '''Stand-in of an exchange's WebSocket API on localhost.
+
+    Each connection is served the messages of the next session and then
+    dropped, except the last one, which stays open until the client closes it.
+    Text frames received from the client are kept in received.
+    '''
+
+    def __init__(self, sessions: list[list[str]]):
+        self.sessions = list(sessions)
+        self.received = []
+        self.connections = 0
+        self._sock = socket.create_server(('127.0.0.1', 0))
+        self._sock.settimeout(0.1)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self.__serve, daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        return f'ws://127.0.0.1:{self._sock.getsockname()[1]}/'
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join(5)
+        self._sock.close()
+
+    def __serve(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            messages = self.sessions.pop(0) if self.sessions else []
+            last = not self.sessions
+            self.connections += 1
+            with conn:
+                self.__handshake(conn)
+                reader = threading.Thread(target=self.__read, args=(conn, ), daemon=True)
+                reader.start()
+                for m in messages:
+                    conn.sendall(self.__frame(0x1, m.encode()))
+                if last:
+                    reader.join(5)
+                else:
+                    time.sleep(0.1)
+                    conn.sendall(self.__frame(0x8, b''))
+
+    def __handshake(self, conn: socket.socket) -> None:
+        request = b''
+        while b'\r\n\r\n' not in request:
+            request += conn.recv(4096)
+        key = [line.split(b':', 1)[1].strip() for line in request.split(b'\r\n')
+               if line.lower().startswith(b'sec-websocket-key:')][0]
+        accept = base64.b64encode(hashlib.sha1(key + b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11').digest())
+        conn.sendall(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                     b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+
+    @staticmethod
+    def __frame(opcode: int, payload: bytes) -> bytes:
+        if len(payload) < 126:
+            return bytes([0x80 | opcode, len(payload)]) + payload
+        return bytes([0x80 | opcode, 126]) + struct.pack('!H', len(payload)) + payload
+
+    def __read(self, conn: socket.socket) -> None:
+        f = conn.makefile('rb')
+        try:
+            while True:
+                header = f.read(2)
+                if len(header) < 2:
+                    return
+                opcode, length = header[0] & 0x0f, header[1] & 0x7f
+                if length == 126:
+                    length = struct.unpack('!H', f.read(2))[0]
+                elif length == 127:
+                    length = struct.unpack('!Q', f.read(8))[0]
+                mask = f.read(4) if header[1] & 0x80 else b'\0\0\0\0'
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(f.read(length)))
+                if opcode == 0x8:
+                    conn.sendall(self.__frame(0x8, payload[:2]))
+                    return
+                if opcode == 0x1:
+                    self.received.append(payload.decode())
+        except OSError:
+            return
+
+
+def wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def run_stream(ticker_stream) -> threading.Thread:
+    ticker_stream.reconnect_delay = 0.01
+    thread = threading.Thread(target=ticker_stream.run, daemon=True)
+    thread.start()
+    return thread
+
+
+class StubWebSocket:
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message: str) -> None:
+        self.sent.append(message)
+
+
+def test_gmo_parse_ignores_other_symbols_and_channels():
+    s = GmoTickerStream('BTC', None)
+    snapshot = s.parse(StubWebSocket(), json.dumps(GMO_TICKER))
+    assert snapshot == MarketSnapshot(last=3000000.0, bid=2999000.0, ask=3001000.0, timestamp=1609459200.0)
+    assert s.parse(StubWebSocket(), json.dumps({**GMO_TICKER, 'symbol': 'ETH'})) is None
+    assert s.parse(StubWebSocket(), json.dumps({**GMO_TICKER, 'channel': 'trades'})) is None
+
+
+def test_bitbank_socket_io_framing():
+    s = BitbankTickerStream('btc_jpy', None)
+    ws = StubWebSocket()
+    assert s.parse(ws, '0{"sid":"abc","pingInterval":25000}') is None
+    assert s.parse(ws, '40{"sid":"def"}') is None
+    assert s.parse(ws, '2') is None
+    assert s.parse(ws, bitbank_ticker(room='ticker_eth_jpy')) is None
+    assert ws.sent == ['40', '42["join-room", "ticker_btc_jpy"]', '3']
+
+    snapshot = s.parse(ws, bitbank_ticker())
+    assert snapshot == MarketSnapshot(last=3000000.0, bid=2999000.0, ask=3001000.0, timestamp=1609459200.0)
+
+
+def test_broken_message_is_skipped():
+    ticks = []
+    s = GmoTickerStream('BTC', ticks.append)
+    s._on_message(StubWebSocket(), '{"channel": "ticker", "symbol": "BTC"}')
+    s._on_message(StubWebSocket(), json.dumps(GMO_TICKER))
+    assert [t.last for t in ticks] == [3000000.0]
+
+
+def test_gmo_stream_subscribes_again_after_reconnect():
+    server = LocalWebSocketServer([[json.dumps(GMO_TICKER)], [json.dumps({**GMO_TICKER, 'last': '3100000'})]])
+    ticks = []
+    s = GmoTickerStream('BTC', ticks.append, url=server.url)
+    thread = run_stream(s)
+    try:
+        wait_until(lambda: len(ticks) == 2)
+    finally:
+        s.close()
+        thread.join(5)
+        server.stop()
+
+    assert not thread.is_alive()
+    assert [t.last for t in ticks] == [3000000.0, 3100000.0]
+    assert server.connections == 2
+    subscribe = json.dumps({'command': 'subscribe', 'channel': 'ticker', 'symbol': 'BTC'})
+    assert server.received == [subscribe, subscribe]
+
+
+def test_bitbank_stream_joins_room_and_answers_ping():
+    server = LocalWebSocketServer([['0{"sid":"abc"}', '40{"sid":"def"}', '2', bitbank_ticker()]])
+    ticks = []
+    s = BitbankTickerStream('btc_jpy', ticks.append, url=server.url)
+    thread = run_stream(s)
+    try:
+        wait_until(lambda: ticks and len(server.received) == 3)
+    finally:
+        s.close()
+        thread.join(5)
+        server.stop()
+
+    assert not thread.is_alive()
+    assert [t.last for t in ticks] == [3000000.0]
+    assert server.received == ['40', '42["join-room", "ticker_btc_jpy"]', '3']
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class StubRebalancer:
+
+    trade_coin = 'BTC'
+    base_coin = 'JPY'
+
+    def __init__(self, balance: dict[str, float]):
+        self.balance = balance
+        self.snapshot = None
+
+    def get_balance(self) -> dict[str, float]:
+        return dict(self.balance)
+
+    def update_market_snapshot(self, snapshot: MarketSnapshot) -> None:
+        self.snapshot = snapshot
+
+
+def tick(price: float) -> MarketSnapshot:
+    return MarketSnapshot(last=price, bid=price - 1, ask=price + 1, timestamp=0.0)
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(stream, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def monitor(clock):
+    # half of 1,000,000 JPY in BTC at 3,000,000 JPY
+    rebalancer = StubRebalancer({'BTC': 500000 / 3000000, 'JPY': 500000.0})
+    triggers = []
+    monitor = DriftMonitor(rebalancer, lambda c, b, p: get_asset_rate_diff(c, b, p, 0.5), lambda: triggers.append(1),
+                           threshold=0.01, debounce=5.0, cooldown=60.0, balance_ttl=3600.0)
+    monitor.on_ticker(tick(3000000.0))  # fetches the balance
+    wait_until(lambda: not monitor._busy.locked())
+    monitor.triggers = triggers
+    yield monitor
+    monitor.close()
+
+
+def feed(monitor: DriftMonitor, price: float) -> None:
+    monitor.on_ticker(tick(price))
+    wait_until(lambda: not monitor._busy.locked())
+
+
+def test_drift_below_threshold_does_not_trigger(monitor, clock):
+    for _ in range(10):
+        clock.now += 10
+        feed(monitor, 3050000.0)
+    assert monitor.triggers == []
+    assert monitor.rebalancer.snapshot.last == 3050000.0
+
+
+def test_drift_triggers_after_debounce(monitor, clock):
+    feed(monitor, 3300000.0)
+    clock.now += 4
+    feed(monitor, 3300000.0)
+    assert monitor.triggers == []
+    clock.now += 1
+    feed(monitor, 3300000.0)
+    assert monitor.triggers == [1]
+
+
+def test_drift_back_under_threshold_restarts_debounce(monitor, clock):
+    feed(monitor, 3300000.0)
+    clock.now += 4
+    feed(monitor, 3000000.0)
+    clock.now += 4
+    feed(monitor, 3300000.0)
+    clock.now += 4
+    feed(monitor, 3300000.0)
+    assert monitor.triggers == []
+
+
+def test_cooldown_after_trigger(monitor, clock):
+    feed(monitor, 3300000.0)
+    clock.now += 5
+    feed(monitor, 3300000.0)
+    for _ in range(5):
+        clock.now += 10
+        feed(monitor, 3300000.0)
+    assert monitor.triggers == [1]
+    clock.now += 10
+    feed(monitor, 3300000.0)
+    assert monitor.triggers == [1, 1]
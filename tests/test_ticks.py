@@ -0,0 +1,65 @@
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR
+
+import pytest
+
+from exchanges import MarketSnapshot
+from exchanges.base import InstrumentMixin
+from exchanges.instruments import Instrument
+from exchanges.ticks import TickGrid
+from rebalance import plan_order
+
+
+class StubRebalancer(InstrumentMixin):
+
+    asset1 = 'BTC'
+    asset2 = 'JPY'
+
+    def __init__(self, instrument: Instrument):
+        self.instrument = instrument
+
+    def get_instrument(self) -> Instrument:
+        return self.instrument
+
+
+def test_to_ticks_is_exact_for_decimal_steps():
+    grid = TickGrid(Instrument('XRP', tick_size=0.001, lot_size=0.0001, min_size=0.0001))
+    assert grid.to_ticks(0.3) == 300
+    assert grid.to_ticks(0.1 + 0.2, ROUND_FLOOR) == 300
+    assert grid.to_ticks(0.3001, ROUND_FLOOR) == 300
+    assert grid.to_ticks(0.3001, ROUND_CEILING) == 301
+    assert grid.price(301) == Decimal('0.301')
+
+
+def test_sizes_are_rounded_down_and_formatted_without_exponent():
+    grid = TickGrid(Instrument('BTC', tick_size=1, lot_size=1e-05, min_size=1e-05))
+    assert grid.to_lots(0.000019) == 1
+    assert grid.format_size(1e-05) == '0.00001'
+    assert grid.format_size(0.123456789) == '0.12345'
+    assert grid.format_price(5432100.4) == '5432100'
+
+
+@pytest.mark.parametrize('tick_size, bid, ask', [(1, 100.0, 101.0), (0.001, 0.5, 0.501)])
+def test_order_price_stays_on_its_side_at_1_tick_spread(tick_size, bid, ask):
+    rebalancer = StubRebalancer(Instrument('BTC', tick_size=tick_size, lot_size=0.0001, min_size=0.0001))
+    market = MarketSnapshot(last=ask, bid=bid, ask=ask, timestamp=0.0)
+
+    side, _, price = plan_order(rebalancer, 'BTC/JPY', {'BTC': 0.0, 'JPY': 1000.0}, market)
+    assert (side, price) == ('buy', bid)
+
+    side, _, price = plan_order(rebalancer, 'BTC/JPY', {'BTC': 1000.0 / bid, 'JPY': 0.0}, market)
+    assert (side, price) == ('sell', ask)
+
+
+def test_order_price_is_1_tick_inside_wider_spread():
+    rebalancer = StubRebalancer(Instrument('BTC', tick_size=1, lot_size=0.0001, min_size=0.0001))
+    market = MarketSnapshot(last=103.0, bid=100.0, ask=104.0, timestamp=0.0)
+    assert plan_order(rebalancer, 'BTC/JPY', {'BTC': 0.0, 'JPY': 1000.0}, market)[2] == 101.0
+    market = MarketSnapshot(last=101.0, bid=100.0, ask=104.0, timestamp=0.0)
+    assert plan_order(rebalancer, 'BTC/JPY', {'BTC': 10.0, 'JPY': 0.0}, market)[2] == 103.0
+
+
+def test_order_price_off_grid_book_does_not_cross():
+    rebalancer = StubRebalancer(Instrument('BTC', tick_size=1, lot_size=0.0001, min_size=0.0001))
+    market = MarketSnapshot(last=100.7, bid=100.2, ask=100.7, timestamp=0.0)
+    side, _, price = plan_order(rebalancer, 'BTC/JPY', {'BTC': 0.0, 'JPY': 1000.0}, market)
+    assert side == 'buy' and price <= market.bid
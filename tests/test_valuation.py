@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from get_metrics.valuation import Valuation, balance_point, build_price_index, value_balances
+
+
+PRODUCTS = [
+    {'base_currency': 'BTC', 'currency': 'JPY', 'last_traded_price': '3000000.0'},
+    {'base_currency': 'ETH', 'currency': 'JPY', 'last_traded_price': '200000.0'},
+    {'base_currency': 'ETH', 'currency': 'BTC', 'last_traded_price': '0.066'},
+    {'base_currency': 'BTC', 'currency': 'USD', 'last_traded_price': '27000.0'},
+]
+
+
+def test_price_index_keeps_the_quote_currency():
+    assert build_price_index(PRODUCTS) == {'BTC': 3000000.0, 'ETH': 200000.0}
+    assert build_price_index(PRODUCTS, quote='BTC') == {'ETH': 0.066}
+
+
+def test_balances_of_several_exchanges_are_valued_in_order():
+    prices = {'liquid': build_price_index(PRODUCTS), 'gmo': {'BTC': 3100000.0}}
+    valuations = value_balances([('liquid', 'BTC', 0.5), ('gmo', 'BTC', 0.5), ('liquid', 'JPY', 1000.0),
+                                 ('bitbank', 'ETH', 1.0)], prices)
+    assert valuations == [
+        Valuation('liquid', 'BTC', 0.5, 1500000.0),
+        Valuation('gmo', 'BTC', 0.5, 1550000.0),
+        Valuation('liquid', 'JPY', 1000.0, 1000.0),
+        # an exchange without prices is valued as is
+        Valuation('bitbank', 'ETH', 1.0, 1.0),
+    ]
+
+
+def test_unrealized_pnl_only_for_btc_with_a_position():
+    now = datetime(2021, 1, 1)
+    btc = balance_point(Valuation('liquid', 'BTC', 0.5, 1500000.0), now, 1000000.0, 1400000.0)
+    assert btc['fields']['unrealized_pnl'] == 100000.0
+    assert balance_point(Valuation('liquid', 'BTC', 0.5, 1500000.0), now, 1000000.0)['fields']['unrealized_pnl'] is None
+    eth = balance_point(Valuation('liquid', 'ETH', 1.0, 200000.0), now, 1000000.0, 1400000.0)
+    assert eth['fields']['unrealized_pnl'] is None
+    assert eth['tags'] == {'currency': 'ETH'}
@@ -0,0 +1,75 @@
+import time
+
+from influxdb.exceptions import InfluxDBClientError
+
+from get_metrics.writer import PointWriter
+
+
+POINT = {'measurement': 'test', 'time': 0, 'fields': {'value': 1.0}}
+
+
+class StubClient:
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.points = []
+
+    def write_points(self, points, protocol: str = 'json') -> None:
+        if self.error is not None:
+            raise self.error
+        self.points.extend(points)
+
+
+def test_points_are_written_in_batches(tmp_path):
+    client = StubClient()
+    with PointWriter(client, batch_size=2, spill_dir=str(tmp_path)) as writer:
+        writer.write([POINT] * 5)
+        assert writer.flush(timeout=5)
+    assert client.points == [POINT] * 5
+    assert writer.written == 5
+
+
+def test_unexpected_error_drops_batch_without_stopping_the_writer(tmp_path):
+    client = StubClient(TypeError('not serializable'))
+    writer = PointWriter(client, spill_dir=str(tmp_path))
+    writer.write(POINT)
+    assert writer.flush(timeout=5)
+    assert writer.dropped == 1
+    assert isinstance(writer.error, TypeError)
+
+    client.error = None
+    writer.write(POINT)
+    assert writer.flush(timeout=5)
+    writer.close(timeout=5)
+    assert writer.written == 1
+
+
+def test_failed_spill_drops_batch(tmp_path):
+    spill_dir = tmp_path / 'file'
+    spill_dir.write_text('')  # a file where the spill directory should be
+    writer = PointWriter(StubClient(ConnectionError('down')), retries=0, spill_dir=str(spill_dir))
+    writer.write(POINT)
+    assert writer.flush(timeout=5)
+    writer.close(timeout=5)
+    assert writer.dropped == 1 and writer.spilled == 0
+
+
+def test_rejected_points_are_dropped(tmp_path):
+    writer = PointWriter(StubClient(InfluxDBClientError('bad point')), spill_dir=str(tmp_path))
+    writer.write(POINT)
+    assert writer.flush(timeout=5)
+    writer.close(timeout=5)
+    assert writer.dropped == 1
+
+
+def test_flush_and_close_time_out(tmp_path):
+    class SlowClient(StubClient):
+        def write_points(self, points, protocol: str = 'json') -> None:
+            time.sleep(1)
+
+    writer = PointWriter(SlowClient(), spill_dir=str(tmp_path))
+    writer.write(POINT)
+    start = time.monotonic()
+    assert not writer.flush(timeout=0.1)
+    writer.close(timeout=0.1)
+    assert time.monotonic() - start < 0.9
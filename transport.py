@@ -0,0 +1,231 @@
+"""
+HTTP transport shared by the exchange adapters.
+
+Every adapter sends its requests through an HttpTransport so that connections
+to the same host are pooled and kept alive between calls. Async adapters use
+an AsyncHttpTransport, whose aiohttp session pools connections of every host
+on one event loop. aiohttp is imported only when the first session is created.
+"""
+import asyncio
+from dataclasses import dataclass
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+logger = logging.getLogger()
+
+# status codes which are retried for idempotent requests
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+
+class HttpTransport:
+    '''Pool of keep-alive sessions, one per host.
+
+    Parameters
+    ----------
+    pool_size: int
+        Maximum number of connections kept alive for each host.
+    timeout: float or tuple[float, float]
+        Timeout in seconds given to every request, (connect, read) if tuple.
+    retries: int
+        Number of retries of connection errors and 5xx responses. Only GET
+        requests are retried because orders must never be sent twice.
+    backoff_factor: float
+        Backoff factor between retries, see urllib3.util.retry.Retry.
+    base_urls: dict[str, str]
+        URL prefixes to rewrite before sending, such as
+        {'https://api.coin.z.com': 'http://127.0.0.1:8080/gmo'}. This points the
+        adapters to a local stand-in server.
+    '''
+
+    def __init__(self, pool_size: int = 4, timeout=(3.05, 10), retries: int = 2,
+                 backoff_factor: float = 0.3, base_urls: dict[str, str] = None):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.base_urls = dict(base_urls or {})
+        self._sessions: dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, url: str) -> str:
+        for prefix, replacement in self.base_urls.items():
+            if url.startswith(prefix):
+                return replacement + url[len(prefix):]
+        return url
+
+    def session(self, url: str) -> requests.Session:
+        '''Return the session for the host of url, creating it at first use.
+        '''
+        parts = urlsplit(url)
+        key = f'{parts.scheme}://{parts.netloc}'
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._create_session()
+                self._sessions[key] = session
+                logger.debug(f"Created HTTP session. [host: {key}]")
+            return session
+
+    def _create_session(self) -> requests.Session:
+        retry = Retry(
+                total=self.retries,
+                status_forcelist=RETRY_STATUS_CODES,
+                allowed_methods=frozenset(['GET']),
+                backoff_factor=self.backoff_factor,
+                raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        url = self.resolve(url)
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session(url).request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def close(self) -> None:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for s in sessions:
+            s.close()
+
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+
+def get_transport() -> HttpTransport:
+    '''Return the process wide transport used by adapters created without one.
+    '''
+    global _default_transport
+    with _default_lock:
+        if _default_transport is None:
+            _default_transport = HttpTransport()
+        return _default_transport
+
+
+def set_transport(transport: HttpTransport) -> None:
+    '''Replace the process wide transport, e.g. with one pointing to a stand-in server.
+    '''
+    global _default_transport
+    with _default_lock:
+        old, _default_transport = _default_transport, transport
+    if old is not None and old is not transport:
+        old.close()
+
+
+@dataclass(frozen=True)
+class AsyncResponse:
+    '''Response of AsyncHttpTransport, read completely before the connection is released.
+    '''
+    status_code: int
+    text: str
+    headers: dict
+
+
+class AsyncHttpTransport:
+    '''aiohttp session per event loop, shared by every async adapter running on the loop.
+
+    Parameters are the same as HttpTransport's. pool_size limits the connections
+    to each host, and retries apply to GET requests only.
+    '''
+
+    def __init__(self, pool_size: int = 16, timeout=(3.05, 10), retries: int = 2,
+                 backoff_factor: float = 0.3, base_urls: dict[str, str] = None):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.base_urls = dict(base_urls or {})
+        self._sessions = {}  # keyed by event loop
+        self._lock = threading.Lock()
+
+    resolve = HttpTransport.resolve
+
+    def session(self):
+        '''Return the session of the running event loop, creating it at first use.
+        '''
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                session = self._sessions[loop] = self._create_session()
+                logger.debug(f"Created aiohttp session. [pool_size: {self.pool_size}]")
+            return session
+
+    def _create_session(self):
+        import aiohttp
+
+        connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+        return aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=0, limit_per_host=self.pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read))
+
+    async def request(self, method: str, url: str, **kwargs) -> AsyncResponse:
+        import aiohttp
+
+        url = self.resolve(url)
+        session = self.session()
+        attempts = self.retries + 1 if method == 'GET' else 1
+        for attempt in range(attempts):
+            if attempt:
+                await asyncio.sleep(self.backoff_factor * 2 ** (attempt - 1))
+            try:
+                async with session.request(method, url, **kwargs) as res:
+                    response = AsyncResponse(res.status, await res.text(), dict(res.headers))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == attempts - 1:
+                    raise
+                continue
+            if response.status_code not in RETRY_STATUS_CODES or attempt == attempts - 1:
+                return response
+        return response
+
+    async def get(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request('POST', url, **kwargs)
+
+    async def close(self) -> None:
+        '''Close the session of the running event loop.
+        '''
+        with self._lock:
+            session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+
+_default_async_transport = None
+
+
+def get_async_transport() -> AsyncHttpTransport:
+    '''Return the process wide transport used by async adapters created without one.
+    '''
+    global _default_async_transport
+    with _default_lock:
+        if _default_async_transport is None:
+            _default_async_transport = AsyncHttpTransport()
+        return _default_async_transport
+
+
+def set_async_transport(transport: AsyncHttpTransport) -> None:
+    '''Replace the process wide async transport, e.g. with one pointing to a stand-in server.
+    '''
+    global _default_async_transport
+    with _default_lock:
+        _default_async_transport = transport